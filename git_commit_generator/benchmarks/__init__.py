@@ -0,0 +1,6 @@
+"""git-ai性能基准
+
+- startup: 入口启动导入耗时预算检查（python -m git_commit_generator.benchmarks.startup）
+- mock_server: 本地模拟大模型服务，覆盖各提供商的请求/响应格式（python -m git_commit_generator.benchmarks.mock_server）
+- e2e: 基于模拟服务与合成仓库的分阶段端到端耗时基准（python -m git_commit_generator.benchmarks.e2e）
+"""
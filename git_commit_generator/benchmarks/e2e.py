@@ -0,0 +1,266 @@
+"""端到端耗时基准
+
+在临时目录中生成合成仓库，启动本地模拟大模型服务，按阶段测量git-ai的耗时：
+
+    python -m git_commit_generator.benchmarks.e2e
+    python -m git_commit_generator.benchmarks.e2e --shape anthropic --latency 0.2 --repeat 5
+    python -m git_commit_generator.benchmarks.e2e --json result.json
+    python -m git_commit_generator.benchmarks.e2e --baseline result.json --tolerance 0.3
+
+阶段：
+- snapshot / staged_diff / prompt: git查询与提示词构建
+- generate: 非流式生成（跳过缓存），generate_cached: 命中缓存
+- stream_ttft / stream_total: 流式生成的首块耗时与总耗时
+- quick_push_flow: quick-push的非交互部分（并发阶段图、add、预生成、取结果、commit）
+- cli_commit_preview: 子进程执行 git-ai commit --preview 的总耗时
+
+指定--baseline时，任一阶段的中位数比基线慢超过tolerance比例即以非零状态码退出。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from .mock_server import MockLLMServer, MockOptions, SHAPES
+
+# 模拟服务格式与内置提供商名称的对应关系（Provider按提供商名称/类型选择请求格式）
+SHAPE_PROVIDERS = {
+    'openai': 'OpenAI',
+    'anthropic': 'Anthropic',
+    'google': 'Google',
+    'huggingface': 'HuggingFace',
+    'baidu': 'Baidu',
+}
+
+# 合成仓库规模：(文件数, 每个文件的行数)
+REPO_SIZES = {
+    'small': (5, 40),
+    'medium': (50, 80),
+    'large': (400, 60),
+}
+
+_SOURCE_LINE = "def func_{file}_{line}(value):\n    return value * {line} + {file}\n"
+
+
+def _git(repo: str, *args: str):
+    subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True)
+
+
+def make_repo(path: str, size: str) -> List[str]:
+    """创建合成仓库：提交初始版本后修改所有文件，返回修改的文件列表（未暂存）"""
+    files, lines = REPO_SIZES[size]
+    os.makedirs(path)
+    _git(path, 'init', '-q')
+    _git(path, 'config', 'user.email', 'bench@example.com')
+    _git(path, 'config', 'user.name', 'bench')
+    _git(path, 'config', 'commit.gpgsign', 'false')
+    paths = []
+    for i in range(files):
+        relative = os.path.join(f"pkg{i % 10}", f"module_{i}.py")
+        os.makedirs(os.path.join(path, os.path.dirname(relative)), exist_ok=True)
+        with open(os.path.join(path, relative), 'w', encoding='utf-8') as f:
+            f.write(''.join(_SOURCE_LINE.format(file=i, line=j) for j in range(lines)))
+        paths.append(relative.replace(os.sep, '/'))
+    _git(path, 'add', '-A')
+    _git(path, 'commit', '-q', '-m', 'init')
+    modify_repo(path, paths, 1)
+    return paths
+
+
+def modify_repo(path: str, paths: List[str], round_no: int):
+    """在每个文件中修改若干行，使每轮产生不同的diff（避免命中缓存）"""
+    for relative in paths:
+        full = os.path.join(path, relative)
+        with open(full, 'r', encoding='utf-8') as f:
+            content = f.readlines()
+        for j in range(0, len(content), 10):
+            content[j] = content[j].rstrip('\n') + f"  # round {round_no}\n"
+        with open(full, 'w', encoding='utf-8') as f:
+            f.writelines(content)
+
+
+def write_config(workdir: str, server: MockLLMServer, shape: str) -> str:
+    provider = SHAPE_PROVIDERS[shape]
+    config_file = os.path.join(workdir, 'config.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump({'current_provider': provider, 'providers': {provider: {
+            'api_key': 'bench', 'model_name': 'mock', 'model_url': server.url(shape), 'max_tokens': 256,
+        }}}, f)
+    return config_file
+
+
+class StageTimer:
+    """收集各阶段多次运行的耗时（毫秒）"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, elapsed_ms: float):
+        self.samples.setdefault(stage, []).append(elapsed_ms)
+
+    def measure(self, stage: str, func: Callable):
+        start = time.perf_counter()
+        result = func()
+        self.add(stage, (time.perf_counter() - start) * 1000)
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            result[stage] = {
+                'median': statistics.median(ordered),
+                'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+                'runs': len(ordered),
+            }
+        return result
+
+
+def run_library_stages(repo: str, paths: List[str], repeat: int, timer: StageTimer):
+    """在当前进程内驱动CommitGenerator，测量各阶段耗时"""
+    from git_commit_generator.config import ConfigManager
+    from git_commit_generator.core import CommitGenerator
+    from git_commit_generator.git_operations import GitOperations
+
+    os.chdir(repo)
+    for round_no in range(repeat):
+        modify_repo(repo, paths, round_no + 2)
+        GitOperations.execute_add(paths)
+        generator = CommitGenerator(ConfigManager())
+
+        timer.measure('snapshot', GitOperations.get_snapshot)
+        diff_content = timer.measure('staged_diff', GitOperations.get_staged_diff)
+        timer.measure('prompt', lambda: generator._prepare_prompt(diff_content))
+        timer.measure('generate', lambda: generator.generate_commit_message(diff_content, use_cache=False))
+        timer.measure('generate_cached', lambda: generator.generate_commit_message(diff_content))
+
+        start = time.perf_counter()
+        first = None
+        for _ in generator.generate_commit_message_stream(diff_content, use_cache=False):
+            if first is None:
+                first = time.perf_counter()
+        end = time.perf_counter()
+        timer.add('stream_ttft', ((first or end) - start) * 1000)
+        timer.add('stream_total', (end - start) * 1000)
+        GitOperations.execute_reset()
+
+
+def run_quick_push_flow(repo: str, paths: List[str], repeat: int, timer: StageTimer):
+    """quick-push的非交互部分：交互步骤（选择文件、确认）按立即确认处理，推送不执行"""
+    from git_commit_generator.config import ConfigManager
+    from git_commit_generator.core import CommitGenerator
+    from git_commit_generator.git_operations import GitOperations
+    from git_commit_generator.scheduler import StageGraph
+
+    os.chdir(repo)
+    for round_no in range(repeat):
+        modify_repo(repo, paths, 100 + round_no)
+        start = time.perf_counter()
+        generator = CommitGenerator(ConfigManager())
+        graph = StageGraph()
+        graph.add('snapshot', GitOperations.get_snapshot)
+        graph.add('conflicts', generator.check_conflicts, after=['snapshot'])
+        graph.start()
+        snapshot = graph.result('snapshot')
+        graph.result('conflicts')
+        GitOperations.execute_add(GitOperations.get_unstaged_files(snapshot))
+        generator.start_speculative()
+        diff_content = generator.get_staged_diff()
+        chunks = generator.follow_speculative(diff_content)
+        message = ''.join(chunks).strip() if chunks is not None else generator.generate_commit_message(diff_content)
+        GitOperations.execute_commit(message)
+        graph.shutdown()
+        timer.add('quick_push_flow', (time.perf_counter() - start) * 1000)
+
+
+def run_cli_preview(repo: str, paths: List[str], repeat: int, timer: StageTimer, env: Dict[str, str]):
+    """以子进程执行 git-ai commit --preview（包含解释器启动与导入）"""
+    code = ("import sys; from git_commit_generator.cli.main import app; "
+            "sys.argv = ['git-ai', 'commit', '--preview', '--no-stream']; app()")
+    for round_no in range(repeat):
+        modify_repo(repo, paths, 200 + round_no)
+        _git(repo, 'add', '-A')
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=repo, env=env, capture_output=True)
+        timer.add('cli_commit_preview', (time.perf_counter() - start) * 1000)
+        _git(repo, 'reset', '-q')
+
+
+def compare(summary: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """返回比基线慢超过tolerance比例的阶段说明"""
+    regressions = []
+    for stage, stats in summary.items():
+        base = baseline.get(stage)
+        if not base or not base.get('median'):
+            continue
+        ratio = stats['median'] / base['median']
+        if ratio > 1 + tolerance:
+            regressions.append(f"{stage}: {base['median']:.1f} ms -> {stats['median']:.1f} ms (+{(ratio - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="git-ai端到端耗时基准")
+    parser.add_argument('--shape', choices=SHAPES, default='openai', help="模拟的提供商格式")
+    parser.add_argument('--size', choices=list(REPO_SIZES), default='medium', help="合成仓库规模")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段的运行次数")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟服务首字节延迟(秒)")
+    parser.add_argument('--chunk-delay', type=float, default=0.005, help="模拟服务流式数据块间隔(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟服务随机错误比例")
+    parser.add_argument('--skip-cli', action='store_true', help="跳过子进程CLI场景")
+    parser.add_argument('--json', dest='json_path', help="将结果写入JSON文件，可作为之后的基线")
+    parser.add_argument('--baseline', help="基线JSON文件")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="相对基线允许的变慢比例")
+    options = parser.parse_args(args)
+
+    timer = StageTimer()
+    original_cwd = os.getcwd()
+    options_mock = MockOptions(latency=options.latency, chunk_delay=options.chunk_delay,
+                               error_rate=options.error_rate, seed=0)
+    with tempfile.TemporaryDirectory() as workdir, MockLLMServer(options_mock) as server:
+        # 配置文件与缓存目录在导入git-ai模块前通过环境变量指定，不影响用户自己的配置
+        os.environ['GIT_AI_CONFIG'] = write_config(workdir, server, options.shape)
+        os.environ['GIT_AI_CACHE_DIR'] = os.path.join(workdir, 'cache')
+        package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+        try:
+            repo = os.path.join(workdir, 'repo')
+            paths = make_repo(repo, options.size)
+            run_library_stages(repo, paths, options.repeat, timer)
+            run_quick_push_flow(repo, paths, options.repeat, timer)
+            if not options.skip_cli:
+                run_cli_preview(repo, paths, options.repeat, timer, env)
+        finally:
+            os.chdir(original_cwd)
+        requests_served = dict(server.requests)
+
+    summary = timer.summary()
+    print(f"格式 {options.shape}  仓库 {options.size}  模拟延迟 {options.latency * 1000:.0f} ms  "
+          f"请求数 {sum(requests_served.values())}")
+    print(f"{'阶段':<20}{'中位数(ms)':>12}{'p95(ms)':>12}{'次数':>6}")
+    for stage, stats in summary.items():
+        print(f"{stage:<22}{stats['median']:>12.1f}{stats['p95']:>12.1f}{stats['runs']:>6}")
+
+    if options.json_path:
+        with open(options.json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(summary, json.load(f), options.tolerance)
+        if regressions:
+            print("\n相对基线变慢的阶段：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
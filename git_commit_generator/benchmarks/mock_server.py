@@ -0,0 +1,299 @@
+"""本地模拟大模型服务
+
+按请求路径模拟各提供商的请求/响应格式（与Provider._prepare_data/_parse_response/_parse_stream_chunk对应），
+支持首字节延迟、流式分块间隔和错误注入，用于离线测量git-ai的端到端耗时：
+
+    python -m git_commit_generator.benchmarks.mock_server --port 8765 --latency 0.3 --chunk-delay 0.02
+
+路径与格式：
+- /openai       OpenAI/Azure/DeepSeek/ChatGLM/Moonshot等choices格式
+- /anthropic    Anthropic messages格式（流式为content_block_delta事件）
+- /google/models/<模型>:generateContent、:streamGenerateContent?alt=sse   Google格式
+- /huggingface  HuggingFace generated_text/token格式
+- /baidu        百度文心一言result格式
+
+请求体中"stream": true（Google为streamGenerateContent路径）时以SSE返回。
+响应按各提供商的格式返回token用量（提示词按请求体字节数/4粗略计算）；
+系统消息与之前的请求相同时，将其计为命中缓存的token，用于观察提示词缓存的效果。
+"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_MESSAGE = "feat(core): 添加示例功能\n\n- 新增模拟接口\n- 补充基准测试"
+SHAPES = ('openai', 'anthropic', 'google', 'huggingface', 'baidu')
+
+
+class MockOptions:
+    """模拟服务的行为配置，运行中可直接修改属性"""
+
+    def __init__(self, latency: float = 0.0, chunk_delay: float = 0.0, chunks: int = 8,
+                 error_rate: float = 0.0, error_status: int = 503, fail_first: int = 0,
+                 message: str = DEFAULT_MESSAGE, seed: Optional[int] = None):
+        """
+        :param latency: 返回响应头（首字节）前的延迟（秒）
+        :param chunk_delay: 流式响应中相邻数据块之间的间隔（秒）
+        :param chunks: 流式响应的数据块数
+        :param error_rate: 随机返回错误状态码的概率
+        :param error_status: 注入错误时的HTTP状态码
+        :param fail_first: 前N个请求固定返回错误，便于确定性地测试重试与切换
+        :param message: 返回的提交信息
+        :param seed: 错误注入的随机种子
+        """
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunks = max(1, chunks)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_first = fail_first
+        self.message = message
+        self.random = random.Random(seed)
+
+
+def _split(text: str, parts: int) -> List[str]:
+    size = max(1, -(-len(text) // parts))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _shape_of(path: str) -> Optional[str]:
+    segment = path.lstrip('/').split('/', 1)[0].split('?', 1)[0]
+    return segment if segment in SHAPES else None
+
+
+def system_text(shape: str, body: Dict) -> str:
+    """请求中的系统消息（固定前缀）"""
+    if shape == 'anthropic':
+        system = body.get('system') or ''
+        return ''.join(block.get('text', '') for block in system) if isinstance(system, list) else system
+    if shape == 'google':
+        parts = (body.get('systemInstruction') or {}).get('parts') or []
+        return ''.join(part.get('text', '') for part in parts)
+    if shape == 'baidu':
+        return body.get('system') or ''
+    if shape == 'openai':
+        return ''.join(m.get('content', '') for m in body.get('messages', []) if m.get('role') == 'system')
+    return ''
+
+
+def usage_fields(shape: str, usage: Dict[str, int]) -> Dict:
+    """按提供商格式表示的用量，usage包含prompt_tokens/completion_tokens/cached_tokens"""
+    prompt, completion, cached = usage['prompt_tokens'], usage['completion_tokens'], usage['cached_tokens']
+    if shape == 'anthropic':
+        return {'input_tokens': prompt - cached, 'output_tokens': completion,
+                'cache_read_input_tokens': cached, 'cache_creation_input_tokens': 0}
+    if shape == 'google':
+        return {'promptTokenCount': prompt, 'candidatesTokenCount': completion, 'cachedContentTokenCount': cached}
+    if shape == 'baidu':
+        return {'prompt_tokens': prompt, 'completion_tokens': completion}
+    return {'prompt_tokens': prompt, 'completion_tokens': completion, 'prompt_tokens_details': {'cached_tokens': cached}}
+
+
+def full_response(shape: str, text: str, usage: Optional[Dict[str, int]] = None) -> Dict:
+    """非流式响应体"""
+    usage = usage or {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    if shape == 'anthropic':
+        return {'type': 'message', 'role': 'assistant', 'content': [{'type': 'text', 'text': text}],
+                'usage': usage_fields(shape, usage)}
+    if shape == 'google':
+        return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}],
+                'usageMetadata': usage_fields(shape, usage)}
+    if shape == 'huggingface':
+        return {'generated_text': text}
+    if shape == 'baidu':
+        return {'result': text, 'usage': usage_fields(shape, usage)}
+    return {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}}],
+            'usage': usage_fields(shape, usage)}
+
+
+def stream_events(shape: str, pieces: List[str], usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+    """流式响应的SSE数据行（不含结尾空行）"""
+    usage = usage or {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    if shape == 'anthropic':
+        yield 'data: ' + json.dumps({'type': 'message_start',
+                                     'message': {'role': 'assistant', 'usage': usage_fields(shape, usage)}})
+        for piece in pieces:
+            yield 'data: ' + json.dumps({'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': piece}},
+                                        ensure_ascii=False)
+        yield 'data: ' + json.dumps({'type': 'message_stop'})
+        return
+    for i, piece in enumerate(pieces):
+        last = i == len(pieces) - 1
+        if shape == 'google':
+            event = {'candidates': [{'content': {'parts': [{'text': piece}], 'role': 'model'}}]}
+            if last:
+                event['usageMetadata'] = usage_fields(shape, usage)
+        elif shape == 'huggingface':
+            event = {'token': {'text': piece, 'special': False}}
+        elif shape == 'baidu':
+            event = {'result': piece}
+            if last:
+                event['usage'] = usage_fields(shape, usage)
+        else:
+            event = {'choices': [{'index': 0, 'delta': {'content': piece}}]}
+        yield 'data: ' + json.dumps(event, ensure_ascii=False)
+    if shape == 'openai':
+        # 与OpenAI的stream_options.include_usage一致：最后一个数据块只携带用量
+        yield 'data: ' + json.dumps({'choices': [], 'usage': usage_fields(shape, usage)})
+        yield 'data: [DONE]'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: 'MockLLMServer'
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # 关闭Nagle算法，避免小数据块被合并延迟发送，干扰首字节耗时的测量
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            body = json.loads(raw or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'invalid json'})
+            return
+        shape = _shape_of(self.path)
+        if shape is None:
+            self._send_json(404, {'error': f'unknown path {self.path}'})
+            return
+
+        options = self.server.options
+        request_index = self.server.record(shape)
+        if options.latency:
+            time.sleep(options.latency)
+        if request_index < options.fail_first or (options.error_rate and options.random.random() < options.error_rate):
+            self._send_json(options.error_status, {'error': {'message': 'injected error'}})
+            return
+
+        usage = self.server.usage(shape, body, len(raw))
+        stream = ':streamGenerateContent' in self.path if shape == 'google' else bool(body.get('stream'))
+        if not stream:
+            self._send_json(200, full_response(shape, options.message, usage))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, line in enumerate(stream_events(shape, _split(options.message, options.chunks), usage)):
+            if i and options.chunk_delay:
+                time.sleep(options.chunk_delay)
+            data = f"{line}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """在后台线程中运行的模拟服务，可作为上下文管理器使用
+
+    示例：
+        with MockLLMServer(MockOptions(latency=0.2)) as server:
+            url = server.url('openai')
+    """
+
+    daemon_threads = True
+
+    def __init__(self, options: Optional[MockOptions] = None, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.options = options or MockOptions()
+        self.requests: Dict[str, int] = {}
+        self._count = 0
+        self._count_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._seen_prefixes = set()
+
+    def record(self, shape: str) -> int:
+        """记录一次请求，返回其全局序号（从0开始）"""
+        with self._count_lock:
+            index = self._count
+            self._count += 1
+            self.requests[shape] = self.requests.get(shape, 0) + 1
+            return index
+
+    def usage(self, shape: str, body: Dict, body_size: int) -> Dict[str, int]:
+        """计算一次请求的用量，系统消息在之前出现过时计为命中缓存"""
+        system = system_text(shape, body)
+        with self._count_lock:
+            cached = len(system.encode('utf-8')) // 4 if system and system in self._seen_prefixes else 0
+            if system:
+                self._seen_prefixes.add(system)
+        return {'prompt_tokens': max(1, body_size // 4), 'completion_tokens': max(1, len(self.options.message) // 2),
+                'cached_tokens': cached}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, shape: str, model: str = 'mock') -> str:
+        """各格式对应的model_url"""
+        if shape == 'google':
+            return f"{self.base_url}/google/models/{model}:generateContent"
+        return f"{self.base_url}/{shape}"
+
+    def start(self) -> 'MockLLMServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="首字节延迟(秒)")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="流式数据块间隔(秒)")
+    parser.add_argument('--chunks', type=int, default=8, help="流式数据块数")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="随机错误比例(0-1)")
+    parser.add_argument('--error-status', type=int, default=503, help="注入错误的状态码")
+    parser.add_argument('--fail-first', type=int, default=0, help="前N个请求固定失败")
+    options = parser.parse_args(args)
+
+    server = MockLLMServer(MockOptions(options.latency, options.chunk_delay, options.chunks,
+                                       options.error_rate, options.error_status, options.fail_first),
+                           options.host, options.port)
+    print(f"模拟服务已启动: {server.base_url}")
+    for shape in SHAPES:
+        print(f"  {shape:<12} {server.url(shape)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""启动耗时基准
+
+在独立子进程中以 `python -X importtime` 运行 git-ai 入口，统计模块导入总耗时，
+超出预算时以非零状态码退出，可直接用于CI或提交前检查：
+
+    python -m git_commit_generator.benchmarks.startup
+    python -m git_commit_generator.benchmarks.startup --budget-help 120 --repeat 7
+
+场景：
+- help: `git-ai --help`
+- commit_preview: 在无暂存变更的临时仓库中执行 `git-ai commit --preview`，
+  覆盖生成请求发出前的全部导入
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# 默认预算（毫秒），仅统计导入耗时，不含解释器自身启动
+DEFAULT_BUDGETS = {
+    'help': 150.0,
+    'commit_preview': 250.0,
+}
+
+# 入口模块，导入记录中没有它说明子进程在导入阶段就已失败
+ENTRY_MODULE = 'git_commit_generator.cli.main'
+_RUN_APP = "import sys; from git_commit_generator.cli.main import app; sys.argv = ['git-ai'] + {argv!r}; app()"
+_IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """解析 -X importtime 的输出
+
+    Returns:
+        Tuple[float, Dict[str, float]]: (导入总耗时毫秒, 顶层模块 -> 累计耗时毫秒)
+    """
+    top_level = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_PATTERN.match(line)
+        # 缩进为1个空格的才是顶层导入，其余为嵌套导入，已计入顶层的累计耗时
+        if match and len(match.group(3)) == 1:
+            top_level[match.group(4)] = top_level.get(match.group(4), 0.0) + int(match.group(2)) / 1000
+    return sum(top_level.values()), top_level
+
+
+def _make_env(workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    config_file = os.path.join(workdir, 'config.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump({'current_provider': 'OpenAI', 'providers': {'OpenAI': {
+            'api_key': 'bench', 'model_name': 'bench', 'model_url': 'http://127.0.0.1:9/', 'max_tokens': 256
+        }}}, f)
+    env['GIT_AI_CONFIG'] = config_file
+    env['GIT_AI_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    return env
+
+
+def check_run(stderr: str):
+    """确认子进程正常导入了入口模块且没有抛出异常，否则失败的运行会因耗时很短被误判为达标
+
+    Raises:
+        RuntimeError: 入口模块未导入或出现异常堆栈
+    """
+    imported = any(line.rsplit('|', 1)[-1].strip() == ENTRY_MODULE
+                   for line in stderr.splitlines() if line.startswith('import time:'))
+    errors = [line for line in stderr.splitlines() if not line.startswith('import time:')]
+    if not imported or any(line.startswith('Traceback ') for line in errors):
+        detail = '\n'.join(errors[-5:]) or f"未导入{ENTRY_MODULE}"
+        raise RuntimeError(detail)
+
+
+def measure(argv: List[str], cwd: str, env: Dict[str, str]) -> Tuple[float, float, Dict[str, float]]:
+    """运行一次入口并返回 (导入耗时毫秒, 进程总耗时毫秒, 顶层模块耗时)
+
+    Raises:
+        RuntimeError: 子进程未能正常导入入口模块或出现异常
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _RUN_APP.format(argv=argv)],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    check_run(result.stderr)
+    import_ms, modules = parse_importtime(result.stderr)
+    return import_ms, wall_ms, modules
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="git-ai启动耗时基准")
+    parser.add_argument('--repeat', type=int, default=5, help="每个场景的运行次数，取中位数")
+    parser.add_argument('--budget-help', type=float, default=DEFAULT_BUDGETS['help'], help="git-ai --help 导入耗时预算(ms)")
+    parser.add_argument('--budget-commit', type=float, default=DEFAULT_BUDGETS['commit_preview'], help="git-ai commit --preview 导入耗时预算(ms)")
+    parser.add_argument('--top', type=int, default=5, help="超出预算时列出耗时最多的顶层模块数")
+    options = parser.parse_args(args)
+
+    scenarios = {
+        'help': (['--help'], options.budget_help),
+        'commit_preview': (['commit', '--preview'], options.budget_commit),
+    }
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        repo = os.path.join(workdir, 'repo')
+        os.makedirs(repo)
+        subprocess.run(['git', 'init', '-q', repo], check=True)
+        env = _make_env(workdir)
+
+        for name, (argv, budget) in scenarios.items():
+            try:
+                runs = [measure(argv, repo, env) for _ in range(max(options.repeat, 1))]
+            except RuntimeError as e:
+                print(f"{name:<16} 运行失败  ERROR")
+                print('\n'.join(f"    {line}" for line in str(e).splitlines()))
+                failed = True
+                continue
+            import_ms = statistics.median(run[0] for run in runs)
+            wall_ms = statistics.median(run[1] for run in runs)
+            status = 'OK' if import_ms <= budget else 'FAIL'
+            print(f"{name:<16} import {import_ms:8.1f} ms  wall {wall_ms:8.1f} ms  budget {budget:6.0f} ms  {status}")
+            if status == 'FAIL':
+                failed = True
+                slowest = sorted(runs[-1][2].items(), key=lambda item: item[1], reverse=True)[:options.top]
+                for module, cost in slowest:
+                    print(f"    {module:<40} {cost:8.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存上限：条目数、总字节数与最长保存时间（秒）
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+def default_cache_dir() -> str:
+    """获取默认缓存目录，优先使用GIT_AI_CACHE_DIR，其次遵循XDG规范"""
+    env_dir = os.environ.get('GIT_AI_CACHE_DIR')
+    if env_dir:
+        return env_dir
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'git-ai')
+
+
+class MessageCache:
+    """基于内容寻址的提交信息磁盘缓存
+
+    缓存键由规范化后的diff、提供商、模型名称和提示词模板版本共同哈希得到，
+    每个条目单独存为一个JSON文件。写入采用临时文件+原子替换，多个进程
+    同时读写也不会读到半截内容；命中时刷新文件mtime，淘汰时按mtime做LRU。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), 'messages')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @staticmethod
+    def normalize_diff(diff_content: str) -> str:
+        """规范化diff：统一换行符并去除行尾空白，避免无意义差异导致缓存失效"""
+        lines = diff_content.replace('\r\n', '\n').split('\n')
+        return '\n'.join(line.rstrip() for line in lines).strip()
+
+    @classmethod
+    def make_key(cls, diff_content: str, provider: str, model_name: str, prompt_version: str) -> str:
+        """计算缓存键
+
+        Args:
+            diff_content: 暂存区diff
+            provider: 提供商名称
+            model_name: 模型名称
+            prompt_version: 提示词模板版本
+
+        Returns:
+            str: sha256十六进制摘要
+        """
+        digest = hashlib.sha256()
+        for part in (provider, model_name, str(prompt_version)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(cls.normalize_diff(diff_content).encode('utf-8', errors='surrogateescape'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的提交信息，未命中或已过期返回None"""
+        path = self._entry_path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.max_age:
+                self._remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                message = json.load(f).get('message')
+            # 刷新访问时间，供LRU淘汰使用
+            os.utime(path, None)
+            return message
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, message: str):
+        """写入提交信息并按容量淘汰旧条目，失败时仅记录日志"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'message': message, 'created_at': time.time()}, f, ensure_ascii=False)
+                os.replace(tmp_path, self._entry_path(key))
+            except BaseException:
+                self._remove(tmp_path)
+                raise
+            self._evict()
+        except OSError as e:
+            logger.debug(f"写入提交信息缓存失败: {str(e)}")
+
+    def _evict(self):
+        """删除过期条目，并按最近使用时间淘汰超出数量或大小上限的条目"""
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.json') or entry.name.startswith('.tmp-'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if now - stat.st_mtime > self.max_age:
+                        self._remove(entry.path)
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+
+    def clear(self):
+        """清空所有缓存条目"""
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    self._remove(entry.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path: str):
+        # 其他进程可能已删除同一文件，忽略即可
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,5 +1,4 @@
-from typing import Dict, List, Tuple
-from questionary import checkbox
+from typing import Dict, List, Optional, Set, Tuple
 
 class FileSelector:
     """文件选择器类，用于处理文件选择相关的功能"""
@@ -28,7 +27,8 @@ class FileSelector:
         return tree
     
     @staticmethod
-    def flatten_tree(tree: Dict, prefix: str = "", result: Dict = {}, choices: List = []) -> Tuple[Dict, List]:
+    def flatten_tree(tree: Dict, prefix: str = "", result: Optional[Dict] = None,
+                     choices: Optional[List] = None) -> Tuple[Dict, List]:
         """将树形结构扁平化为questionary可用的选项列表
         
         Args:
@@ -78,62 +78,223 @@ class FileSelector:
         return result, choices
     
     @staticmethod
-    def on_checkbox_select(selected_values: List[str], file_map: Dict) -> List[str]:
+    def on_checkbox_select(selected_values: List[str], file_map: Dict,
+                           index: Optional['FileTreeIndex'] = None) -> List[str]:
         """实现级联选择功能，当选择或取消某个文件夹时，其下所有文件执行相同操作
         
         Args:
             selected_values: 当前选中的值列表
             file_map: 文件路径映射关系
+            index: 预先构建的文件树索引，多次调用时传入可避免重复构建
             
         Returns:
             list: 更新后的选中值列表
         """
-        # 创建一个新的选中值列表，避免修改原始列表
-        updated_selection = selected_values.copy()
+        if index is None:
+            index = FileTreeIndex([path for path, info in file_map.items() if not info["is_dir"]])
+        updated_selection = index.cascade(selected_values)
         
-        # 处理目录选择状态变化
-        for dir_path, dir_info in file_map.items():
-            if not dir_info["is_dir"]:
+        # 同步选项的勾选状态
+        selected_set = set(updated_selection)
+        for path, info in file_map.items():
+            info["choice"]["checked"] = path in selected_set
+        return updated_selection
+
+
+class FileTreeIndex:
+    """文件树索引
+    
+    节点按先序（与flatten_tree相同的排序）存放在数组中，每个节点记录父节点、
+    子节点和子树区间[i, end)，选中状态用下标集合表示。对目录的级联操作只需
+    遍历其子树区间，避免对全部文件做前缀匹配和列表删除。
+    """
+    
+    def __init__(self, files: List[str]):
+        self.values: List[str] = []
+        self.names: List[str] = []
+        self.is_dir: List[bool] = []
+        self.depth: List[int] = []
+        self.parent: List[int] = []
+        self.children: List[List[int]] = []
+        self.end: List[int] = []
+        self.index: Dict[str, int] = {}
+        self._build(FileSelector.build_file_tree(files))
+    
+    def _add_node(self, value: str, name: str, is_dir: bool, parent: int) -> int:
+        node = len(self.values)
+        self.values.append(value)
+        self.names.append(name)
+        self.is_dir.append(is_dir)
+        self.depth.append(self.depth[parent] + 1 if parent >= 0 else 0)
+        self.parent.append(parent)
+        self.children.append([])
+        self.end.append(node + 1)
+        self.index[value] = node
+        if parent >= 0:
+            self.children[parent].append(node)
+        return node
+    
+    def _add_level(self, subtree: Dict, parent: int):
+        """添加一层中的文件节点，返回该层子目录的迭代器（排序规则与flatten_tree一致：先文件后目录）"""
+        items = sorted(subtree.items(), key=lambda x: (isinstance(x[1], dict), x[0]))
+        for key, value in items:
+            if not isinstance(value, dict):
+                self._add_node(value, key, False, parent)
+        return iter([(key, value) for key, value in items if isinstance(value, dict)])
+    
+    def _build(self, tree: Dict):
+        """迭代先序遍历建立索引，避免深层目录触发递归深度限制"""
+        # 栈元素：(目录节点下标, 目录路径, 尚未处理的子目录迭代器)
+        stack = [(-1, "", self._add_level(tree, -1))]
+        while stack:
+            parent, prefix, sub_dirs = stack[-1]
+            item = next(sub_dirs, None)
+            if item is None:
+                stack.pop()
+                if parent >= 0:
+                    self.end[parent] = len(self.values)
                 continue
-                
-            # 检查目录是否在选中列表中
-            dir_selected = dir_path in updated_selection
-            
-            # 获取该目录下的所有文件和子目录
-            child_files = []
-            child_dirs = []
-            
-            for path, info in file_map.items():
-                # 检查是否为当前目录的子项
-                if path != dir_path and path.startswith(dir_path):
-                    if info["is_dir"]:
-                        child_dirs.append(path)
-                    else:
-                        child_files.append(path)
-            
-            # 更新子文件的选择状态
-            for file_path in dir_info["files"]:
-                if file_path in file_map and not file_map[file_path]["is_dir"]:
-                    file_choice = file_map[file_path]["choice"]
-                    
-                    # 根据目录选择状态更新文件选择状态
-                    if dir_selected and file_path not in updated_selection:
-                        updated_selection.append(file_path)
-                        file_choice["checked"] = True
-                    elif not dir_selected and file_path in updated_selection:
-                        updated_selection.remove(file_path)
-                        file_choice["checked"] = False
+            key, value = item
+            dir_path = f"{prefix}{key}/"
+            node = self._add_node(dir_path, key, True, parent)
+            stack.append((node, dir_path, self._add_level(value, node)))
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def subtree(self, node: int) -> range:
+        """节点（含自身）的子树下标区间"""
+        return range(node, self.end[node])
+    
+    def files_under(self, path: str) -> List[str]:
+        """目录下（含子目录）的所有文件"""
+        node = self.index[path]
+        return [self.values[i] for i in self.subtree(node) if not self.is_dir[i]]
+    
+    def set_checked(self, selection: Set[int], path: str, checked: bool):
+        """选中或取消某个节点及其整个子树"""
+        subtree = self.subtree(self.index[path])
+        if checked:
+            selection.update(subtree)
+        else:
+            selection.difference_update(subtree)
+    
+    def cascade(self, selected_values: List[str]) -> List[str]:
+        """按目录状态级联更新选中项
+        
+        与逐目录处理的效果一致：每个节点的状态由其最上层的祖先目录决定，
+        不在任何目录下的顶层文件保持原状态。
+        
+        Args:
+            selected_values: 当前选中的值列表
             
-            # 更新子目录的选择状态
-            for child_dir in child_dirs:
-                dir_choice = file_map[child_dir]["choice"]
-                
-                # 根据父目录选择状态更新子目录选择状态
-                if dir_selected and child_dir not in updated_selection:
-                    updated_selection.append(child_dir)
-                    dir_choice["checked"] = True
-                elif not dir_selected and child_dir in updated_selection:
-                    updated_selection.remove(child_dir)
-                    dir_choice["checked"] = False
+        Returns:
+            list: 更新后的选中值列表（先序）
+        """
+        selected = {self.index[value] for value in selected_values if value in self.index}
+        result = []
+        root_state = False
+        for node in range(len(self.values)):
+            # 先序遍历中顶层节点总是先于其子树出现
+            if self.parent[node] < 0:
+                root_state = node in selected
+            if root_state:
+                result.append(self.values[node])
+        # 不在树中的值（如外部追加的路径）原样保留
+        result.extend(value for value in selected_values if value not in self.index)
+        return result
+
+
+class PathIndex:
+    """基于三元组（trigram）倒排表的路径过滤索引
+    
+    每个文件路径（小写）的所有三元组指向该文件在FileTreeIndex中的节点下标，
+    倒排表用紧凑的array按先序存放。查询时只取最稀有三元组的倒排表作为候选，
+    再做子串校验；当新查询是上一次查询的扩展时，只在上次结果中继续过滤。
+    子串无匹配时退化为按字符顺序的模糊（子序列）匹配。
+    """
+    
+    def __init__(self, tree_index: FileTreeIndex):
+        from array import array
+        self.tree = tree_index
+        self.nodes: List[int] = [i for i in range(len(tree_index)) if not tree_index.is_dir[i]]
+        self.lowered: Dict[int, str] = {i: tree_index.values[i].replace('\\', '/').lower() for i in self.nodes}
+        self.postings: Dict[str, 'array'] = {}
+        for node in self.nodes:
+            path = self.lowered[node]
+            for gram in {path[i:i + 3] for i in range(len(path) - 2)}:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array('I')
+                posting.append(node)
+        self._last_query: Optional[str] = None
+        self._last_result: List[int] = self.nodes
+        self._last_fuzzy = False
+        self._joined: Optional[str] = None
+        self._offsets: List[int] = []
+    
+    @classmethod
+    def from_files(cls, files: List[str]) -> 'PathIndex':
+        return cls(FileTreeIndex(files))
+    
+    def _candidates(self, terms: List[str]) -> List[int]:
+        """取所有查询词中最稀有三元组的倒排表作为候选集"""
+        best = None
+        for term in terms:
+            for i in range(len(term) - 2):
+                posting = self.postings.get(term[i:i + 3])
+                if posting is None:
+                    return []
+                if best is None or len(posting) < len(best):
+                    best = posting
+        return list(best) if best is not None else self.nodes
+    
+    def _fuzzy(self, query: str) -> List[int]:
+        """子序列模糊匹配：在所有路径拼接成的文本上用正则一次扫描，避免逐个路径做Python级比较"""
+        import re
+        from bisect import bisect_right
+        if self._joined is None:
+            self._joined = '\n'.join(self.lowered[node] for node in self.nodes)
+            self._offsets, offset = [], 0
+            for node in self.nodes:
+                self._offsets.append(offset)
+                offset += len(self.lowered[node]) + 1
+        pattern = re.compile('[^\n]*?'.join(re.escape(ch) for ch in query))
+        result = []
+        for match in pattern.finditer(self._joined):
+            position = bisect_right(self._offsets, match.start()) - 1
+            node = self.nodes[position]
+            if not result or result[-1] != node:
+                result.append(node)
+        return result
+    
+    def search(self, query: str) -> List[int]:
+        """按子串（空格分隔的多个词需全部命中）过滤文件，无结果时做模糊匹配
         
-        return updated_selection
\ No newline at end of file
+        Args:
+            query: 查询字符串，大小写不敏感
+            
+        Returns:
+            List[int]: 命中的文件节点下标（先序）
+        """
+        query = query.strip().lower()
+        fuzzy = False
+        if not query:
+            result = self.nodes
+        else:
+            terms = query.split()
+            if self._last_query and not self._last_fuzzy and query.startswith(self._last_query):
+                # 增量过滤：查询只是在上次基础上追加字符，结果必然是上次子串结果的子集
+                candidates = self._last_result
+            else:
+                candidates = self._candidates(terms)
+            result = [node for node in candidates if all(term in self.lowered[node] for term in terms)]
+            fuzzy = not result
+            if fuzzy:
+                result = self._fuzzy(query.replace(' ', ''))
+        self._last_query, self._last_result = query, result
+        self._last_fuzzy = bool(query) and fuzzy
+        return result
+    
+    def value(self, node: int) -> str:
+        return self.tree.values[node]
@@ -1,13 +1,16 @@
-import click
+import os
 import typer
-from rich.console import Console
-from rich.live import Live
-from rich.spinner import Spinner
 from ..config import ConfigManager
-from ..core import CommitGenerator
-from git_commit_generator.git_operations import GitOperations
 from .ui_utils import UIUtils
 
+# rich、questionary、requests以及生成器相关模块只在需要它们的命令中导入，
+# 使 git-ai --help 和钩子等轻量调用不必承担这部分启动开销
+
+# 未暂存文件超过该数量时，改用可输入过滤的文件选择器
+PATH_PICKER_THRESHOLD = 30
+# 后台预生成超过该时间（秒）没有新的输出时，放弃预生成改为在前台重新生成
+SPECULATIVE_STALL_TIMEOUT = 30.0
+
 app = typer.Typer()
 config_app = typer.Typer(context_settings={"help_option_names": ["-h", "--help"]})
 app.add_typer(
@@ -15,13 +18,36 @@ app.add_typer(
     name="config",
     short_help="配置管理系统，包含设置/查询/重置/添加/移除/选择配置项功能",
     )
+daemon_app = typer.Typer(context_settings={"help_option_names": ["-h", "--help"]})
+app.add_typer(
+    daemon_app,
+    name="daemon",
+    short_help="常驻守护进程管理，供git-ai-client、钩子和编辑器插件快速调用",
+    )
+hook_app = typer.Typer(context_settings={"help_option_names": ["-h", "--help"]})
+app.add_typer(
+    hook_app,
+    name="hook",
+    short_help="安装/移除prepare-commit-msg钩子，git commit时自动填入提交信息",
+    )
 
 @app.callback(invoke_without_command=True)
 def main(ctx: typer.Context, 
-help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
+help: bool = typer.Option(None, "--help", "-h", is_eager=True),
+profile: bool = typer.Option(False, "--profile", help="记录各阶段耗时，结束时输出汇总表并写出Chrome Trace文件")):
+    if profile or os.environ.get('GIT_AI_PROFILE'):
+        _enable_profile(ctx, profile)
     if help or ctx.invoked_subcommand is None:
         UIUtils.show_panel(UIUtils.get_help_content("main"), "智能提交工具 🚀")
 
+def _enable_profile(ctx: typer.Context, profile: bool):
+    """启用阶段耗时追踪，命令结束（包括异常退出）时输出汇总"""
+    from .. import tracing
+    if profile:
+        tracing.enable()
+    if tracing.is_enabled():
+        ctx.call_on_close(lambda: tracing.report(UIUtils.console))
+
 @config_app.callback(invoke_without_command=True)
 def config_callback(ctx: typer.Context, 
 help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
@@ -66,7 +92,7 @@ def config_list(show_full_key: bool = typer.Option(False, "--show-full-key", "-f
     if result[0]:
         import json
         formatted_json = json.dumps(result[1], indent=2, ensure_ascii=False)
-        with Console().pager():
+        with UIUtils.console.pager():
             UIUtils.show_panel(content=formatted_json, title="配置列表", padding=(0,1))
     else:
         UIUtils.show_error(message=result[1])
@@ -153,26 +179,48 @@ def select(
 def quick_push(
     remote: str = typer.Option("origin", "--remote", "-r", help="远程仓库名称"),
     branch: str = typer.Option("", "--branch", "-b", help="分支名称，默认为当前分支"),
+    no_stream: bool = typer.Option(False, "--no-stream", help="关闭流式输出，等待完整结果后再显示"),
+    no_speculative: bool = typer.Option(False, "--no-speculative", help="关闭后台预生成，确认暂存文件后才开始生成commit信息"),
     help: bool = typer.Option(None, "--help", "-h", is_eager=True)
 ):
     if help:
         UIUtils.show_panel(UIUtils.get_help_content("quick_push"), "快速提交")
         raise typer.Exit()
     
+    from ..core import CommitGenerator
+    from ..git_operations import GitOperations
+    from ..scheduler import StageGraph
+    graph = StageGraph()
     try:
         generator = CommitGenerator(ConfigManager())
         git_op = GitOperations()
-        branch = branch if branch else git_op.get_current_branch()
+        # 相互独立的git查询和远程分支探测并发执行，只在用到结果时等待：
+        # 一次git status同时得到分支、冲突、暂存区和未暂存文件，
+        # ls-remote网络探测与之后的交互、生成重叠，推送时通常已经完成
+        graph.add('snapshot', git_op.get_snapshot)
+        graph.add('branch', lambda snapshot: branch or git_op.get_current_branch(snapshot), after=['snapshot'])
+        graph.add('conflicts', generator.check_conflicts, after=['snapshot'])
+        graph.add('unpushed', git_op.get_unpushed_commits, after=['snapshot'])
+        graph.add('remote_probe', lambda target: git_op.remote_branch_exists(remote, target, interactive=False)
+                  if target else None, after=['branch'])
+        graph.start()
+        
+        snapshot = graph.result('snapshot')
+        branch = graph.result('branch')
         
         # 检查是否存在冲突
-        has_conflicts, conflict_files, conflict_blocks = generator.check_conflicts()
+        has_conflicts, conflict_files, conflict_blocks = graph.result('conflicts')
         if has_conflicts:
             UIUtils.show_conflicts(conflict_files, conflict_blocks)
             raise typer.Exit(code=1)
         
         # 检查暂存区状态
-        staged_files = git_op.get_staged_files()
+        staged_files = git_op.get_staged_files(snapshot)
+        speculative = not no_speculative
         if staged_files:
+            # 暂存区已确定，在用户选择操作期间后台预生成commit信息
+            if speculative:
+                generator.start_speculative()
             UIUtils.show_staged_files(staged_files)
             from questionary import select
             choice = select(
@@ -186,16 +234,14 @@ def quick_push(
         
             if choice == "1":
                 # 处理未暂存的文件
-                unstaged_files = git_op.get_unstaged_files()
+                unstaged_files = git_op.get_unstaged_files(snapshot)
                 if unstaged_files:
-                    from questionary import checkbox
-                    selected = checkbox(
-                        "请选择要add的文件：",
-                        choices=unstaged_files
-                    ).ask()                    
+                    selected = _select_files_to_add(unstaged_files)
                     if selected:
                         git_op.execute_add(selected)
                         UIUtils.show_success("文件已添加到暂存区")
+                        if speculative:
+                            generator.start_speculative()
                     else:
                         UIUtils.show_warning("未选择任何文件，已跳过add操作")
                 else:
@@ -204,38 +250,45 @@ def quick_push(
             elif choice == "2":
                 pass
             else:
+                generator.cancel_speculative()
                 UIUtils.show_warning("操作已取消")
                 return
         else:
             # 处理未暂存的文件
-            unstaged_files = git_op.get_unstaged_files()
+            unstaged_files = git_op.get_unstaged_files(snapshot)
             if unstaged_files:
-                from questionary import checkbox
-                selected = checkbox(
-                    "请选择要add的文件：",
-                    choices=unstaged_files
-                ).ask()                
+                selected = _select_files_to_add(unstaged_files)
                 if selected:
                     git_op.execute_add(selected)
                     UIUtils.show_success("文件已添加到暂存区")
+                    if speculative:
+                        generator.start_speculative()
                 else:
                     UIUtils.show_warning("未选择任何文件，已跳过add操作")
             else:
                 UIUtils.show_warning("没有未暂存的文件，已跳过add操作")       
-        if git_op.get_staged_files():
+        # 暂存区为空时diff为空，无需再执行一次git status
+        diff_content = generator.get_staged_diff()
+        committed = False
+        if diff_content:
             # 生成并执行commit
-            diff_content = git_op.get_staged_diff()
+            regenerate = False
             while True:
-                with Live(Spinner(name="dots", text="正在生成commit信息...")):
-                    commit_msg = _generate_commit(generator, diff_content)
+                commit_msg = None
+                if speculative and not regenerate:
+                    commit_msg = _follow_speculative(generator, diff_content, stream=not no_stream)
+                if not commit_msg:
+                    commit_msg = _generate_commit(generator, diff_content, stream=not no_stream,
+                                                  use_cache=not regenerate)
                 UIUtils.show_commit_preview(commit_msg)
                 try:
                     choice = typer.prompt("请选择操作 [u]使用/q退出/e编辑/r重新生成").lower()
-                except click.Abort:
+                except typer.Abort:
                     raise KeyboardInterrupt
                 
                 if choice == 'u':
                     generator.execute_commit(commit_msg)
+                    committed = True
                     UIUtils.show_success("提交成功！")
                     break
                 elif choice == 'q':
@@ -245,14 +298,16 @@ def quick_push(
                     edited_msg = typer.edit(commit_msg)
                     if edited_msg:
                         generator.execute_commit(edited_msg)
+                        committed = True
                         UIUtils.show_success("提交成功！")
                         break
                 elif choice == 'r':
+                    regenerate = True
                     continue
                 else:
                     UIUtils.show_error("无效的选择，请重新输入")
-        # 检查未推送的提交
-        unpushed_commits = git_op.get_unpushed_commits()
+        # 检查未推送的提交，未产生新提交时直接使用启动时并发查询的结果
+        unpushed_commits = git_op.get_unpushed_commits() if committed else graph.result('unpushed')
         if unpushed_commits:
             # 展示未推送提交
             UIUtils.show_unpushed_commits(unpushed_commits)
@@ -261,7 +316,7 @@ def quick_push(
             selected_ids = [commit['commit_id'] for commit in unpushed_commits]
             
             if typer.confirm(f"确认推送以下{len(selected_ids)}个提交到{remote}/{branch}分支？", default=True):
-                git_op.execute_push(remote, branch, selected_ids)
+                git_op.execute_push(remote, branch, selected_ids, branch_exists=_probe_result(graph))
                 UIUtils.show_success(f"成功推送 {len(selected_ids)} 个提交！")
                 
         else:
@@ -273,12 +328,78 @@ def quick_push(
     except Exception as e:
         UIUtils.show_error(str(e))
         raise typer.Exit(code=1)
+    finally:
+        graph.shutdown()
     
 
-def _generate_commit(generator, diff_content):
-    """生成commit信息核心逻辑"""
+def _probe_result(graph):
+    """取后台远程分支探测的结果，探测失败（如需要认证）时返回None，由推送时重新探测"""
+    try:
+        return graph.result('remote_probe')
+    except Exception:
+        return None
+
+
+def _select_files_to_add(unstaged_files):
+    """选择要add的文件，文件较多时使用可输入过滤的选择器"""
+    if len(unstaged_files) > PATH_PICKER_THRESHOLD:
+        from .path_picker import PathPicker
+        return PathPicker(unstaged_files, "请选择要add的文件：").ask()
+    from questionary import checkbox
+    return checkbox(
+        "请选择要add的文件：",
+        choices=unstaged_files
+    ).ask()
+
+
+def _follow_speculative(generator, diff_content, stream: bool = True):
+    """跟随后台预生成任务输出commit信息
+
+    流式模式下先回放已收到的块，再实时渲染后续的块，与前台生成的显示方式一致。
+    暂存区已变化、预生成失败或长时间没有新输出时返回None，由调用方在前台重新生成。
+    """
+    chunks = generator.follow_speculative(diff_content, timeout=SPECULATIVE_STALL_TIMEOUT)
+    if chunks is None:
+        return None
+    try:
+        return _render_chunks(chunks, stream)
+    except (RuntimeError, TimeoutError):
+        # 停止仍在进行的预生成，避免与前台生成同时请求模型
+        generator.cancel_speculative()
+        return None
+
+
+def _render_chunks(chunks, stream: bool = True) -> str:
+    """消费提交信息的文本块，流式模式下实时渲染到Live区域，结束后清除该区域"""
+    from rich.live import Live
+    from rich.panel import Panel
+    from rich.spinner import Spinner
+    from .. import tracing
+    commit_msg = ""
+    with Live(Spinner(name="dots", text="正在生成commit信息..."), transient=True) as live:
+        for chunk in chunks:
+            commit_msg += chunk
+            if stream:
+                with tracing.span('ui.render', 'ui'):
+                    live.update(Panel(commit_msg, title="[bold green]Git-AI[/] 正在生成commit信息...",
+                                      border_style="green", padding=(1, 2)))
+    return commit_msg.strip()
+
+
+def _generate_commit(generator, diff_content, stream: bool = True, use_cache: bool = True):
+    """生成commit信息核心逻辑
+    
+    流式模式下将模型逐块返回的文本实时渲染到Live区域，
+    生成结束后清除该区域，由调用方展示最终预览。
+    use_cache为False时跳过缓存强制重新生成（对应r操作）。
+    """
+    from rich.live import Live
+    from rich.spinner import Spinner
     try:
-        return generator.generate_commit_message(diff_content)
+        if not stream:
+            with Live(Spinner(name="dots", text="正在生成commit信息...")):
+                return generator.generate_commit_message(diff_content, use_cache=use_cache)
+        return _render_chunks(generator.generate_commit_message_stream(diff_content, use_cache=use_cache))
     except Exception as e:
         UIUtils.show_error(f"生成失败: {str(e)}")
         raise typer.Exit(code=1)
@@ -286,7 +407,9 @@ def _generate_commit(generator, diff_content):
 
 def _preview_commit_msg(commit_msg):
     """处理预览模式逻辑"""
-    UIUtils.show_panel(content=commit_msg, title="commit信息预览", padding=(1, 2))
+    from .. import tracing
+    with tracing.span('ui.preview', 'ui'):
+        UIUtils.show_panel(content=commit_msg, title="commit信息预览", padding=(1, 2))
 
 
 
@@ -294,6 +417,7 @@ def _preview_commit_msg(commit_msg):
 @app.command(help="智能生成并提交Git commit信息")
 def commit(
     preview: bool = typer.Option(False, "--preview", "-t", help="预览生成的commit信息而不直接提交"),
+    no_stream: bool = typer.Option(False, "--no-stream", help="关闭流式输出，等待完整结果后再显示"),
     help: bool = typer.Option(None, "--help", "-h", is_eager=True)
 ):
     if help:
@@ -305,6 +429,7 @@ def commit(
         UIUtils.show_error("请先配置AI模型后再使用此功能")
         raise typer.Exit(code=1)
 
+    from ..core import CommitGenerator
     try:
         generator = CommitGenerator(config)
         
@@ -312,15 +437,15 @@ def commit(
         has_conflicts, conflict_files, conflict_blocks = generator.check_conflicts()
         if has_conflicts:
             UIUtils.show_error("检测到Git冲突，请先解决以下冲突后再执行操作")
-            Console().print("\n[bold]冲突文件列表：[/]")
+            UIUtils.console.print("\n[bold]冲突文件列表：[/]")
             for i, file in enumerate(conflict_files, 1):
-                Console().print(f"  {i}. {file}")
+                UIUtils.console.print(f"  {i}. {file}")
             
             # 显示冲突代码块
             if conflict_blocks:
-                Console().print("\n[bold]冲突代码块：[/]")
+                UIUtils.console.print("\n[bold]冲突代码块：[/]")
                 for file, blocks in conflict_blocks.items():
-                    Console().print(f"\n[bold]文件：[/] {file}")
+                    UIUtils.console.print(f"\n[bold]文件：[/] {file}")
                     for i, block in enumerate(blocks, 1):
                         UIUtils.show_panel(content=block, title=f"冲突 #{i}", style="yellow", padding=(1, 2))
             
@@ -333,15 +458,16 @@ def commit(
             UIUtils.show_warning("没有检测到暂存区文件变更")
             raise typer.Exit(code=1)
 
+        regenerate = False
         while True:
-            with Live(Spinner(name="dots", text="正在生成commit信息...")):
-                commit_msg = _generate_commit(generator, diff_content)
+            commit_msg = _generate_commit(generator, diff_content, stream=not no_stream,
+                                          use_cache=not regenerate)
             _preview_commit_msg(commit_msg)
             if preview:
                 return  # 确保预览模式直接退出
             try:
                 choice = typer.prompt("请选择操作 [u]使用/q退出/e编辑/r重新生成").lower()
-            except click.Abort:
+            except typer.Abort:
                 raise KeyboardInterrupt
             
             if choice == 'u':
@@ -358,6 +484,7 @@ def commit(
                     UIUtils.show_success("提交成功！")
                     break
             elif choice == 'r':
+                regenerate = True
                 continue
             else:
                 UIUtils.show_error("无效选项，请重新选择")
@@ -369,5 +496,113 @@ def commit(
         UIUtils.show_error(str(e))
         raise typer.Exit(code=1)
 
+@daemon_app.callback(invoke_without_command=True)
+def daemon_callback(ctx: typer.Context,
+help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
+    if help or ctx.invoked_subcommand is None:
+        UIUtils.show_panel(UIUtils.get_help_content("daemon"), "守护进程 ⚙️")
+
+
+@daemon_app.command("start", help="启动常驻守护进程")
+def daemon_start(
+    foreground: bool = typer.Option(False, "--foreground", "-f", help="在前台运行"),
+    idle_timeout: float = typer.Option(None, "--idle-timeout", help="空闲多少秒后自动退出，0表示不退出"),
+    help: bool = typer.Option(None, "--help", "-h", is_eager=True)
+):
+    if help:
+        UIUtils.show_panel(UIUtils.get_help_content("daemon"), "守护进程 ⚙️")
+        raise typer.Exit()
+
+    from .. import daemon
+    if idle_timeout is None:
+        idle_timeout = daemon.DEFAULT_IDLE_TIMEOUT
+    try:
+        if foreground:
+            server = daemon.GitAIDaemon(idle_timeout=idle_timeout)
+            UIUtils.show_success(f"守护进程已启动: {server.socket_path}，按Ctrl+C退出")
+            try:
+                server.serve()
+            except KeyboardInterrupt:
+                pass
+            return
+        status = daemon.start_background(idle_timeout=idle_timeout)
+        UIUtils.show_success(f"守护进程已启动（pid {status['pid']}）: {status['socket']}")
+    except (RuntimeError, OSError) as e:
+        UIUtils.show_error(str(e))
+        raise typer.Exit(code=1)
+
+
+@daemon_app.command("stop", help="停止常驻守护进程")
+def daemon_stop(help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
+    if help:
+        UIUtils.show_panel(UIUtils.get_help_content("daemon"), "守护进程 ⚙️")
+        raise typer.Exit()
+
+    from .. import client
+    if client.shutdown():
+        UIUtils.show_success("守护进程已停止")
+    else:
+        UIUtils.show_warning("守护进程未运行")
+
+
+@daemon_app.command("status", help="查看常驻守护进程状态")
+def daemon_status(help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
+    if help:
+        UIUtils.show_panel(UIUtils.get_help_content("daemon"), "守护进程 ⚙️")
+        raise typer.Exit()
+
+    from .. import client
+    status = client.ping()
+    if status is None:
+        UIUtils.show_warning(f"守护进程未运行（{client.default_socket_path()}）")
+        raise typer.Exit(code=1)
+    UIUtils.show_success(f"守护进程运行中（pid {status['pid']}）: {status['socket']}\n"
+                         f"已运行 {status['uptime']:.0f} 秒，处理请求 {status['requests']} 次")
+
+
+@hook_app.callback(invoke_without_command=True)
+def hook_callback(ctx: typer.Context,
+help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
+    if help or ctx.invoked_subcommand is None:
+        UIUtils.show_panel(UIUtils.get_help_content("hook"), "提交钩子 🪝")
+
+
+@hook_app.command("install", help="在当前仓库安装prepare-commit-msg钩子")
+def hook_install(
+    timeout: float = typer.Option(None, "--timeout", "-t", help="生成时限(秒)，超时则使用空白模板"),
+    force: bool = typer.Option(False, "--force", "-f", help="覆盖已存在的其他prepare-commit-msg钩子"),
+    help: bool = typer.Option(None, "--help", "-h", is_eager=True)
+):
+    if help:
+        UIUtils.show_panel(UIUtils.get_help_content("hook"), "提交钩子 🪝")
+        raise typer.Exit()
+
+    from .. import hook
+    try:
+        path = hook.install(timeout if timeout is not None else hook.DEFAULT_HOOK_TIMEOUT, force)
+    except (RuntimeError, OSError) as e:
+        UIUtils.show_error(str(e))
+        raise typer.Exit(code=1)
+    UIUtils.show_success(f"钩子已安装: {path}")
+
+
+@hook_app.command("uninstall", help="移除git-ai安装的prepare-commit-msg钩子")
+def hook_uninstall(help: bool = typer.Option(None, "--help", "-h", is_eager=True)):
+    if help:
+        UIUtils.show_panel(UIUtils.get_help_content("hook"), "提交钩子 🪝")
+        raise typer.Exit()
+
+    from .. import hook
+    try:
+        removed = hook.uninstall()
+    except (RuntimeError, OSError) as e:
+        UIUtils.show_error(str(e))
+        raise typer.Exit(code=1)
+    if removed:
+        UIUtils.show_success("钩子已移除")
+    else:
+        UIUtils.show_warning("当前仓库未安装git-ai钩子")
+
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
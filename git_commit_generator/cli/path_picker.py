@@ -0,0 +1,151 @@
+from typing import List, Optional, Set
+
+from .file_selector import PathIndex
+
+# 列表区域最多显示的行数，只渲染这一窗口内的条目
+DEFAULT_VISIBLE_ROWS = 15
+
+
+class PathPicker:
+    """可输入过滤的文件多选器
+
+    输入框内容变化时通过PathIndex增量过滤，列表只渲染当前可见窗口内的条目，
+    文件数量很大时输入和渲染的耗时与总文件数无关。
+
+    按键：
+    - 输入字符：过滤路径（空格分隔多个关键词）
+    - ↑/↓、PageUp/PageDown：移动光标
+    - Tab/空格（输入框为空时）：切换当前条目的选中状态
+    - Ctrl+A：选中/取消当前过滤结果中的全部条目
+    - Enter：确认；Ctrl+C/Esc：取消
+    """
+
+    def __init__(self, files: List[str], message: str = "请选择要add的文件：",
+                 visible_rows: int = DEFAULT_VISIBLE_ROWS):
+        self.index = PathIndex.from_files(files)
+        self.message = message
+        self.visible_rows = visible_rows
+        self.matches: List[int] = self.index.search('')
+        self.selected: Set[int] = set()
+        self.cursor = 0
+        self.offset = 0
+
+    def _refilter(self, text: str):
+        self.matches = self.index.search(text)
+        self.cursor = 0
+        self.offset = 0
+
+    def _move(self, delta: int):
+        if not self.matches:
+            return
+        self.cursor = max(0, min(len(self.matches) - 1, self.cursor + delta))
+        if self.cursor < self.offset:
+            self.offset = self.cursor
+        elif self.cursor >= self.offset + self.visible_rows:
+            self.offset = self.cursor - self.visible_rows + 1
+
+    def _toggle_current(self):
+        if self.matches:
+            node = self.matches[self.cursor]
+            self.selected.symmetric_difference_update({node})
+
+    def _toggle_all(self):
+        matches = set(self.matches)
+        if matches <= self.selected:
+            self.selected -= matches
+        else:
+            self.selected |= matches
+
+    def _render_list(self):
+        """只生成可见窗口内的格式化文本"""
+        lines = []
+        window = self.matches[self.offset:self.offset + self.visible_rows]
+        for row, node in enumerate(window, self.offset):
+            pointer = '❯' if row == self.cursor else ' '
+            mark = '●' if node in self.selected else '○'
+            style = 'class:pointer' if row == self.cursor else ''
+            lines.append((style, f" {pointer} {mark} {self.index.value(node)}\n"))
+        if not window:
+            lines.append(('class:hint', "   没有匹配的文件\n"))
+        return lines
+
+    def _render_status(self):
+        return [('class:hint',
+                 f" 匹配 {len(self.matches)}/{len(self.index.nodes)} · 已选 {len(self.selected)} · "
+                 f"Tab切换 Ctrl+A全选 Enter确认")]
+
+    def ask(self) -> Optional[List[str]]:
+        """运行选择器
+
+        Returns:
+            Optional[List[str]]: 选中的文件路径（按树的先序排列），用户取消时返回None
+        """
+        from prompt_toolkit.application import Application
+        from prompt_toolkit.buffer import Buffer
+        from prompt_toolkit.key_binding import KeyBindings
+        from prompt_toolkit.layout import HSplit, Layout, Window
+        from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl
+        from prompt_toolkit.layout.dimension import Dimension
+        from prompt_toolkit.styles import Style
+
+        search_buffer = Buffer(multiline=False, on_text_changed=lambda buf: self._refilter(buf.text))
+        bindings = KeyBindings()
+
+        @bindings.add('up')
+        def _(event):
+            self._move(-1)
+
+        @bindings.add('down')
+        def _(event):
+            self._move(1)
+
+        @bindings.add('pageup')
+        def _(event):
+            self._move(-self.visible_rows)
+
+        @bindings.add('pagedown')
+        def _(event):
+            self._move(self.visible_rows)
+
+        @bindings.add('tab')
+        def _(event):
+            self._toggle_current()
+
+        @bindings.add(' ')
+        def _(event):
+            # 输入框为空时空格用于切换选中，否则作为关键词分隔符输入
+            if search_buffer.text:
+                search_buffer.insert_text(' ')
+            else:
+                self._toggle_current()
+
+        @bindings.add('c-a')
+        def _(event):
+            self._toggle_all()
+
+        @bindings.add('enter')
+        def _(event):
+            event.app.exit(result=[self.index.value(node) for node in sorted(self.selected)])
+
+        @bindings.add('c-c')
+        @bindings.add('escape', eager=True)
+        def _(event):
+            event.app.exit(result=None)
+
+        layout = Layout(HSplit([
+            Window(FormattedTextControl([('class:question', f"? {self.message}")]), height=1),
+            Window(BufferControl(buffer=search_buffer), height=1,
+                   get_line_prefix=lambda line, wrap: [('class:prompt', ' 过滤: ')]),
+            Window(FormattedTextControl(self._render_list),
+                   height=Dimension(max=self.visible_rows)),
+            Window(FormattedTextControl(self._render_status), height=1),
+        ]), focused_element=search_buffer)
+
+        style = Style.from_dict({
+            'question': 'bold',
+            'prompt': 'fg:ansicyan',
+            'pointer': 'fg:ansicyan bold',
+            'hint': 'fg:ansibrightblack',
+        })
+        application = Application(layout=layout, key_bindings=bindings, style=style, full_screen=False)
+        return application.run()
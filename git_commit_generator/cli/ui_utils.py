@@ -1,13 +1,23 @@
-from rich.console import Console
-from rich.panel import Panel
-from rich.live import Live
-from rich.spinner import Spinner
 from typing import Dict, List
 
+
+class _LazyConsole:
+    """延迟创建rich Console，避免仅导入UIUtils时就加载rich"""
+
+    def __init__(self):
+        self._console = None
+
+    def __get__(self, instance, owner):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
+
+
 class UIUtils:
     """UI工具类，用于处理界面展示相关的功能"""
     
-    console = Console()
+    console = _LazyConsole()
     
     @classmethod
     def get_help_content(cls, command_name: str) -> str:
@@ -26,6 +36,12 @@ class UIUtils:
   [bold]commit[/]    - 智能生成并提交Git commit信息
   [bold]quick-push[/] - 快速完成add、commit和push操作
   [bold]config[/]    - 配置管理系统
+  [bold]daemon[/]    - 常驻守护进程管理
+  [bold]hook[/]      - 安装/移除prepare-commit-msg钩子
+
+  [bold]全局选项:[/]
+  [bold]--profile[/] - 记录各阶段耗时，结束时输出汇总表并写出Chrome Trace文件
+              (也可设置环境变量 GIT_AI_PROFILE=1 或 GIT_AI_PROFILE=trace.json)
 
 使用 [bold]git-ai COMMAND --help[/] 查看命令详细用法""",
             
@@ -113,23 +129,58 @@ class UIUtils:
 [bold]参数:[/]
   -r, --remote TEXT     远程仓库名称，默认为origin
   -b, --branch TEXT     分支名称，默认为当前分支
+  --no-stream           关闭流式输出，等待完整结果后再显示
+  --no-speculative      关闭后台预生成，确认暂存文件后才开始生成commit信息
   -h, --help            显示帮助信息
 
 [bold]描述:[/]
   快速提交命令，检测git状态并智能处理：
   - 检查是否存在冲突，如有则显示冲突文件和代码块
   - 检查暂存区文件状态，提供继续add、执行commit或退出选项
-  - 交互式选择需要add的文件
+  - 交互式选择需要add的文件（文件较多时可输入关键词过滤）
+  - 暂存区确定后即在后台预生成commit信息，暂存区变化时自动重新生成
   - 显示未推送的commit列表，执行push操作
 
 [bold]示例:[/]
   git-ai quick-push
   git-ai quick-push -r upstream -b develop""",
             
+            "daemon": """[bold]可用命令:[/]
+  [bold]start[/]   - 启动常驻守护进程（-f 在前台运行，--idle-timeout 设置空闲退出秒数）
+  [bold]stop[/]    - 停止守护进程
+  [bold]status[/]  - 查看守护进程状态
+
+[bold]描述:[/]
+  守护进程常驻内存，保持已加载的配置、模型连接和缓存，
+  通过 git-ai-client 生成提交信息时无需重新启动解释器和建立连接，
+  适合git钩子和编辑器插件调用
+
+[bold]示例:[/]
+  git-ai daemon start
+  git-ai-client --stream
+  git-ai daemon stop""",
+
+            "hook": """[bold]可用命令:[/]
+  [bold]install[/]   - 在当前仓库安装prepare-commit-msg钩子
+                -t, --timeout 生成时限(秒)，默认10秒
+                -f, --force   覆盖已存在的其他钩子
+  [bold]uninstall[/] - 移除git-ai安装的钩子
+
+[bold]描述:[/]
+  安装后执行 git commit（未使用-m/-F等给出提交信息时）会自动把生成的提交信息填入编辑器，
+  不显示任何交互界面。守护进程运行时优先通过守护进程生成，暂存区未变化时直接复用缓存，
+  超过时限则保留空白模板，任何失败都不会阻止提交
+
+[bold]示例:[/]
+  git-ai hook install
+  git-ai hook install -t 5
+  git-ai hook uninstall""",
+
             "commit": """[bold]命令:[/] git-ai commit [options]
 
 [bold]参数:[/]
   -t, --preview         预览生成的commit信息而不直接提交
+  --no-stream           关闭流式输出，等待完整结果后再显示
   -h, --help            显示帮助信息
 
 [bold]描述:[/]
@@ -167,6 +218,7 @@ class UIUtils:
             style: 边框样式
             padding: 内边距
         """
+        from rich.panel import Panel
         panel = Panel(
             content,
             title=f'[bold {style}]Git-AI[/] {title}' if not title.startswith('[bold') else title,
@@ -244,6 +296,8 @@ class UIUtils:
         Returns:
             Live: 加载动画上下文管理器
         """
+        from rich.live import Live
+        from rich.spinner import Spinner
         return Live(Spinner(name="dots", text=text))
     
     @classmethod
@@ -0,0 +1,149 @@
+"""git-ai守护进程的轻量客户端
+
+只依赖标准库，不导入rich/typer/requests以及生成器相关模块，
+适合在git钩子、编辑器插件等对启动耗时敏感的场景中调用：
+
+    git-ai-client                # 生成当前仓库暂存区的提交信息并输出到标准输出
+    git-ai-client --stream       # 边生成边输出
+    git-ai-client --no-cache     # 跳过缓存重新生成
+
+退出码：0成功，1生成失败，2守护进程未运行（调用方可据此退回 git-ai commit --preview）。
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 客户端与守护进程之间的协议版本，不兼容的修改需要递增
+PROTOCOL_VERSION = 1
+# 连接守护进程的超时（秒），守护进程未运行时应立即失败
+CONNECT_TIMEOUT = 1.0
+# 等待生成结果的超时（秒）
+DEFAULT_TIMEOUT = 120.0
+
+EXIT_ERROR = 1
+EXIT_NOT_RUNNING = 2
+
+
+class DaemonNotRunning(ConnectionError):
+    """守护进程未运行或套接字不可连接"""
+
+
+def default_socket_path() -> str:
+    """守护进程的套接字路径，优先使用GIT_AI_SOCKET，其次为运行时目录或缓存目录"""
+    env_path = os.environ.get('GIT_AI_SOCKET')
+    if env_path:
+        return env_path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'git-ai.sock')
+    # 与cache.default_cache_dir保持一致，此处不导入以减少启动开销
+    cache_dir = os.environ.get('GIT_AI_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'git-ai')
+    return os.path.join(cache_dir, 'daemon.sock')
+
+
+def request(payload: Dict[str, Any], socket_path: Optional[str] = None,
+            timeout: float = DEFAULT_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """发送一条请求并逐条产出守护进程返回的JSON消息
+
+    Raises:
+        DaemonNotRunning: 无法连接守护进程
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise DaemonNotRunning("当前平台不支持Unix域套接字")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except OSError as e:
+            raise DaemonNotRunning(f"无法连接git-ai守护进程: {str(e)}")
+        sock.settimeout(timeout)
+        payload = dict(payload, version=PROTOCOL_VERSION)
+        sock.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            for line in reader:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        sock.close()
+
+
+def ping(socket_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """守护进程运行时返回其状态信息，否则返回None"""
+    try:
+        for message in request({'command': 'ping'}, socket_path, timeout=CONNECT_TIMEOUT):
+            return message
+    except (DaemonNotRunning, OSError, ValueError):
+        return None
+    return None
+
+
+def shutdown(socket_path: Optional[str] = None) -> bool:
+    """请求守护进程退出，守护进程未运行时返回False"""
+    try:
+        for message in request({'command': 'shutdown'}, socket_path, timeout=CONNECT_TIMEOUT):
+            return bool(message.get('ok'))
+    except (DaemonNotRunning, OSError, ValueError):
+        return False
+    return False
+
+
+def generate(cwd: Optional[str] = None, use_cache: bool = True,
+             on_chunk: Optional[Callable[[str], None]] = None,
+             socket_path: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT) -> str:
+    """通过守护进程生成cwd（默认当前目录）所在仓库暂存区的提交信息
+
+    Args:
+        on_chunk: 流式接收文本块的回调，为空时守护进程只返回完整结果
+
+    Raises:
+        DaemonNotRunning: 无法连接守护进程
+        RuntimeError: 生成失败或暂存区为空
+    """
+    payload = {'command': 'generate', 'cwd': os.path.abspath(cwd or os.getcwd()),
+               'use_cache': use_cache, 'stream': on_chunk is not None}
+    for message in request(payload, socket_path, timeout):
+        if 'chunk' in message:
+            if on_chunk is not None:
+                on_chunk(message['chunk'])
+        elif 'message' in message:
+            return message['message']
+        elif 'error' in message:
+            raise RuntimeError(message['error'])
+    raise RuntimeError("守护进程未返回结果")
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='git-ai-client', description="通过git-ai守护进程生成提交信息")
+    parser.add_argument('--stream', action='store_true', help="边生成边输出")
+    parser.add_argument('--no-cache', action='store_true', help="跳过缓存重新生成")
+    parser.add_argument('--socket', help="守护进程套接字路径")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="等待结果的超时(秒)")
+    parser.add_argument('-C', dest='cwd', help="仓库目录，默认为当前目录")
+    options = parser.parse_args(args)
+
+    def write_chunk(chunk: str):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+    try:
+        message = generate(options.cwd, use_cache=not options.no_cache,
+                           on_chunk=write_chunk if options.stream else None,
+                           socket_path=options.socket, timeout=options.timeout)
+    except DaemonNotRunning as e:
+        print(f"{str(e)}，请先执行 git-ai daemon start", file=sys.stderr)
+        return EXIT_NOT_RUNNING
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"生成失败: {str(e)}", file=sys.stderr)
+        return EXIT_ERROR
+    # 流式输出时文本已逐块写出，只补一个换行
+    sys.stdout.write('\n' if options.stream else f"{message}\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,16 @@
-from re import T
-import re
 from typing import Callable, Union
 import json
 import os
 
-from click.core import F
-import typer
-from questionary import confirm, select
-
-from .models.provider import Provider
+from .config_store import ConfigStore, CONFIG_FILE
 
 
 
 class ConfigManager:
     def __init__(self):
-        config_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        self.config_file = os.path.join(config_dir, '.config.json')
+        self.config_file = CONFIG_FILE
         # 自动创建配置目录
-        os.makedirs(config_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
         
     def _mask_api_key(self, api_key: str) -> str:
         """对API密钥进行掩码处理，只显示前4位和后4位"""
@@ -34,13 +27,8 @@ class ConfigManager:
             return {}
 
     def _load_config(self) -> dict:
-        """加载配置文件统一入口"""
-        return self._handle_file_operation(
-            file_path=self.config_file,
-            mode='r',
-            success_handler=lambda f: json.load(f) if os.path.exists(self.config_file) else {},
-            error_prefix='读取配置'
-        )
+        """加载配置文件统一入口，文件未变化时直接使用进程内缓存"""
+        return ConfigStore.load_json_copy(self.config_file, {}) or {}
 
     def _save_config(self, config: dict):
         """保存配置统一入口"""
@@ -50,6 +38,7 @@ class ConfigManager:
             success_handler=lambda f: json.dump(config, f, indent=4, ensure_ascii=False),
             error_prefix='保存配置'
         )
+        ConfigStore.invalidate(self.config_file)
 
     def _validate_input(self, key: str, value: Union[str, int]):
         """
@@ -61,7 +50,11 @@ class ConfigManager:
         validator = FieldValidatorFactory.get_validator(key)
         validated_value = validator.validate(value)
         # 保留原有配置项白名单检查
-        if key not in ['current_provider', 'model_name', 'model_url', 'api_key', 'max_tokens']:
+        if key not in ['current_provider', 'model_name', 'model_url', 'api_key', 'max_tokens',
+                       'connect_timeout', 'read_timeout', 'pool_maxsize', 'context_window',
+                       'hedge_provider', 'hedge_delay', 'max_retries', 'fallback_providers',
+                       'rpm', 'tpm', 'max_in_flight', 'shared_rate_limit',
+                       'max_diff_bytes', 'max_file_diff_bytes', 'diff_context_lines']:
             return False, f"无效的配置项: {key}"
         return True, validated_value
 
@@ -114,9 +107,13 @@ class ConfigManager:
         """
         # 输入参数验证
         try:
-            self._validate_input(key, value)
+            valid, result = self._validate_input(key, value)
         except Exception as e:
             return False, f"{key}输入错误:{str(e)}，设置失败"
+        if not valid:
+            return False, result
+        # 保存验证器规范化后的值（如512K换算为字节数）
+        value = result
         
         self._config = self._load_config()
         if 'providers' not in self._config:
@@ -133,6 +130,12 @@ class ConfigManager:
             # 更新全局配置
             if key == 'current_provider' and value not in self._config['providers']:
                 return False, f"模型提供商 {value} 不存在"
+            if key == 'hedge_provider' and value != 'none' and value not in self._config['providers']:
+                return False, f"模型提供商 {value} 不存在"
+            if key == 'fallback_providers' and value != 'none':
+                missing = [name.strip() for name in value.split(',') if name.strip() not in self._config['providers']]
+                if missing:
+                    return False, f"模型提供商 {', '.join(missing)} 不存在"
             self._config[key] = value
             return_value = f"已成功更新 {key} 配置"
         self._save_config(self._config)
@@ -140,6 +143,7 @@ class ConfigManager:
 
     def _retry_or_pass(self, key, zh_key, default_value=None):
         """与用户交互 用户输入内容不合法重试"""
+        import typer
         while True:
             if default_value:
                 value = typer.prompt(f"请输入{zh_key}：", default=default_value)
@@ -155,6 +159,8 @@ class ConfigManager:
 
     def config_newpro(self):
         """新增模型配置"""
+        from questionary import select
+        from .models.provider import Provider
         base_provider = Provider()
         providers = base_provider.get_providers()
         choices = [
@@ -207,6 +213,7 @@ class ConfigManager:
         """
         交互式选择当前使用模型
         """
+        from questionary import select
         try:
             self._config = self._load_config()
 
@@ -239,7 +246,9 @@ class ConfigManager:
 
     def config_remove(self, provider_name: Union[str, None] = None, all_flag: bool = False):
         """移除指定或全部模型配置"""
-        
+        import typer
+        from questionary import confirm
+
         self._config = self._load_config()
 
         if not self._config.get('providers'):
@@ -284,6 +293,7 @@ class ConfigManager:
         try:
             if os.path.exists(self.config_file):
                 os.remove(self.config_file)
+            ConfigStore.invalidate(self.config_file)
             self._config = {}
             return True, "配置已重置"
         except Exception as e:
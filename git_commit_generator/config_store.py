@@ -0,0 +1,220 @@
+import copy
+import json
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# 用户配置文件与内置提供商目录的位置，配置文件可通过GIT_AI_CONFIG环境变量指定
+CONFIG_FILE = os.environ.get('GIT_AI_CONFIG') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.config.json')
+PROVIDER_FILE = os.path.join(os.path.dirname(__file__), 'models', '.provider.json')
+
+# 提供商配置项的默认值
+DEFAULT_MAX_TOKENS = 1024
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_MAX_RETRIES = 2
+# 对冲请求：主提供商在该时间（秒）内未返回首个token时向备用提供商发出同一请求
+DEFAULT_HEDGE_DELAY = 2.0
+# 读取暂存区diff时保留的最大字节数（总量/单个文件），超出部分只保留文件头与统计
+DEFAULT_MAX_DIFF_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_FILE_DIFF_BYTES = 512 * 1024
+# 读取diff时每个hunk的上下文行数（git diff -U）
+DEFAULT_DIFF_CONTEXT_LINES = 3
+
+
+class ConfigStore:
+    """进程级JSON配置缓存
+
+    每个文件只在首次访问或其mtime/大小变化后重新解析，
+    同一次运行中ConfigManager、Provider和ModelAdapter共享解析结果。
+    """
+
+    _cache: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def load_json(cls, path: str, default: Any = None) -> Any:
+        """读取并缓存JSON文件，返回的对象为共享实例，调用方不得修改
+
+        Args:
+            path: 文件路径
+            default: 文件不存在或解析失败时的返回值
+
+        Returns:
+            Any: 解析后的JSON对象
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            cls.invalidate(path)
+            return default
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        cached = cls._cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with cls._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return default
+            cls._cache[path] = (signature, data)
+            return data
+
+    @classmethod
+    def load_json_copy(cls, path: str, default: Any = None) -> Any:
+        """读取JSON文件并返回可自由修改的深拷贝"""
+        return copy.deepcopy(cls.load_json(path, default))
+
+    @classmethod
+    def invalidate(cls, path: Optional[str] = None):
+        """使指定文件（为空时为全部文件）的缓存失效"""
+        with cls._lock:
+            if path is None:
+                cls._cache.clear()
+            else:
+                cls._cache.pop(path, None)
+
+
+class ProviderProfile(NamedTuple):
+    """不可变的提供商配置，由用户配置与内置提供商目录合并而成"""
+    name: str
+    provider_type: str
+    api_key: str
+    model_name: str
+    model_url: str
+    max_tokens: int
+    context_window: int
+    connect_timeout: float
+    read_timeout: float
+    pool_maxsize: int
+    max_retries: int
+    rpm: int
+    tpm: int
+    max_in_flight: int
+    shared_rate_limit: bool
+
+
+def _as_number(value: Any, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def get_provider_profile(provider_name: Optional[str] = None) -> ProviderProfile:
+    """获取提供商配置
+
+    Args:
+        provider_name: 提供商名称，为空时使用当前选中的提供商
+
+    Returns:
+        ProviderProfile: 提供商配置，用户未配置的项取内置目录或默认值
+    """
+    config = ConfigStore.load_json(CONFIG_FILE, {}) or {}
+    if provider_name is None:
+        provider_name = config.get('current_provider') or ''
+    user = config.get('providers', {}).get(provider_name, {}) or {}
+    builtin = (ConfigStore.load_json(PROVIDER_FILE, {}) or {}).get(provider_name, {})
+
+    return ProviderProfile(
+        name=provider_name,
+        provider_type=builtin.get('provider', 'OtherProvider'),
+        api_key=user.get('api_key', ''),
+        model_name=user.get('model_name', ''),
+        model_url=user.get('model_url', ''),
+        max_tokens=_as_number(user.get('max_tokens'), int, DEFAULT_MAX_TOKENS),
+        context_window=_as_number(user.get('context_window', builtin.get('context_window')),
+                                  int, DEFAULT_CONTEXT_WINDOW),
+        connect_timeout=_as_number(user.get('connect_timeout'), float, DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=_as_number(user.get('read_timeout'), float, DEFAULT_READ_TIMEOUT),
+        pool_maxsize=_as_number(user.get('pool_maxsize'), int, DEFAULT_POOL_MAXSIZE),
+        max_retries=max(0, _as_number(user.get('max_retries'), int, DEFAULT_MAX_RETRIES)),
+        # 限流配置，0表示不限制
+        rpm=max(0, _as_number(user.get('rpm'), int, 0)),
+        tpm=max(0, _as_number(user.get('tpm'), int, 0)),
+        max_in_flight=max(0, _as_number(user.get('max_in_flight'), int, 0)),
+        shared_rate_limit=_as_bool(user.get('shared_rate_limit', False)),
+    )
+
+
+class HedgePolicy(NamedTuple):
+    """对冲请求配置"""
+    provider: str
+    delay: float
+
+
+def get_hedge_policy(primary: Optional[str] = None) -> Optional[HedgePolicy]:
+    """获取对冲请求配置
+
+    对冲为可选功能，只有在全局配置了hedge_provider、且该提供商已配置并与主提供商不同时才启用。
+
+    Args:
+        primary: 主提供商名称，为空时使用当前选中的提供商
+
+    Returns:
+        Optional[HedgePolicy]: 未启用时为None
+    """
+    config = ConfigStore.load_json(CONFIG_FILE, {}) or {}
+    if primary is None:
+        primary = config.get('current_provider') or ''
+    hedge_provider = config.get('hedge_provider') or ''
+    if not hedge_provider or hedge_provider == primary or hedge_provider not in config.get('providers', {}):
+        return None
+    delay = max(0.0, _as_number(config.get('hedge_delay'), float, DEFAULT_HEDGE_DELAY))
+    return HedgePolicy(provider=hedge_provider, delay=delay)
+
+
+class DiffLimits(NamedTuple):
+    """读取暂存区diff的字节上限与上下文行数"""
+    max_bytes: int
+    max_file_bytes: int
+    context_lines: int
+
+
+def get_diff_limits() -> DiffLimits:
+    """获取全局配置的diff读取限制，单个文件的上限不超过总量上限"""
+    config = ConfigStore.load_json(CONFIG_FILE, {}) or {}
+    max_bytes = max(1024, _as_number(config.get('max_diff_bytes'), int, DEFAULT_MAX_DIFF_BYTES))
+    max_file_bytes = max(1024, _as_number(config.get('max_file_diff_bytes'), int, DEFAULT_MAX_FILE_DIFF_BYTES))
+    context_lines = max(0, _as_number(config.get('diff_context_lines'), int, DEFAULT_DIFF_CONTEXT_LINES))
+    return DiffLimits(max_bytes=max_bytes, max_file_bytes=min(max_file_bytes, max_bytes),
+                      context_lines=context_lines)
+
+
+def get_fallback_providers(primary: Optional[str] = None) -> List[str]:
+    """获取备用提供商链
+
+    全局配置fallback_providers可以是列表或逗号分隔的字符串，
+    未配置的提供商和主提供商本身会被忽略。
+
+    Args:
+        primary: 主提供商名称，为空时使用当前选中的提供商
+
+    Returns:
+        List[str]: 按配置顺序排列的备用提供商名称
+    """
+    config = ConfigStore.load_json(CONFIG_FILE, {}) or {}
+    if primary is None:
+        primary = config.get('current_provider') or ''
+    names = config.get('fallback_providers') or []
+    if isinstance(names, str):
+        names = names.split(',')
+    configured = config.get('providers', {})
+    result = []
+    for name in names:
+        name = str(name).strip()
+        if name and name != primary and name in configured and name not in result:
+            result.append(name)
+    return result
@@ -0,0 +1,187 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from git_commit_generator.git_backend import BINARY_SNIFF_BYTES
+
+# 单个冲突段（ours/base/theirs）最多保留的字节数，超出部分只记录省略行数
+MAX_SECTION_BYTES = 16 * 1024
+# 单个文件最多提取的冲突块数
+MAX_BLOCKS_PER_FILE = 50
+# 单次读取的最大行长度，超长行按片段读取，内存占用与行长无关
+MAX_LINE_BYTES = 64 * 1024
+# 并发扫描的文件数上限
+MAX_SCAN_WORKERS = 8
+
+MARKER_LEN = 7
+OURS_MARKER = b'<' * MARKER_LEN
+BASE_MARKER = b'|' * MARKER_LEN
+SEPARATOR_MARKER = b'=' * MARKER_LEN
+THEIRS_MARKER = b'>' * MARKER_LEN
+
+
+class _Section:
+    """冲突块中的一段内容，超过上限后只计数不再保存"""
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.lines: List[bytes] = []
+        self.size = 0
+        self.omitted = 0
+
+    def append(self, line: bytes):
+        if self.size + len(line) > MAX_SECTION_BYTES:
+            # 超长行的多个片段只计为一行
+            if line.endswith(b'\n'):
+                self.omitted += 1
+            return
+        self.lines.append(line)
+        self.size += len(line)
+
+    def render(self) -> str:
+        text = b''.join(self.lines).decode('utf-8', errors='replace').strip()
+        if self.omitted:
+            text += f"\n... 已省略{self.omitted}行"
+        return text
+
+
+def _is_marker(line: bytes, marker: bytes) -> bool:
+    """判断是否为冲突标记行：7个标记字符后紧跟空白或行尾"""
+    if not line.startswith(marker):
+        return False
+    rest = line[MARKER_LEN:MARKER_LEN + 1]
+    return rest in (b'', b'\n', b'\r', b' ', b'\t')
+
+
+def _marker_label(line: bytes) -> str:
+    return line[MARKER_LEN:].decode('utf-8', errors='replace').strip()
+
+
+def _render_block(ours: _Section, base: Optional[_Section], theirs: _Section, theirs_label: str) -> str:
+    parts = [f"<<<<<<< {ours.label or 'HEAD'}", ours.render()]
+    if base is not None:
+        parts += [f"||||||| {base.label or 'BASE'}", base.render()]
+    parts += ["=======", theirs.render(), f">>>>>>> {theirs_label or 'BRANCH'}"]
+    return '\n'.join(parts)
+
+
+def scan_file(path: str, max_blocks: int = MAX_BLOCKS_PER_FILE) -> List[str]:
+    """逐行扫描文件，提取冲突块
+
+    支持diff3风格的 ||||||| 基础版本段。按字节流式读取，
+    内存占用只与单个冲突段的上限有关，与文件大小无关。
+
+    Args:
+        path: 文件路径
+        max_blocks: 最多提取的冲突块数
+
+    Returns:
+        List[str]: 冲突块文本列表
+    """
+    blocks = []
+    ours: Optional[_Section] = None
+    base: Optional[_Section] = None
+    theirs: Optional[_Section] = None
+    current: Optional[_Section] = None
+    at_line_start = True
+
+    with open(path, 'rb') as f:
+        while len(blocks) < max_blocks:
+            line = f.readline(MAX_LINE_BYTES)
+            if not line:
+                break
+            # 超长行被截成多个片段时，只有第一个片段可能是标记行
+            is_line_start = at_line_start
+            at_line_start = line.endswith(b'\n')
+
+            if is_line_start and _is_marker(line, OURS_MARKER):
+                ours, base, theirs = _Section(_marker_label(line)), None, None
+                current = ours
+            elif ours is None:
+                continue
+            elif is_line_start and theirs is None and base is None and _is_marker(line, BASE_MARKER):
+                base = _Section(_marker_label(line))
+                current = base
+            elif is_line_start and theirs is None and _is_marker(line, SEPARATOR_MARKER):
+                theirs = _Section()
+                current = theirs
+            elif is_line_start and theirs is not None and _is_marker(line, THEIRS_MARKER):
+                blocks.append(_render_block(ours, base, theirs, _marker_label(line)))
+                ours = base = theirs = current = None
+            else:
+                current.append(line)
+    return blocks
+
+
+def _is_binary(content: bytes) -> bool:
+    return b'\x00' in content[:BINARY_SNIFF_BYTES]
+
+
+def _stage_section(content: Optional[bytes]) -> _Section:
+    """将暂存区中的一个版本转换为冲突段，已删除和二进制的版本只给出说明"""
+    section = _Section()
+    if content is None:
+        section.append("（文件已删除）".encode('utf-8'))
+    elif _is_binary(content):
+        section.append(f"（二进制文件，{len(content)}字节）".encode('utf-8'))
+    else:
+        for line in content.splitlines(keepends=True):
+            section.append(line)
+    return section
+
+
+def render_stages(stages: Dict[int, Optional[bytes]]) -> List[str]:
+    """将暂存区中冲突文件的各版本渲染为冲突块
+
+    用于工作区中没有冲突标记的冲突，如修改/删除冲突和二进制文件冲突。
+
+    Args:
+        stages: 1（共同祖先）、2（ours）、3（theirs）-> 文件内容，该版本不存在时为None
+
+    Returns:
+        List[str]: 只含一个冲突块的列表；两侧都是文本文件时git会在工作区写入冲突标记，
+        此时没有标记说明冲突已在工作区解决，返回空列表
+    """
+    ours, theirs = stages.get(2), stages.get(3)
+    if ours is None and theirs is None:
+        return []
+    if not (ours is None or theirs is None or _is_binary(ours) or _is_binary(theirs)):
+        return []
+    base = _stage_section(stages[1]) if stages.get(1) is not None else None
+    return [_render_block(_stage_section(ours), base, _stage_section(theirs), '')]
+
+
+def scan_files(paths: List[str], max_workers: int = MAX_SCAN_WORKERS,
+               read_stages: Optional[Callable[[str], Dict[int, Optional[bytes]]]] = None) -> Dict[str, List[str]]:
+    """并发扫描多个冲突文件
+
+    Args:
+        paths: 冲突文件路径
+        max_workers: 并发扫描的文件数上限
+        read_stages: 读取文件在暂存区中各版本的函数；工作区文件不存在或没有冲突标记时，
+            用它从暂存区取出各版本内容生成冲突块
+
+    Returns:
+        Dict[str, List[str]]: 文件路径 -> 冲突块列表；文件不存在或读取失败时为包含错误信息的列表，
+        未找到冲突标记的文件不出现在结果中
+    """
+    def scan(path: str) -> List[str]:
+        exists = os.path.exists(path)
+        blocks = []
+        if exists:
+            try:
+                blocks = scan_file(path)
+            except OSError as e:
+                return [f"无法读取文件{path}的冲突内容: {str(e)}"]
+        if not blocks and read_stages is not None:
+            blocks = render_stages(read_stages(path))
+        if not blocks and not exists:
+            return [f"冲突文件不存在: {path}"]
+        return blocks
+
+    if not paths:
+        return {}
+    workers = max(1, min(max_workers, len(paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(scan, paths))
+    return {path: blocks for path, blocks in zip(paths, results) if blocks}
@@ -1,27 +1,304 @@
 from git_commit_generator.config import ConfigManager
 from git_commit_generator.models.adapter import ModelAdapter
+from git_commit_generator.models.provider import Prompt
 from git_commit_generator.git_operations import GitOperations
-from typing import Optional, List, Tuple, Dict
+from git_commit_generator.repo_snapshot import RepoSnapshot
+from git_commit_generator.cache import MessageCache
+from git_commit_generator.diff_compactor import DiffCompactor, FileDiff
+from git_commit_generator.speculative import SpeculativeGenerator
+from git_commit_generator import tracing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, List, Tuple, Dict, Iterator
+
+# 提示词模板版本，修改_build_prompt的内容时需同步递增，使旧缓存失效
+PROMPT_TEMPLATE_VERSION = "2"
+# map阶段并发请求数上限
+MAP_REDUCE_MAX_WORKERS = 4
+# 估算diff字符/token比例时最多取样的字符数，避免超大diff的估算本身成为开销
+TOKEN_SAMPLE_CHARS = 256 * 1024
+# 估算的提示词仍超出预算时，收紧压缩预算重试的次数
+PROMPT_FIT_ATTEMPTS = 3
 
 class CommitGenerator:
-    def __init__(self, config: ConfigManager):
+    def __init__(self, config: ConfigManager, max_workers: int = MAP_REDUCE_MAX_WORKERS):
         self.config = config
+        self.max_workers = max_workers
         self.current_provider = config._load_config()['current_provider']
         self.git = GitOperations()
+        self._adapter: Optional[ModelAdapter] = None
+        self.cache = MessageCache()
+        self._speculative: Optional[SpeculativeGenerator] = None
+
+    def _get_adapter(self) -> ModelAdapter:
+        """获取模型适配器，同一生成器内复用以保持连接池与配置"""
+        if self._adapter is None or self._adapter.provider_name != self.current_provider:
+            self._adapter = ModelAdapter(self.current_provider)
+        return self._adapter
 
     def get_staged_diff(self) -> Optional[str]:
-        return self.git.get_staged_diff()
+        """获取暂存区diff，单个文件读取的内容不超过提示词的diff预算"""
+        return self.git.get_staged_diff(budget_chars=self._get_compactor().budget_chars)
+
+    def _cache_key(self, diff_content: str) -> str:
+        """计算当前提供商/模型下diff对应的缓存键"""
+        model_name = self._get_adapter().provider_instance.model_name
+        return MessageCache.make_key(diff_content, self.current_provider, model_name, PROMPT_TEMPLATE_VERSION)
+
+    def generate_commit_message(self, diff_content: str, use_cache: bool = True) -> str:
+        """生成提交信息
+        
+        Args:
+            diff_content: 暂存区diff
+            use_cache: 是否读取缓存，为False时强制重新生成（结果仍会写入缓存）
+        """
+        cache_key = self._cache_key(diff_content)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                return cached
+        try:
+            prompt = self._prepare_prompt(diff_content)
+            message = self._get_adapter().generate(prompt)
+        except Exception as e:
+            raise RuntimeError(f"API调用失败: {str(e)}")
+        self.cache.set(cache_key, message)
+        return message
 
-    def generate_commit_message(self, diff_content: str) -> str:
-        prompt = self._build_prompt(diff_content)
+    def generate_commit_message_stream(self, diff_content: str, use_cache: bool = True) -> Iterator[str]:
+        """流式生成提交信息，逐块产出文本；命中缓存时一次性产出完整信息"""
+        cache_key = self._cache_key(diff_content)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                yield cached
+                return
+        chunks = []
         try:
-            return ModelAdapter(self.current_provider).generate(prompt)
+            prompt = self._prepare_prompt(diff_content)
+            for chunk in self._get_adapter().generate_stream(prompt):
+                chunks.append(chunk)
+                yield chunk
         except Exception as e:
             raise RuntimeError(f"API调用失败: {str(e)}")
+        message = ''.join(chunks).strip()
+        if message:
+            self.cache.set(cache_key, message)
+
+    def _tree_cache_key(self, tree: str) -> str:
+        """暂存区树对象ID对应的缓存键，与diff缓存键相互独立"""
+        return self._cache_key(f"tree:{tree}")
+
+    def get_message_for_tree(self, tree: str) -> Optional[str]:
+        """按暂存区树对象ID读取缓存的提交信息，命中时无需再获取和压缩diff"""
+        return self.cache.get(self._tree_cache_key(tree))
+
+    def remember_tree(self, tree: str, message: str):
+        """记录暂存区树对象对应的提交信息，供提交钩子等只知道暂存区版本的场景复用"""
+        if tree and message:
+            self.cache.set(self._tree_cache_key(tree), message)
+
+    def start_speculative(self) -> bool:
+        """在后台预生成当前暂存区的提交信息
+
+        暂存区变化（如execute_add之后）时再次调用会取消旧任务并重新开始，暂存区未变化时不重复请求。
+        """
+        if self._speculative is None:
+            self._speculative = SpeculativeGenerator(self)
+        return self._speculative.start()
+
+    def follow_speculative(self, diff_content: str, timeout: Optional[float] = None) -> Optional[Iterator[str]]:
+        """跟随与diff对应的预生成任务，依次产出已缓冲和后续到达的块，没有可用任务时返回None"""
+        if self._speculative is None:
+            return None
+        return self._speculative.follow(diff_content, timeout)
+
+    def cancel_speculative(self):
+        if self._speculative is not None:
+            self._speculative.cancel()
+
+    def _get_compactor(self, diff_content: str = '') -> DiffCompactor:
+        """按提供商上下文窗口、max_tokens以及diff内容的字符/token比例创建压缩器"""
+        provider = self._get_adapter().provider_instance
+        estimator = provider.estimator
+        return DiffCompactor(provider.context_window, provider.max_tokens,
+                             chars_per_token=estimator.chars_per_token(diff_content[:TOKEN_SAMPLE_CHARS]),
+                             overhead_tokens=provider.estimate_prompt_tokens(self._build_prompt('')))
+
+    def _compact_diff(self, diff_content: str) -> str:
+        """按提供商上下文窗口和max_tokens压缩diff，保证提示词大小有界"""
+        return self._get_compactor(diff_content).compact(diff_content)
+
+    def _fit_prompt(self, diff_content: str, compactor: DiffCompactor,
+                    build: Optional[Callable[[str], Prompt]] = None) -> Prompt:
+        """压缩diff并构建提示词
+
+        字符/token比例只是估算，构建后再估算一次整个提示词；超出上下文窗口减去max_tokens时，
+        按超出比例收紧压缩预算重试，使请求在发送前就落在提供商的上下文限制之内。
+
+        Args:
+            build: 构建提示词的方法，默认为_build_prompt
+        """
+        build = build or self._build_prompt
+        provider = self._get_adapter().provider_instance
+        limit = int(provider.context_window) - int(provider.max_tokens)
+        prompt = build(compactor.compact(diff_content))
+        for _ in range(PROMPT_FIT_ATTEMPTS):
+            tokens = provider.estimate_prompt_tokens(prompt)
+            if tokens <= limit or compactor.budget_chars <= 0:
+                break
+            compactor.budget_chars = int(compactor.budget_chars * max(limit, 0) / tokens * 0.95)
+            prompt = build(compactor.compact(diff_content))
+        return prompt
+
+    def _prepare_prompt(self, diff_content: str) -> Prompt:
+        """构建最终发送给模型的提示词
+
+        源码总量在预算内时直接压缩diff后构建提示词（文件再多，压缩时也只是合并统计行）；
+        超出预算且能分成多个分组时，先并发对各分组做摘要（map），再用摘要构建汇总提示词（reduce）。
+        """
+        with tracing.span('prompt.build', 'prompt') as span:
+            compactor = self._get_compactor(diff_content)
+            files = DiffCompactor.split_files(diff_content)
+            source_size = sum(f.size for f in files if f.category == 'source')
+            span.set(files=len(files), diff_chars=len(diff_content))
+            if source_size <= compactor.budget_chars:
+                return self._fit_prompt(diff_content, compactor)
+            chunks = self._group_files(files, compactor.budget_chars)
+            if len(chunks) <= 1:
+                # 单个文件超出预算时分组无济于事，由压缩器截断其hunk
+                return self._fit_prompt(diff_content, compactor)
+        with tracing.span('prompt.map_reduce', 'prompt', files=len(files), chunks=len(chunks)):
+            summaries = self._map_summaries(chunks, compactor)
+            return self._reduce_prompt(summaries)
+
+    @staticmethod
+    def _group_files(files: List[FileDiff], budget_chars: int) -> List[List[FileDiff]]:
+        """按目录将文件分组，并把相邻的小分组合并到不超过预算的块中"""
+        groups: Dict[str, List[FileDiff]] = {}
+        for file_diff in files:
+            directory = file_diff.path.rsplit('/', 1)[0] if '/' in file_diff.path else '.'
+            groups.setdefault(directory, []).append(file_diff)
+
+        chunks: List[List[FileDiff]] = []
+        current: List[FileDiff] = []
+        current_size = 0
+        for directory in sorted(groups):
+            for file_diff in groups[directory]:
+                if current and current_size + file_diff.size > budget_chars:
+                    chunks.append(current)
+                    current, current_size = [], 0
+                current.append(file_diff)
+                current_size += file_diff.size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _map_summaries(self, chunks: List[List[FileDiff]], compactor: DiffCompactor) -> List[str]:
+        """在有界线程池中并发摘要各分组的变更，结果顺序与分组顺序一致"""
+        adapter = self._get_adapter()
 
-    def _build_prompt(self, diff_content: str) -> str:
-        return f"""
-        根据以下代码变更生成一条规范的Git提交信息：
+        def summarize(chunk: List[FileDiff]) -> str:
+            # 各分组的字符/token比例可能与整体取样不同（如中文较多），按分组内容单独压缩并校验
+            chunk_diff = '\n'.join(f.text for f in chunk)
+            chunk_compactor = self._get_compactor(chunk_diff)
+            chunk_compactor.budget_chars = min(chunk_compactor.budget_chars, compactor.budget_chars)
+            return adapter.generate(self._fit_prompt(chunk_diff, chunk_compactor, self._build_map_prompt), hedge=False)
+
+        workers = max(1, min(self.max_workers, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(summarize, chunks))
+
+    def _reduce_prompt(self, summaries: List[str]) -> Prompt:
+        """用各分组的摘要构建汇总提示词
+
+        摘要过多使提示词超出上下文窗口时，先把摘要按预算分组并发合并，重复直到汇总提示词能够放下；
+        单条摘要本身就放不下时按比例截断。
+        """
+        provider = self._get_adapter().provider_instance
+        limit = int(provider.context_window) - int(provider.max_tokens)
+        prompt = self._build_reduce_prompt(summaries)
+        tokens = provider.estimate_prompt_tokens(prompt)
+        while tokens > limit and len(summaries) > 1:
+            overhead = provider.estimate_prompt_tokens(self._build_merge_prompt([]))
+            groups: List[List[str]] = [[]]
+            group_tokens = 0
+            for summary in summaries:
+                summary_tokens = provider.estimator.count(summary)
+                if groups[-1] and group_tokens + summary_tokens > limit - overhead:
+                    groups.append([])
+                    group_tokens = 0
+                groups[-1].append(summary)
+                group_tokens += summary_tokens
+            if len(groups) == len(summaries):
+                # 每条摘要都只能单独成组，继续合并不会减少数量
+                break
+            with tracing.span('prompt.merge', 'prompt', summaries=len(summaries), groups=len(groups)):
+                summaries = self._generate_all([self._build_merge_prompt(group) for group in groups])
+            prompt = self._build_reduce_prompt(summaries)
+            tokens = provider.estimate_prompt_tokens(prompt)
+        for _ in range(PROMPT_FIT_ATTEMPTS):
+            if tokens <= limit:
+                break
+            total_chars = sum(len(summary) for summary in summaries)
+            keep = max(int(total_chars * max(limit, 0) / tokens * 0.95) // len(summaries), 1)
+            summaries = [summary[:keep] for summary in summaries]
+            prompt = self._build_reduce_prompt(summaries)
+            tokens = provider.estimate_prompt_tokens(prompt)
+        return prompt
+
+    def _generate_all(self, prompts: List[Prompt]) -> List[str]:
+        """在有界线程池中并发请求，结果顺序与提示词顺序一致"""
+        adapter = self._get_adapter()
+        workers = max(1, min(self.max_workers, len(prompts)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 中间的合并请求不做对冲，只有最终生成提交信息的请求才使用对冲
+            return list(executor.map(lambda prompt: adapter.generate(prompt, hedge=False), prompts))
+
+    # 以下提示词均拆分为固定的要求说明（system）与本次的变更内容（user），
+    # 固定部分逐字节不变，提供商才能命中前缀缓存；修改时需递增PROMPT_TEMPLATE_VERSION
+
+    def _build_map_prompt(self, diff_content: str) -> Prompt:
+        system = """
+        以下是一次大型提交中的部分代码变更，请概括这部分变更：
+
+        要求：
+        1. 用不超过5条要点描述修改内容，每条以"- "开头
+        2. 指出涉及的模块或目录，以及修改类型（功能新增/缺陷修复/重构/配置变更等）
+        3. 只返回要点，不要包含任何解释说明和Markdown代码块
+        """.strip()
+        return Prompt(system, f"代码变更：\n{diff_content}")
+
+    def _build_merge_prompt(self, summaries: List[str]) -> Prompt:
+        summary_text = "\n\n".join(summaries)
+        system = """
+        以下是一次大型提交中若干部分代码变更的摘要，请将它们合并为一份摘要：
+
+        要求：
+        1. 用不超过5条要点描述修改内容，每条以"- "开头，合并重复或相近的要点
+        2. 保留涉及的模块或目录，以及修改类型（功能新增/缺陷修复/重构/配置变更等）
+        3. 只返回要点，不要包含任何解释说明和Markdown代码块
+        """.strip()
+        return Prompt(system, f"变更摘要：\n{summary_text}")
+
+    def _build_reduce_prompt(self, summaries: List[str]) -> Prompt:
+        summary_text = "\n\n".join(f"第{i}部分：\n{summary}" for i, summary in enumerate(summaries, 1))
+        system = """
+        以下是一次大型提交中各部分代码变更的摘要，请据此生成一条规范的Git提交信息：
+
+        生成要求：
+        1. 识别整体修改类型（功能新增/缺陷修复/文档更新/重构/配置变更等）
+        2. 明确影响范围（模块/组件/API端点）
+        3. 提取关键变更点（不超过3个核心修改）
+        4. 遵循约定式提交格式：<类型>[可选 范围]: <描述>\n\n[可选正文]\n\n[可选脚注]
+        5. 确保信息简洁明了，易于理解
+
+        你的返回只包含提交信息，不要包含任何解释说明，不包含Markdown语法，以及```符号。
+        """.strip()
+        return Prompt(system, f"变更摘要：\n{summary_text}")
+
+    def _build_prompt(self, diff_content: str) -> Prompt:
+        system = """
+        根据用户提供的代码变更生成一条规范的Git提交信息：
 
         生成要求：
         1. 识别修改类型（功能新增/缺陷修复/文档更新/重构/配置变更等）
@@ -37,31 +314,32 @@ class CommitGenerator:
         - 补充Swagger文档说明
 
         你的返回只包含提交信息，不要包含任何解释说明，不包含Markdown语法，以及```符号。
-
-        代码变更：
-        {diff_content}
         """.strip()
+        return Prompt(system, f"代码变更：\n{diff_content}")
 
     def execute_commit(self, message: str):
         return self.git.execute_commit(message)
             
-    def get_unstaged_files(self) -> List[str]:
-        return self.git.get_unstaged_files()
+    def get_unstaged_files(self, snapshot: Optional[RepoSnapshot] = None) -> List[str]:
+        return self.git.get_unstaged_files(snapshot)
     
     def execute_add(self, files: List[str]) -> bool:
         return self.git.execute_add(files)
     
-    def execute_push(self, remote: str = 'origin', branch: str = '') -> bool:
-        return self.git.execute_push(remote, branch)
+    def execute_push(self, remote: str = 'origin', branch: str = '', branch_exists: Optional[bool] = None) -> bool:
+        return self.git.execute_push(remote, branch, branch_exists=branch_exists)
             
     def execute_reset(self) -> bool:
         return self.git.execute_reset()
             
-    def get_unpushed_commits(self) -> List[dict]:
-        return self.git.get_unpushed_commits()
+    def get_snapshot(self, untracked_files: str = 'all') -> RepoSnapshot:
+        return self.git.get_snapshot(untracked_files)
+            
+    def get_unpushed_commits(self, snapshot: Optional[RepoSnapshot] = None) -> List[dict]:
+        return self.git.get_unpushed_commits(snapshot)
             
-    def get_staged_files(self) -> List[str]:
-        return self.git.get_staged_files()
+    def get_staged_files(self, snapshot: Optional[RepoSnapshot] = None) -> List[str]:
+        return self.git.get_staged_files(snapshot)
             
-    def check_conflicts(self) -> Tuple[bool, List[str], Dict[str, List[str]]]:
-        return self.git.check_conflicts()
\ No newline at end of file
+    def check_conflicts(self, snapshot: Optional[RepoSnapshot] = None) -> Tuple[bool, List[str], Dict[str, List[str]]]:
+        return self.git.check_conflicts(snapshot)
\ No newline at end of file
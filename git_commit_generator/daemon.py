@@ -0,0 +1,262 @@
+"""git-ai常驻守护进程
+
+在Unix域套接字上提供提交信息生成服务，进程内保持已加载的配置、提供商连接池与缓存，
+客户端（git_commit_generator.client）每次调用只需建立一次本地连接：
+
+    git-ai daemon start          # 后台启动
+    python -m git_commit_generator.daemon --foreground
+
+协议为按行分隔的JSON：客户端发送一行请求，守护进程返回一行或多行响应后关闭连接。
+- {"command": "ping"}                        -> {"ok": true, "pid": ..., "version": ...}
+- {"command": "generate", "cwd": 仓库目录, "use_cache": true, "stream": true}
+                                             -> {"chunk": ...}* 之后 {"message": ...} 或 {"error": ...}
+- {"command": "shutdown"}                    -> {"ok": true}
+"""
+import argparse
+import json
+import logging
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from git_commit_generator.cache import default_cache_dir
+from git_commit_generator.client import PROTOCOL_VERSION, default_socket_path, ping
+from git_commit_generator.config import ConfigManager
+from git_commit_generator.config_store import PROVIDER_FILE
+from git_commit_generator.core import CommitGenerator
+from git_commit_generator.git_operations import GitOperations
+
+logger = logging.getLogger(__name__)
+
+# 空闲超过该时间（秒）后自动退出，0表示不退出
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+# 后台启动后等待套接字就绪的最长时间（秒）
+START_TIMEOUT = 10.0
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: 'GitAIDaemon'
+
+    def _send(self, message: Dict[str, Any]):
+        self.wfile.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def handle(self):
+        self.server.touch()
+        try:
+            payload = json.loads(self.rfile.readline() or b'{}')
+        except ValueError:
+            self._send({'error': "请求格式错误"})
+            return
+        if payload.get('version') != PROTOCOL_VERSION:
+            self._send({'error': "客户端与守护进程协议版本不一致，请执行 git-ai daemon stop 后重新启动"})
+            return
+
+        command = payload.get('command')
+        try:
+            if command == 'ping':
+                self._send(self.server.status())
+            elif command == 'generate':
+                self._generate(payload)
+            elif command == 'shutdown':
+                self._send({'ok': True})
+                # shutdown会等待serve_forever退出，不能在处理请求的线程中直接调用
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self._send({'error': f"未知命令: {command}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已断开（如编辑器取消了请求）
+            pass
+        finally:
+            self.server.touch()
+
+    def _generate(self, payload: Dict[str, Any]):
+        cwd = payload.get('cwd') or None
+        stream = bool(payload.get('stream'))
+        try:
+            generator = self.server.get_generator()
+            use_cache = payload.get('use_cache', True)
+            with GitOperations.working_directory(cwd):
+                tree = generator.git.get_index_tree()
+                # 暂存区树对象命中缓存时（如钩子或快速推送流程已生成过）无需获取diff
+                cached = generator.get_message_for_tree(tree) if use_cache else None
+                diff_content = None if cached else generator.get_staged_diff()
+            if cached:
+                if stream:
+                    self._send({'chunk': cached})
+                self._send({'message': cached})
+                return
+            if not diff_content:
+                self._send({'error': "没有检测到暂存区文件变更"})
+                return
+            chunks = []
+            for chunk in generator.generate_commit_message_stream(diff_content, use_cache=use_cache):
+                chunks.append(chunk)
+                if stream:
+                    self._send({'chunk': chunk})
+            message = ''.join(chunks).strip()
+            generator.remember_tree(tree, message)
+            self._send({'message': message})
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except subprocess.CalledProcessError as e:
+            # 如cwd不是git仓库，返回git自身的错误信息
+            self._send({'error': f"Git命令执行失败: {(e.stderr or str(e)).strip()}"})
+        except Exception as e:
+            logger.error(f"生成失败: {str(e)}")
+            self._send({'error': str(e)})
+
+
+class GitAIDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """在Unix域套接字上服务的守护进程，每个连接在独立线程中处理"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Optional[str] = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_timeout = idle_timeout
+        self.started_at = time.time()
+        self.requests = 0
+        self._last_activity = time.monotonic()
+        self._lock = threading.Lock()
+        self._config = ConfigManager()
+        self._config_signature: Optional[Tuple] = None
+        self._generators: Dict[str, CommitGenerator] = {}
+        self._prepare_socket_path()
+        # 套接字文件只允许当前用户访问
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(self.socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def _prepare_socket_path(self):
+        """确认没有其他守护进程在运行，并清理上次异常退出遗留的套接字文件"""
+        if not os.path.exists(self.socket_path):
+            os.makedirs(os.path.dirname(self.socket_path) or '.', exist_ok=True)
+            return
+        if ping(self.socket_path) is not None:
+            raise RuntimeError(f"守护进程已在运行: {self.socket_path}")
+        os.remove(self.socket_path)
+
+    def touch(self):
+        with self._lock:
+            self._last_activity = time.monotonic()
+
+    def _read_config_signature(self) -> Tuple:
+        signature = []
+        for path in (self._config.config_file, PROVIDER_FILE):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get_generator(self) -> CommitGenerator:
+        """获取当前提供商的生成器；配置文件变化后重建，使新配置无需重启即可生效"""
+        with self._lock:
+            self.requests += 1
+            signature = self._read_config_signature()
+            if signature != self._config_signature:
+                self._generators.clear()
+                self._config_signature = signature
+            provider = self._config._load_config().get('current_provider')
+            if not provider:
+                raise RuntimeError("请先配置AI模型后再使用此功能")
+            generator = self._generators.get(provider)
+            if generator is None:
+                generator = CommitGenerator(self._config)
+                self._generators[provider] = generator
+            return generator
+
+    def status(self) -> Dict[str, Any]:
+        return {'ok': True, 'pid': os.getpid(), 'version': PROTOCOL_VERSION, 'socket': self.socket_path,
+                'uptime': round(time.time() - self.started_at, 1), 'requests': self.requests}
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(60.0, max(1.0, self.idle_timeout / 4)))
+            with self._lock:
+                idle = time.monotonic() - self._last_activity
+            if idle >= self.idle_timeout:
+                logger.info(f"空闲{idle:.0f}秒，守护进程退出")
+                self.shutdown()
+                return
+
+    def serve(self):
+        """阻塞运行直到收到shutdown请求或空闲超时"""
+        if self.idle_timeout:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+
+def start_background(socket_path: Optional[str] = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> Dict[str, Any]:
+    """在后台启动守护进程并等待其就绪，返回其状态信息
+
+    Raises:
+        RuntimeError: 已在运行或启动超时
+    """
+    socket_path = socket_path or default_socket_path()
+    status = ping(socket_path)
+    if status is not None:
+        raise RuntimeError(f"守护进程已在运行（pid {status.get('pid')}）")
+    log_dir = default_cache_dir()
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, 'daemon.log')
+    with open(log_path, 'ab') as log_file:
+        subprocess.Popen(
+            [sys.executable, '-m', 'git_commit_generator.daemon', '--foreground',
+             '--socket', socket_path, '--idle-timeout', str(idle_timeout)],
+            stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file,
+            start_new_session=True, close_fds=True,
+        )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        status = ping(socket_path)
+        if status is not None:
+            return status
+        time.sleep(0.05)
+    raise RuntimeError(f"守护进程启动超时，详情见 {log_path}")
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="git-ai常驻守护进程")
+    parser.add_argument('--foreground', action='store_true', help="在前台运行（默认在后台启动后返回）")
+    parser.add_argument('--socket', help="套接字路径")
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT, help="空闲多少秒后退出，0表示不退出")
+    options = parser.parse_args(args)
+
+    try:
+        if not options.foreground:
+            status = start_background(options.socket, options.idle_timeout)
+            print(f"守护进程已启动（pid {status['pid']}）: {status['socket']}")
+            return 0
+        server = GitAIDaemon(options.socket, options.idle_timeout)
+    except (RuntimeError, OSError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    logger.info(f"守护进程已启动（pid {os.getpid()}）: {server.socket_path}")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
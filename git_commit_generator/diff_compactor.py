@@ -0,0 +1,271 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from git_commit_generator.diff_reader import OMITTED_MARKER_PATTERN, FileStat, header_path
+
+# 未提供估算结果时按平均每个token约4个字符换算
+CHARS_PER_TOKEN = 4
+# 提示词模板本身（要求说明与示例）预留的token数
+PROMPT_OVERHEAD_TOKENS = 400
+# 即使上下文窗口很大，diff也不超过该token数，避免生成延迟随diff无限增长
+DEFAULT_MAX_DIFF_TOKENS = 16000
+# 单行超过该长度即视为压缩/混淆后的代码
+MINIFIED_LINE_LENGTH = 500
+# 非源码文件（锁文件、生成文件等）的统计信息最多占用的预算比例
+STATS_BUDGET_RATIO = 0.25
+# 按numstat估算diff大小时每个变更行的最少字节数；按此估算仍超出单文件上限的文件视为大规模机械修改
+MIN_CHANGED_LINE_BYTES = 8
+
+LOCKFILE_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml',
+    'poetry.lock', 'pdm.lock', 'Pipfile.lock', 'uv.lock', 'Cargo.lock',
+    'go.sum', 'composer.lock', 'Gemfile.lock', 'packages.lock.json', 'flake.lock',
+}
+VENDORED_DIRS = {'vendor', 'vendors', 'third_party', 'thirdparty', 'node_modules', 'site-packages', 'bower_components'}
+GENERATED_DIRS = {'dist', 'build', 'generated', '__generated__'}
+GENERATED_SUFFIXES = ('_pb2.py', '_pb2_grpc.py', '.pb.go', '.pb.cc', '.pb.h', '.g.dart', '.designer.cs')
+GENERATED_MARKERS = ('@generated', 'DO NOT EDIT', 'Code generated by', 'auto-generated', 'autogenerated')
+MINIFIED_SUFFIXES = ('.min.js', '.min.css', '.min.map', '.js.map', '.css.map')
+
+
+class FileDiff:
+    """单个文件的diff片段"""
+
+    def __init__(self, path: str, header: List[str], hunks: List[List[str]]):
+        self.path = path
+        self.header = header
+        self.hunks = hunks
+        self.added = sum(1 for hunk in hunks for line in hunk[1:] if line.startswith('+'))
+        self.removed = sum(1 for hunk in hunks for line in hunk[1:] if line.startswith('-'))
+        # 内容被省略（超出读取上限或未读取）的文件，以标记行中记录的完整增删行数为准
+        last_line = hunks[-1][-1] if hunks else header[-1] if header else ''
+        match = OMITTED_MARKER_PATTERN.match(last_line)
+        if match:
+            self.added, self.removed = int(match.group(1)), int(match.group(2))
+        self.category = DiffCompactor.classify(self)
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.header + [line for hunk in self.hunks for line in hunk])
+
+    @property
+    def size(self) -> int:
+        return len(self.text)
+
+    def stats_line(self) -> str:
+        """生成替代原始内容的精简统计信息"""
+        if self.category == 'binary':
+            return f"{self.path} | 二进制文件变更"
+        return f"{self.path} | {self.category}, +{self.added} -{self.removed}, 内容已省略"
+
+
+class DiffCompactor:
+    """在构建提示词前压缩diff，使其token数保持在预算之内
+
+    处理流程：
+    1. 按文件拆分diff，并识别锁文件、压缩文件、生成文件、二进制文件和第三方依赖
+    2. 上述文件只保留一行统计信息
+    3. 其余源码文件按公平份额分配预算，小文件用不完的份额让给大文件，
+       超出份额的文件保留靠前的hunk，其余hunk以统计信息代替
+    """
+
+    def __init__(self, context_window: int, max_tokens: int,
+                 max_diff_tokens: int = DEFAULT_MAX_DIFF_TOKENS,
+                 chars_per_token: float = CHARS_PER_TOKEN,
+                 overhead_tokens: int = PROMPT_OVERHEAD_TOKENS):
+        """
+        :param context_window: 提供商上下文窗口（token）
+        :param max_tokens: 为生成结果预留的token数
+        :param max_diff_tokens: diff的token数上限
+        :param chars_per_token: 把token预算换算为字符预算的比例，通常由TokenEstimator按diff内容估算
+        :param overhead_tokens: 提示词模板本身占用的token数
+        """
+        budget_tokens = int(context_window) - int(max_tokens) - int(overhead_tokens)
+        budget_tokens = min(budget_tokens, max_diff_tokens)
+        self.budget_chars = int(max(budget_tokens, 0) * chars_per_token)
+
+    @staticmethod
+    def split_files(diff_content: str) -> List[FileDiff]:
+        """将完整diff按文件拆分为FileDiff列表"""
+        files = []
+        header: Optional[List[str]] = None
+        hunks: List[List[str]] = []
+        path = ''
+
+        def flush():
+            if header is not None:
+                files.append(FileDiff(path, header, hunks))
+
+        for line in diff_content.split('\n'):
+            if line.startswith('diff --git '):
+                flush()
+                header, hunks = [line], []
+                path = header_path(line)
+            elif header is None:
+                continue
+            elif line.startswith('@@'):
+                hunks.append([line])
+            elif hunks:
+                hunks[-1].append(line)
+            else:
+                header.append(line)
+                if line.startswith('+++ b/'):
+                    path = line[len('+++ b/'):]
+        flush()
+        return files
+
+    @staticmethod
+    def classify_path(path: str) -> str:
+        """仅根据路径识别文件类别：lockfile/minified/generated/vendored/source"""
+        name = os.path.basename(path)
+        parts = set(path.split('/')[:-1])
+
+        if name in LOCKFILE_NAMES:
+            return 'lockfile'
+        if parts & VENDORED_DIRS:
+            return 'vendored'
+        if name.endswith(MINIFIED_SUFFIXES):
+            return 'minified'
+        if name.endswith(GENERATED_SUFFIXES) or parts & GENERATED_DIRS or '.generated.' in name:
+            return 'generated'
+        return 'source'
+
+    @staticmethod
+    def classify(file_diff: FileDiff) -> str:
+        """识别文件类别：lockfile/minified/generated/binary/vendored/source"""
+        if any(line.startswith(('Binary files ', 'GIT binary patch')) for line in file_diff.header):
+            return 'binary'
+        category = DiffCompactor.classify_path(file_diff.path)
+        if category != 'source':
+            return category
+        # 只检查前几个hunk的前几行，判断生成标记和超长行
+        for hunk in file_diff.hunks[:2]:
+            for line in hunk[1:20]:
+                if any(marker in line for marker in GENERATED_MARKERS):
+                    return 'generated'
+                if len(line) > MINIFIED_LINE_LENGTH:
+                    return 'minified'
+        return 'source'
+
+    @staticmethod
+    def plan_fetch(stats: List[FileStat], max_file_bytes: int) -> Tuple[List[FileStat], List[FileStat]]:
+        """根据numstat统计决定哪些文件需要读取hunk内容
+
+        二进制文件、按路径即可识别的锁文件/第三方依赖/生成文件/压缩文件在提示词中只保留统计信息，
+        变更行数按每行MIN_CHANGED_LINE_BYTES估算仍超出max_file_bytes的文件视为大规模机械修改，
+        这些文件都不读取内容。
+
+        Returns:
+            Tuple[List[FileStat], List[FileStat]]: (需要读取内容的文件, 只保留统计信息的文件)
+        """
+        fetch, skipped = [], []
+        for stat in stats:
+            if (stat.binary or DiffCompactor.classify_path(stat.path) != 'source'
+                    or stat.changed_lines * MIN_CHANGED_LINE_BYTES > max_file_bytes):
+                skipped.append(stat)
+            else:
+                fetch.append(stat)
+        return fetch, skipped
+
+    @staticmethod
+    def _stats_lines(files: List[FileDiff], limit: int) -> List[str]:
+        """生成省略内容的文件的统计信息，每行连同换行符计入limit
+
+        逐文件的统计超出limit时按类别汇总为每类一行，汇总行仍放不下时只保留放得下的类别。
+        """
+        lines = [f.stats_line() for f in files]
+        if sum(len(line) + 1 for line in lines) <= limit:
+            return lines
+        groups: Dict[str, List[FileDiff]] = {}
+        for file_diff in files:
+            groups.setdefault(file_diff.category, []).append(file_diff)
+        summary = []
+        for category, group in groups.items():
+            line = f"{category} | {len(group)}个文件, +{sum(f.added for f in group)} -{sum(f.removed for f in group)}"
+            if len(line) + 1 > limit:
+                continue
+            summary.append(line)
+            limit -= len(line) + 1
+        return summary
+
+    @staticmethod
+    def _omitted_note(hunks: List[List[str]]) -> str:
+        added = sum(1 for hunk in hunks for line in hunk[1:] if line.startswith('+'))
+        removed = sum(1 for hunk in hunks for line in hunk[1:] if line.startswith('-'))
+        return f"... 已省略{len(hunks)}个hunk (+{added} -{removed})"
+
+    def _truncate(self, file_diff: FileDiff, budget: int) -> Optional[str]:
+        """在budget个字符内保留文件头和靠前的hunk，省略的部分用统计信息代替
+
+        Returns:
+            Optional[str]: 截断后的文本；连文件头和省略说明都放不下时返回None
+        """
+        # used为已保留各行连同换行符的字符数，拼接后的文本长度为used - 1
+        used = sum(len(line) + 1 for line in file_diff.header)
+        sizes = [sum(len(line) + 1 for line in hunk) for hunk in file_diff.hunks]
+        kept = 0
+        while kept < len(sizes) and used + sizes[kept] <= budget + 1:
+            used += sizes[kept]
+            kept += 1
+        # 为省略说明留出空间，放不下时继续丢弃靠后的hunk
+        while True:
+            note = self._omitted_note(file_diff.hunks[kept:])
+            if used + len(note) <= budget:
+                break
+            if kept == 0:
+                return None
+            kept -= 1
+            used -= sizes[kept]
+        lines = list(file_diff.header)
+        for hunk in file_diff.hunks[:kept]:
+            lines.extend(hunk)
+        lines.append(note)
+        return '\n'.join(lines)
+
+    def compact(self, diff_content: str) -> str:
+        """压缩diff使其不超过预算
+
+        Args:
+            diff_content: git diff --cached 的完整输出
+
+        Returns:
+            str: 压缩后的diff，长度不超过budget_chars；未超出预算且无需特殊处理的文件保持原样
+        """
+        files = self.split_files(diff_content)
+        if not files:
+            return diff_content[:self.budget_chars]
+        sources = [f for f in files if f.category == 'source']
+        if len(sources) == len(files) and sum(f.size + 1 for f in files) - 1 <= self.budget_chars:
+            return '\n'.join(f.text for f in files)
+
+        # 以下按“文本长度+1个换行符”计费，各部分之和不超过预算即可保证拼接结果不超出预算。
+        # 先为统计信息的标题预留空间，非源码文件的统计信息最多占用预算的STATS_BUDGET_RATIO
+        title = "以下文件内容已省略："
+        remaining = self.budget_chars - len(title) - 1
+        stats = self._stats_lines([f for f in files if f.category != 'source'],
+                                  min(int(self.budget_chars * STATS_BUDGET_RATIO), remaining))
+        remaining -= sum(len(line) + 1 for line in stats)
+
+        # 从小到大分配预算：每个文件最多拿到剩余预算的平均份额，份额不足以展示内容的文件只保留统计信息
+        rendered = {}
+        omitted: List[FileDiff] = []
+        order = sorted(range(len(sources)), key=lambda i: sources[i].size)
+        for position, index in enumerate(order):
+            share = max(remaining // (len(order) - position), 0)
+            file_diff = sources[index]
+            text: Optional[str] = None
+            if file_diff.size + 1 <= share:
+                text = file_diff.text
+            elif share > len(file_diff.header[0]) * 2:
+                text = self._truncate(file_diff, share - 1)
+            if text is None:
+                omitted.append(file_diff)
+                continue
+            rendered[index] = text
+            remaining -= len(text) + 1
+
+        output = [rendered[i] for i in range(len(sources)) if i in rendered]
+        stats += self._stats_lines(omitted, remaining)
+        if stats:
+            output.append(title + '\n' + '\n'.join(stats))
+        return '\n'.join(output)
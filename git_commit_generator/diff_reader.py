@@ -0,0 +1,320 @@
+import re
+import subprocess
+import tempfile
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# 单次读取的最长字节数，超长行（如压缩后的代码）分段读取，避免一次读入整行
+READ_LINE_LIMIT = 64 * 1024
+
+_HEADER_PATTERN = re.compile(r'^diff --git a/(.*) b/(.*)$')
+# git以C风格引号包裹路径时使用的转义字符
+_QUOTE_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+# 内容被省略的文件在diff中以该格式的注释行记录完整的增删行数，DiffCompactor据此统计
+OMITTED_MARKER_PATTERN = re.compile(r'^# git-ai: .*（\+(\d+) -(\d+)）')
+
+
+def unquote_path(path: str) -> str:
+    """还原git以C风格引号包裹的路径
+
+    路径含引号、反斜杠、控制字符，或core.quotePath开启时含非ASCII字符，git会将其写为
+    "a/\\344\\270\\255.py"的形式（--summary即使指定-z也是如此），非ASCII字符以UTF-8字节的八进制转义给出。
+    """
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    raw = bytearray()
+    index, end = 1, len(path) - 1
+    while index < end:
+        char = path[index]
+        if char == '\\' and index + 1 < end:
+            escaped = path[index + 1]
+            if escaped in '01234567':
+                raw.append(int(path[index + 1:index + 4], 8) & 0xFF)
+                index += 4
+            else:
+                raw.append(_QUOTE_ESCAPES.get(escaped, ord(escaped) & 0xFF))
+                index += 2
+            continue
+        raw.extend(char.encode('utf-8'))
+        index += 1
+    return raw.decode('utf-8', errors='replace')
+
+
+def header_path(line: str) -> str:
+    """从diff --git文件头中取出新路径，支持git加了引号的路径"""
+    if line.endswith('"') and ' "b/' in line:
+        return unquote_path(line[line.rindex(' "b/') + 1:])[len('b/'):]
+    match = _HEADER_PATTERN.match(line)
+    return match.group(2) if match else line[len('diff --git '):]
+
+
+def omitted_marker(path: str, added: int, removed: int, detail: str) -> str:
+    return f"# git-ai: {path}（+{added} -{removed}）{detail}"
+
+
+class FileStat(NamedTuple):
+    """git diff --numstat/--summary给出的单个文件的变更统计
+
+    old_path为重命名前的路径，未重命名时与path相同；
+    header为--summary中的新建/删除/权限变更信息，已转换为git diff文件头的格式。
+    """
+    path: str
+    old_path: str
+    added: int
+    removed: int
+    binary: bool
+    header: Tuple[str, ...] = ()
+
+    @property
+    def changed_lines(self) -> int:
+        return self.added + self.removed
+
+    def placeholder(self, detail: str = "diff未读取") -> str:
+        """不读取内容时代替该文件diff的文本，格式与git diff的文件头一致"""
+        lines = [f"diff --git a/{self.old_path} b/{self.path}"]
+        if self.old_path != self.path:
+            lines += [f"rename from {self.old_path}", f"rename to {self.path}"]
+        lines.extend(self.header)
+        if self.binary:
+            lines.append(f"Binary files a/{self.old_path} and b/{self.path} differ")
+        else:
+            lines.append(omitted_marker(self.path, self.added, self.removed, detail))
+        return '\n'.join(lines)
+
+
+def _parse_summary(summary: str) -> Dict[str, Tuple[str, ...]]:
+    """解析--summary中的新建、删除和权限变更行（重命名信息已由numstat给出），路径可能带有引号"""
+    headers: Dict[str, Tuple[str, ...]] = {}
+    for line in summary.split('\n'):
+        line = line.strip(' ')
+        if line.startswith(('create mode ', 'delete mode ')):
+            parts = line.split(' ', 3)
+            if len(parts) == 4:
+                kind = 'new' if parts[0] == 'create' else 'deleted'
+                headers[unquote_path(parts[3])] = (f"{kind} file mode {parts[2]}",)
+        elif line.startswith('mode change '):
+            parts = line.split(' ', 5)
+            if len(parts) == 6:
+                headers[unquote_path(parts[5])] = (f"old mode {parts[2]}", f"new mode {parts[4]}")
+    return headers
+
+
+def parse_numstat(output: str) -> List[FileStat]:
+    """解析 git diff --numstat --summary -z 的输出
+
+    numstat记录以NUL分隔，重命名的记录路径为空，随后的两段分别为旧路径和新路径；
+    --summary的内容以换行分隔，位于最后一个NUL之后。
+    """
+    parts = output.split('\0')
+    headers = _parse_summary(parts[-1])
+    stats = []
+    index = 0
+    records = parts[:-1]
+    while index < len(records):
+        fields = records[index].split('\t', 2)
+        index += 1
+        if len(fields) != 3:
+            continue
+        added, removed, path = fields
+        old_path = path
+        if not path:
+            # 重命名或复制：随后两段为旧路径与新路径
+            if index + 1 >= len(records):
+                break
+            old_path, path = records[index], records[index + 1]
+            index += 2
+        binary = added == '-' and removed == '-'
+        stats.append(FileStat(path=path, old_path=old_path,
+                              added=0 if binary else int(added), removed=0 if binary else int(removed),
+                              binary=binary, header=headers.get(path, ())))
+    return stats
+
+
+class FileChunk(NamedTuple):
+    """流式读取得到的单个文件的diff
+
+    header为文件头（diff --git、index、---/+++、重命名等行），body为保留下来的hunk行；
+    size、added、removed统计的是该文件完整diff，包括因上限被省略的部分。
+    """
+    path: str
+    header: List[str]
+    body: List[str]
+    size: int
+    added: int
+    removed: int
+    binary: bool
+    truncated: bool
+
+    @property
+    def text(self) -> str:
+        lines = list(self.header)
+        if self.binary and not any(line.startswith(('Binary files ', 'GIT binary patch')) for line in lines):
+            # 文本diff中出现NUL字节时按二进制处理，补上与git一致的标记供DiffCompactor识别
+            lines.append(f"Binary files a/{self.path} and b/{self.path} differ")
+        lines.extend(self.body)
+        if self.truncated and not self.binary:
+            lines.append(omitted_marker(self.path, self.added, self.removed,
+                                        f"diff共{self.size}字节，超出上限的内容已省略"))
+        return '\n'.join(lines)
+
+
+class _FileState:
+    """读取过程中单个文件的累积状态"""
+
+    def __init__(self, first_line: bytes):
+        self.header: List[str] = [_decode(first_line)]
+        self.path = header_path(self.header[0])
+        self.body: List[str] = []
+        self.in_header = True
+        self.keeping = True
+        self.body_bytes = 0
+        self.size = len(first_line)
+        self.added = 0
+        self.removed = 0
+        self.binary = False
+        self.truncated = False
+
+    def build(self) -> FileChunk:
+        return FileChunk(self.path, self.header, self.body, self.size, self.added, self.removed,
+                         self.binary, self.truncated)
+
+
+def _decode(line: bytes) -> str:
+    # 非UTF-8内容以替换字符保留，而不是静默丢弃字节
+    return line.rstrip(b'\n').decode('utf-8', errors='replace')
+
+
+class DiffReader:
+    """以字节流方式读取git diff输出，内存占用有上限
+
+    - 逐行（超长行分段）读取，保留的内容总量不超过max_bytes，单个文件不超过max_file_bytes；
+    - 超出上限的文件只保留文件头，并附上字节数与增删行数的统计；
+    - 总量超出上限后，默认继续读取以统计剩余文件（只保留diff --git行），
+      stop_at_cap为True时立即终止git进程；
+    - 二进制文件（git的Binary files标记或内容中出现NUL字节）不保留内容。
+
+    示例：
+        reader = DiffReader(['git', 'diff', '--cached'])
+        for chunk in reader.iter_files():
+            print(chunk.path, chunk.size, chunk.truncated)
+    """
+
+    def __init__(self, cmd: List[str], max_bytes: int, max_file_bytes: int,
+                 cwd: Optional[str] = None, stop_at_cap: bool = False):
+        self.cmd = cmd
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.cwd = cwd
+        self.stop_at_cap = stop_at_cap
+        # 读取结束后：git输出的总字节数、保留的字节数、是否有内容因上限被省略
+        self.total_bytes = 0
+        self.kept_bytes = 0
+        self.truncated = False
+
+    def _keep(self, state: _FileState, raw: bytes) -> bool:
+        """在上限内保留一行hunk内容，超出时将文件标记为截断"""
+        if not state.keeping:
+            return False
+        if (state.body_bytes + len(raw) > self.max_file_bytes
+                or self.kept_bytes + len(raw) > self.max_bytes):
+            state.keeping = False
+            state.truncated = True
+            self.truncated = True
+            return False
+        state.body_bytes += len(raw)
+        self.kept_bytes += len(raw)
+        state.body.append(_decode(raw))
+        return True
+
+    def iter_files(self) -> Iterator[FileChunk]:
+        """逐个文件产出diff
+
+        Raises:
+            subprocess.CalledProcessError: git命令执行失败
+        """
+        # stderr写入临时文件而不是管道：只读取stdout时，git的大量警告写满stderr管道会使双方互相等待
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(self.cmd, cwd=self.cwd, stdout=subprocess.PIPE, stderr=stderr_file)
+        finished = False
+        try:
+            state: Optional[_FileState] = None
+            partial = False
+            readline = process.stdout.readline
+            while True:
+                raw = readline(READ_LINE_LIMIT)
+                if not raw:
+                    finished = True
+                    break
+                self.total_bytes += len(raw)
+                # 上一次读到的是超长行的一部分，本次为其后续，只计数不保留
+                continuation, partial = partial, not raw.endswith(b'\n')
+                if continuation:
+                    if state is not None:
+                        state.size += len(raw)
+                    continue
+
+                if raw.startswith(b'diff --git '):
+                    if state is not None:
+                        yield state.build()
+                    state = _FileState(raw)
+                    if self.kept_bytes >= self.max_bytes:
+                        # 总量已达上限：剩余文件只保留首行，用于统计
+                        state.keeping = False
+                        state.truncated = True
+                        self.truncated = True
+                        if self.stop_at_cap:
+                            break
+                    continue
+                if state is None:
+                    continue
+                state.size += len(raw)
+
+                if state.in_header:
+                    if raw.startswith(b'@@'):
+                        state.in_header = False
+                    else:
+                        if raw.startswith((b'Binary files ', b'GIT binary patch')):
+                            state.binary = True
+                        if state.keeping:
+                            self.kept_bytes += len(raw)
+                            state.header.append(_decode(raw))
+                        continue
+
+                first = raw[:1]
+                if first == b'+':
+                    state.added += 1
+                elif first == b'-':
+                    state.removed += 1
+                if state.binary:
+                    continue
+                if b'\x00' in raw:
+                    state.binary = True
+                    state.keeping = False
+                    self.kept_bytes -= state.body_bytes
+                    state.body = []
+                    continue
+                if partial:
+                    # 单行超过READ_LINE_LIMIT（压缩/生成的代码），不保留该文件的后续内容
+                    state.keeping = False
+                    state.truncated = True
+                    self.truncated = True
+                    continue
+                self._keep(state, raw)
+            if state is not None:
+                yield state.build()
+        finally:
+            if not finished:
+                # 消费方提前结束或达到上限，终止git，不读取剩余输出
+                self.truncated = True
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+            stderr_file.close()
+        if finished and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.cmd,
+                                                stderr=stderr.decode('utf-8', errors='replace'))
+
+    def read_text(self) -> str:
+        """读取全部文件，返回拼接后的diff文本"""
+        return '\n'.join(chunk.text for chunk in self.iter_files())
@@ -0,0 +1,208 @@
+import atexit
+import difflib
+import subprocess
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# git中空树对象的固定哈希，用于尚无HEAD（首次提交）时与暂存区比较
+EMPTY_TREE_OID = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+NULL_OID = '0' * 40
+# 在前8000个字节内出现NUL即视为二进制文件，与git的判断规则一致
+BINARY_SNIFF_BYTES = 8000
+
+
+class CatFileReader:
+    """长驻的 `git cat-file --batch` 进程，按需读取blob/tree对象
+
+    每次读取只需向进程的stdin写入一行对象名，避免为每个对象fork/exec一次git。
+    读取操作加锁，可在多个线程间共享同一个实例。
+    """
+
+    def __init__(self, cwd: Optional[str] = None):
+        self.cwd = cwd
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ['git', 'cat-file', '--batch'],
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def read(self, rev: str) -> Optional[Tuple[str, bytes]]:
+        """读取对象内容
+
+        Args:
+            rev: 对象名，如blob哈希、`HEAD:path` 或 `:path`（暂存区中的文件）
+
+        Returns:
+            Optional[Tuple[str, bytes]]: (对象类型, 内容)，对象不存在时返回None
+        """
+        with self._lock:
+            process = self._ensure_process()
+            process.stdin.write(rev.encode('utf-8') + b'\n')
+            process.stdin.flush()
+            header = process.stdout.readline().decode('utf-8', errors='replace').rstrip('\n')
+            parts = header.split(' ')
+            if len(parts) != 3:
+                # "<rev> missing" 或 "<rev> ambiguous"
+                return None
+            _, obj_type, size = parts
+            content = process.stdout.read(int(size))
+            # 每个对象内容后跟一个换行符
+            process.stdout.read(1)
+            return obj_type, content
+
+    def close(self):
+        """关闭cat-file进程"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()
+                self._process.wait()
+            self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class StagedEntry:
+    """暂存区相对HEAD的一项变更（来自 git diff-index --cached 的raw输出）"""
+
+    def __init__(self, old_mode: str, new_mode: str, old_oid: str, new_oid: str, status: str, path: str):
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.old_oid = old_oid
+        self.new_oid = new_oid
+        self.status = status
+        self.path = path
+
+
+class GitBackend:
+    """进程内git后端：通过长驻cat-file进程读取对象，按需计算单个文件的暂存区diff"""
+
+    def __init__(self, cwd: Optional[str] = None):
+        self.cwd = cwd
+        self.reader = CatFileReader(cwd)
+
+    def _run(self, cmd: List[str]) -> bytes:
+        return subprocess.run(cmd, cwd=self.cwd, check=True, capture_output=True).stdout
+
+    def _head_tree(self) -> str:
+        """HEAD存在时返回HEAD，否则返回空树"""
+        result = subprocess.run(['git', 'rev-parse', '--verify', '-q', 'HEAD'],
+                                cwd=self.cwd, capture_output=True)
+        return 'HEAD' if result.returncode == 0 else EMPTY_TREE_OID
+
+    def staged_entries(self) -> List[StagedEntry]:
+        """列出暂存区相对HEAD的所有变更文件"""
+        output = self._run(['git', 'diff-index', '--cached', '-z', '--no-renames', self._head_tree()])
+        records = output.decode('utf-8', errors='surrogateescape').split('\0')
+        entries = []
+        # 格式：":<old_mode> <new_mode> <old_oid> <new_oid> <status>\0<path>\0"
+        for meta, path in zip(records[0::2], records[1::2]):
+            if not meta.startswith(':'):
+                continue
+            old_mode, new_mode, old_oid, new_oid, status = meta[1:].split(' ')
+            entries.append(StagedEntry(old_mode, new_mode, old_oid, new_oid, status, path))
+        return entries
+
+    def read_blob(self, oid: str) -> bytes:
+        """读取blob内容，空哈希（新增/删除的一侧）返回空字节串"""
+        if oid == NULL_OID:
+            return b''
+        obj = self.reader.read(oid)
+        return obj[1] if obj else b''
+
+    def read_stages(self, path: str) -> Dict[int, Optional[bytes]]:
+        """读取冲突文件在暂存区中的各个版本
+
+        Args:
+            path: 相对当前工作目录的文件路径
+
+        Returns:
+            Dict[int, Optional[bytes]]: 1为共同祖先、2为当前分支（ours）、3为合并分支（theirs）的内容，
+            某一方删除了该文件时对应的值为None
+        """
+        # `:<n>:path` 中的路径默认相对仓库根目录，以./或../开头时才相对当前目录
+        if not path.startswith(('./', '../')):
+            path = f"./{path}"
+        stages: Dict[int, Optional[bytes]] = {}
+        for stage in (1, 2, 3):
+            obj = self.reader.read(f":{stage}:{path}")
+            stages[stage] = obj[1] if obj and obj[0] == 'blob' else None
+        return stages
+
+    def file_diff(self, entry: StagedEntry, context_lines: int = 3) -> str:
+        """计算单个文件的暂存区diff，输出格式与git diff --cached相近
+
+        Args:
+            entry: 暂存区变更项
+            context_lines: 上下文行数
+
+        Returns:
+            str: 该文件的unified diff文本
+        """
+        path = entry.path
+        header = [f"diff --git a/{path} b/{path}"]
+        if entry.status == 'A':
+            header.append(f"new file mode {entry.new_mode}")
+        elif entry.status == 'D':
+            header.append(f"deleted file mode {entry.old_mode}")
+        elif entry.old_mode != entry.new_mode:
+            header += [f"old mode {entry.old_mode}", f"new mode {entry.new_mode}"]
+
+        old = self.read_blob(entry.old_oid)
+        new = self.read_blob(entry.new_oid)
+        if b'\0' in old[:BINARY_SNIFF_BYTES] or b'\0' in new[:BINARY_SNIFF_BYTES]:
+            header.append(f"Binary files a/{path} and b/{path} differ")
+            return '\n'.join(header)
+
+        old_lines = old.decode('utf-8', errors='replace').splitlines()
+        new_lines = new.decode('utf-8', errors='replace').splitlines()
+        from_file = '/dev/null' if entry.status == 'A' else f"a/{path}"
+        to_file = '/dev/null' if entry.status == 'D' else f"b/{path}"
+        body = difflib.unified_diff(old_lines, new_lines, from_file, to_file,
+                                    n=context_lines, lineterm='')
+        return '\n'.join(header + list(body))
+
+    def iter_staged_diffs(self, paths: Optional[List[str]] = None,
+                          context_lines: int = 3) -> Iterator[Tuple[str, str]]:
+        """逐个产出暂存区文件的 (路径, diff)
+
+        Args:
+            paths: 只计算这些路径，为空时计算全部暂存文件
+            context_lines: 上下文行数
+        """
+        wanted = set(paths) if paths else None
+        for entry in self.staged_entries():
+            if wanted is None or entry.path in wanted:
+                yield entry.path, self.file_diff(entry, context_lines)
+
+    def staged_diffs(self, paths: Optional[List[str]] = None, context_lines: int = 3) -> Dict[str, str]:
+        return dict(self.iter_staged_diffs(paths, context_lines))
+
+    def close(self):
+        self.reader.close()
+
+
+_backends: Dict[Optional[str], GitBackend] = {}
+_default_lock = threading.Lock()
+
+
+def get_backend(cwd: Optional[str] = None) -> GitBackend:
+    """获取工作目录（为空时为当前目录）对应的进程级共享后端，进程退出时自动关闭"""
+    with _default_lock:
+        backend = _backends.get(cwd)
+        if backend is None:
+            backend = GitBackend(cwd)
+            _backends[cwd] = backend
+            atexit.register(backend.close)
+        return backend
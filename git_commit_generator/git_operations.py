@@ -1,14 +1,31 @@
 import subprocess
-import re
 import logging
 import os
+import threading
+from contextlib import contextmanager
 from functools import wraps
 from typing import Optional, List, Tuple, Dict, Any, Union, Callable
+from git_commit_generator.repo_snapshot import RepoSnapshot
+from git_commit_generator.diff_reader import DiffReader, FileStat, parse_numstat
+from git_commit_generator.diff_compactor import DiffCompactor
+from git_commit_generator.config_store import get_diff_limits
+from git_commit_generator.conflict_scanner import scan_files as scan_conflict_files
+from git_commit_generator.git_backend import get_backend
+from git_commit_generator import tracing
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 线程级的git工作目录，未设置时使用进程当前目录
+_thread_state = threading.local()
+# 目录 -> 相对仓库根目录的前缀
+_path_prefixes: Dict[str, str] = {}
+# 单次git diff传入的路径数上限，避免超出命令行长度限制
+PATHSPEC_BATCH_SIZE = 500
+# UTF-8中每个字符最多占用的字节数，用于把提示词的字符预算换算为字节上限
+MAX_BYTES_PER_CHAR = 4
+
 def git_command_handler(func: Callable) -> Callable:
     """装饰器：统一处理Git命令执行异常"""
     @wraps(func)
@@ -29,51 +46,180 @@ def git_command_handler(func: Callable) -> Callable:
 
 class GitOperations:
     """封装所有Git相关的操作"""
+
+    @staticmethod
+    @contextmanager
+    def working_directory(path: Optional[str]):
+        """在当前线程内将git命令的工作目录切换为path
+
+        os.chdir会影响整个进程，守护进程在多个线程中同时服务不同仓库时改用这种方式。
+        """
+        previous = getattr(_thread_state, 'cwd', None)
+        _thread_state.cwd = path
+        try:
+            yield
+        finally:
+            _thread_state.cwd = previous
+
+    @staticmethod
+    def current_directory() -> Optional[str]:
+        """当前线程的git工作目录，为None时表示进程当前目录"""
+        return getattr(_thread_state, 'cwd', None)
     
     @staticmethod
-    def run_git_command(cmd: List[str], check: bool = True) -> subprocess.CompletedProcess:
+    def run_git_command(cmd: List[str], check: bool = True,
+                        env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
         """执行Git命令的通用方法
         
         Args:
             cmd: Git命令及其参数列表
             check: 是否检查命令执行状态
+            env: 额外的环境变量，与当前环境合并
             
         Returns:
             subprocess.CompletedProcess: 命令执行结果
         """
-        # 添加编码处理，确保中文路径正确识别
-        return subprocess.run(cmd, check=check, encoding='utf-8', errors='ignore', capture_output=True)
+        if env:
+            env = {**os.environ, **env}
+        with tracing.span(' '.join(cmd[:2]), 'git', argv=' '.join(cmd)[:200]):
+            # 添加编码处理，确保中文路径正确识别
+            return subprocess.run(cmd, check=check, encoding='utf-8', errors='ignore', capture_output=True, env=env,
+                                  cwd=GitOperations.current_directory())
     
     @classmethod
-    def get_staged_diff(cls):
-        """获取暂存区的差异"""
-        result = cls.run_git_command(['git', 'diff', '--cached'])
-        return result.stdout.strip()
-    
+    def get_staged_stats(cls) -> List[FileStat]:
+        """获取暂存区各文件的增删行数、重命名和新建/删除/权限变更信息，不读取diff内容"""
+        result = cls.run_git_command(['git', 'diff', '--cached', '--numstat', '--summary', '-z'])
+        return parse_numstat(result.stdout)
+
     @classmethod
-    def get_unstaged_files(cls) -> List[str]:
-        """获取未暂存的文件列表"""
-        # 获取未跟踪的文件
-        untracked = cls.run_git_command(
-            ['git', 'ls-files', '--others', '--exclude-standard']
-        ).stdout.strip().splitlines()
+    def get_staged_diff(cls, max_bytes: Optional[int] = None, max_file_bytes: Optional[int] = None,
+                        budget_chars: Optional[int] = None, context_lines: Optional[int] = None) -> str:
+        """获取暂存区的差异
         
-        # 获取已修改但未暂存的文件
-        modified = cls.run_git_command(
-            ['git', 'diff', '--name-only']
-        ).stdout.strip().splitlines()
+        分两个阶段读取：先通过numstat/summary获取各文件的变更统计，二进制文件、锁文件等生成内容
+        以及变更行数明显超出上限的文件只保留统计信息；再只对其余文件读取diff。
+        diff以字节流方式读取，保留的内容受字节上限约束，超出上限的文件只保留文件头和增删行数。
         
-        # 合并两个列表并去重
-        files = list(set(untracked + modified))
-        return files
+        Args:
+            max_bytes: 保留的最大总字节数，为空时使用全局配置max_diff_bytes
+            max_file_bytes: 单个文件保留的最大字节数，为空时使用全局配置max_file_diff_bytes
+            budget_chars: 提示词中diff的字符预算，单个文件超出该预算的部分不会进入提示词，也不再读取
+            context_lines: 上下文行数，为空时使用全局配置diff_context_lines
+            
+        Raises:
+            subprocess.CalledProcessError: git命令执行失败
+        """
+        limits = get_diff_limits()
+        max_bytes = max_bytes or limits.max_bytes
+        max_file_bytes = max_file_bytes or limits.max_file_bytes
+        if budget_chars:
+            max_file_bytes = min(max_file_bytes, max(budget_chars * MAX_BYTES_PER_CHAR, 1024))
+        if context_lines is None:
+            context_lines = limits.context_lines
+
+        with tracing.span('git diff', 'git', argv='git diff --cached') as span:
+            stats = cls.get_staged_stats()
+            fetch, skipped = DiffCompactor.plan_fetch(stats, max_file_bytes)
+            texts, total_bytes, truncated = [], 0, False
+            for pathspecs in cls._diff_pathspecs(fetch, skipped):
+                # 非ASCII路径按原样输出，提示词中的文件名保持可读
+                reader = DiffReader(['git', '-c', 'core.quotePath=false', 'diff', '--cached',
+                                     f'-U{context_lines}'] + pathspecs,
+                                    max_bytes=max(max_bytes - total_bytes, 1),
+                                    max_file_bytes=max_file_bytes,
+                                    cwd=cls.current_directory())
+                texts.append(reader.read_text())
+                total_bytes += reader.kept_bytes
+                truncated = truncated or reader.truncated
+            texts.extend(stat.placeholder() for stat in skipped)
+            span.set(files=len(stats), fetched=len(fetch), kept=total_bytes, truncated=truncated)
+        if truncated:
+            logger.debug(f"暂存区diff超出{max_bytes}字节上限，超出部分已省略")
+        return '\n'.join(text for text in texts if text).strip()
+
+    @staticmethod
+    def _diff_pathspecs(fetch: List[FileStat], skipped: List[FileStat]) -> List[List[str]]:
+        """生成第二阶段各次git diff的路径参数
+
+        没有需要跳过的文件时读取全部diff；否则只传入需要读取的文件，重命名的文件同时传入新旧路径，
+        使git仍能识别为重命名。路径相对仓库根目录并按字面匹配。
+        """
+        if not fetch:
+            return []
+        if not skipped:
+            return [[]]
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        for stat in fetch:
+            if len(batch) >= PATHSPEC_BATCH_SIZE:
+                batches.append(batch)
+                batch = []
+            paths = [stat.path] if stat.old_path == stat.path else [stat.path, stat.old_path]
+            batch.extend(f':(top,literal){path}' for path in paths)
+        batches.append(batch)
+        return [['--'] + batch for batch in batches]
+
+    @classmethod
+    def get_snapshot(cls, untracked_files: str = 'all') -> RepoSnapshot:
+        """通过一次git status获取仓库状态快照
+        
+        Args:
+            untracked_files: 未跟踪文件的展示方式（all/normal/no），
+                只关心分支或暂存区时传no可避免扫描工作区
+            
+        Returns:
+            RepoSnapshot: 仓库状态快照
+        """
+        result = cls.run_git_command(
+            ['git', 'status', '--porcelain=v2', '-z', '--branch', f'--untracked-files={untracked_files}']
+        )
+        return RepoSnapshot.parse(result.stdout, cls.get_path_prefix())
+
+    @classmethod
+    def get_path_prefix(cls) -> str:
+        """当前目录相对仓库根目录的前缀（如'src/'），位于根目录时为空
+
+        同一目录的结果在进程内缓存，快照中的路径据此转换为相对当前目录的路径。
+        """
+        directory = os.path.abspath(cls.current_directory() or os.getcwd())
+        prefix = _path_prefixes.get(directory)
+        if prefix is None:
+            prefix = cls.run_git_command(['git', 'rev-parse', '--show-prefix']).stdout.strip()
+            _path_prefixes[directory] = prefix
+        return prefix
+
+    @classmethod
+    @git_command_handler
+    def get_hooks_dir(cls) -> str:
+        """获取仓库的钩子目录（遵循core.hooksPath，工作树中也指向主仓库的钩子目录）"""
+        path = cls.run_git_command(['git', 'rev-parse', '--git-path', 'hooks']).stdout.strip()
+        return os.path.abspath(os.path.join(cls.current_directory() or os.getcwd(), path))
+
+    @classmethod
+    @git_command_handler
+    def get_index_tree(cls) -> str:
+        """将暂存区写为树对象并返回其ID，暂存内容不变时ID不变，可作为暂存区的版本标识"""
+        return cls.run_git_command(['git', 'write-tree']).stdout.strip()
+
+    @classmethod
+    @git_command_handler
+    def get_comment_char(cls) -> str:
+        """提交信息中注释行的前缀（core.commentChar），未配置时为'#'，配置为auto时返回'auto'"""
+        result = cls.run_git_command(['git', 'config', '--get', 'core.commentChar'], check=False)
+        return result.stdout.strip() or '#'
+
+    @classmethod
+    def get_unstaged_files(cls, snapshot: Optional[RepoSnapshot] = None) -> List[str]:
+        """获取未暂存的文件列表（未跟踪文件和已修改但未暂存的文件）"""
+        snapshot = snapshot or cls.get_snapshot()
+        return snapshot.unstaged_files
     
     @classmethod
-    def get_staged_files(cls):
+    def get_staged_files(cls, snapshot: Optional[RepoSnapshot] = None) -> List[str]:
         """获取已暂存但未提交的文件列表"""
-        result = cls.run_git_command(
-            ['git', 'diff', '--name-only', '--cached']
-        ).stdout.strip().splitlines()
-        return result or []
+        snapshot = snapshot or cls.get_snapshot(untracked_files='no')
+        return snapshot.staged
     
     @classmethod
     def execute_add(cls, files: List[str]) -> bool:
@@ -113,18 +259,39 @@ class GitOperations:
     
     @classmethod
     @git_command_handler
-    def execute_push(cls, remote: str = 'origin', branch: str = '', commit_ids: List[str] = []) -> bool:
+    def remote_branch_exists(cls, remote: str, branch: str, interactive: bool = True) -> bool:
+        """检查远程分支是否存在（需要访问网络）
+        
+        Args:
+            remote: 远程仓库名称
+            branch: 分支名称
+            interactive: 是否允许git在终端询问凭据，后台探测时应为False，
+                需要认证时直接失败，由调用方在前台重新探测
+        """
+        check_branch_cmd = ['git', 'ls-remote', '--heads', remote, branch]
+        env = None
+        if not interactive:
+            env = {'GIT_TERMINAL_PROMPT': '0'}
+            if 'GIT_SSH_COMMAND' not in os.environ:
+                env['GIT_SSH_COMMAND'] = 'ssh -o BatchMode=yes'
+        return cls.run_git_command(check_branch_cmd, env=env).stdout != ''
+    
+    @classmethod
+    @git_command_handler
+    def execute_push(cls, remote: str = 'origin', branch: str = '', commit_ids: List[str] = [],
+                     branch_exists: Optional[bool] = None) -> bool:
         """推送到远程仓库
         
         Args:
             remote: 远程仓库名称
             branch: 目标分支名称
             commit_ids: 要推送的提交ID列表，为空则推送所有未推送的提交
+            branch_exists: 预先探测的远程分支是否存在，为None时在此处探测
         """
         if branch:
             # 检查远程分支是否存在
-            check_branch_cmd = ['git', 'ls-remote', '--heads', remote, branch]
-            branch_exists = cls.run_git_command(check_branch_cmd).stdout != ''
+            if branch_exists is None:
+                branch_exists = cls.remote_branch_exists(remote, branch)
             
             if not branch_exists:
                 from questionary import confirm
@@ -157,11 +324,11 @@ class GitOperations:
         return True
     
     @classmethod
-    def get_current_branch(cls):
+    def get_current_branch(cls, snapshot: Optional[RepoSnapshot] = None):
         """获取当前分支名称"""
         try:
-            result = cls.run_git_command(['git', 'branch', '--show-current'])
-            return result.stdout.strip()
+            snapshot = snapshot or cls.get_snapshot(untracked_files='no')
+            return snapshot.branch
         except Exception as e:
             error_msg = f"获取当前分支失败: {str(e)}"
             logger.error(error_msg)
@@ -169,23 +336,25 @@ class GitOperations:
 
     @classmethod
     @git_command_handler
-    def get_unpushed_commits(cls) -> List[dict]:
+    def get_unpushed_commits(cls, snapshot: Optional[RepoSnapshot] = None) -> List[dict]:
         """获取未推送的提交列表"""
-        # 获取当前分支名称
-        current_branch = cls.get_current_branch()
+        snapshot = snapshot or cls.get_snapshot(untracked_files='no')
+        current_branch = snapshot.branch
         logger.info(f"当前分支: {current_branch}")
         
         # 检查是否设置上游分支
-        try:
-            cls.run_git_command(['git', 'rev-parse', '--abbrev-ref', '@{u}'], check=True)
-        except Exception as e:
+        if not snapshot.has_upstream:
             error_msg = f"当前分支 {current_branch} 未关联远程分支\n解决方案: git branch --set-upstream-to=origin/{current_branch}"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
         
+        # 快照中已包含领先提交数，无领先提交时无需再执行git log
+        if snapshot.ahead == 0:
+            return []
+        
         # 获取未推送的提交
         result = cls.run_git_command(
-            ['git', 'log', f'origin/{current_branch}..HEAD', '--pretty=format:%H||%an||%ad||%s']
+            ['git', 'log', f'{snapshot.upstream}..HEAD', '--pretty=format:%H||%an||%ad||%s']
         )
         commit_lines = result.stdout.strip().splitlines()
         
@@ -207,69 +376,34 @@ class GitOperations:
     
     @classmethod
     @git_command_handler
-    def check_conflicts(cls) -> Tuple[bool, List[str], Dict[str, List[str]]]:
+    def check_conflicts(cls, snapshot: Optional[RepoSnapshot] = None) -> Tuple[bool, List[str], Dict[str, List[str]]]:
         """检查是否存在冲突文件
         
+        Args:
+            snapshot: 仓库状态快照，为空时重新获取
+        
         Returns:
             Tuple[bool, List[str], Dict[str, List[str]]]: 
             - 是否存在冲突
             - 冲突文件列表
             - 冲突文件的冲突块内容
         """
-        result = cls.run_git_command(['git', 'ls-files', '--unmerged'])
-        unmerged_files = result.stdout.strip().splitlines()
-        
-        if not unmerged_files:
-            logger.info("未发现冲突文件")
-            return False, [], {}
-        
-        # 提取冲突文件路径并去重
-        conflict_files = {parts[3] for line in unmerged_files 
-                        if line.strip() and len(parts := line.strip().split()) >= 4}
+        snapshot = snapshot or cls.get_snapshot(untracked_files='no')
+        conflict_files = list(dict.fromkeys(snapshot.unmerged))
         
         if not conflict_files:
-            logger.info("未发现有效的冲突文件")
+            logger.info("未发现冲突文件")
             return False, [], {}
         
         logger.info(f"发现{len(conflict_files)}个冲突文件")
-        conflict_files = list(conflict_files)
-        conflict_blocks = {}
-        
-        # 提取冲突代码块
+        # 并发、逐行流式提取冲突代码块；没有冲突标记的文件（修改/删除冲突、二进制文件）
+        # 通过长驻的cat-file进程读取暂存区中的各版本
+        backend = get_backend(cls.current_directory())
+        conflict_blocks = scan_conflict_files(conflict_files, read_stages=backend.read_stages)
         for file in conflict_files:
-            try:
-                if not os.path.exists(file):
-                    error_msg = f"冲突文件不存在: {file}"
-                    logger.error(error_msg)
-                    conflict_blocks[file] = [error_msg]
-                    continue
-                    
-                with open(file, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                
-                conflict_pattern = r'<<<<<<< .*?\n(.*?)=======\n(.*?)>>>>>>> .*?\n'
-                matches = list(re.finditer(conflict_pattern, content, re.DOTALL))
-                
-                if not matches:
-                    logger.warning(f"文件{file}未找到冲突标记")
-                    continue
-                
-                blocks = []
-                for match in matches:
-                    try:
-                        ours = match.group(1).strip()
-                        theirs = match.group(2).strip()
-                        blocks.append(f"<<<<<<< HEAD\n{ours}\n=======\n{theirs}\n>>>>>>> BRANCH")
-                    except Exception as e:
-                        logger.error(f"解析冲突块时出错: {str(e)}")
-                        continue
-                
-                if blocks:
-                    conflict_blocks[file] = blocks
-                    logger.info(f"文件{file}发现{len(blocks)}个冲突块")
-            except Exception as e:
-                error_msg = f"无法读取文件{file}的冲突内容: {str(e)}"
-                logger.error(error_msg)
-                conflict_blocks[file] = [error_msg]
+            if file not in conflict_blocks:
+                logger.warning(f"文件{file}未找到冲突标记")
+            else:
+                logger.info(f"文件{file}发现{len(conflict_blocks[file])}个冲突块")
     
         return True, conflict_files, conflict_blocks
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""prepare-commit-msg钩子
+
+安装后每次执行 `git commit`（未通过-m/-F等给出提交信息时）自动把生成的提交信息填入编辑器：
+
+    git-ai hook install
+    python -m git_commit_generator.hook run <提交信息文件> [来源] [提交ID]   # 由git调用
+
+钩子不使用任何交互界面，生成顺序为：
+1. 守护进程运行时通过git-ai-client请求（配置、连接与缓存都已就绪）
+2. 否则在本进程中生成，暂存区树对象命中缓存时直接复用，无需获取diff和请求模型
+超过时限仍未完成时保留git原有的空白模板，任何失败都不会阻止提交。
+"""
+import argparse
+import os
+import shlex
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+HOOK_NAME = 'prepare-commit-msg'
+HOOK_MARKER = '# git-ai prepare-commit-msg hook'
+# 生成提交信息的时限（秒）
+DEFAULT_HOOK_TIMEOUT = 10.0
+# 这些来源表示提交信息已经给出（-m/-F、合并、squash、--amend/-c），不做覆盖
+SKIP_SOURCES = {'message', 'merge', 'squash', 'commit'}
+# core.commentChar为auto时git从这些字符中选择注释前缀
+AUTO_COMMENT_CHARS = '#;@!$%^&|:'
+# git commit -v 在此行之后附上diff，该行及之后的内容不属于提交信息
+SCISSORS = '------------------------ >8 ------------------------'
+
+
+def hook_path() -> str:
+    from git_commit_generator.git_operations import GitOperations
+    return os.path.join(GitOperations.get_hooks_dir(), HOOK_NAME)
+
+
+def _is_git_ai_hook(path: str) -> bool:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return HOOK_MARKER in f.read()
+    except OSError:
+        return False
+
+
+def is_installed() -> bool:
+    return _is_git_ai_hook(hook_path())
+
+
+def install(timeout: float = DEFAULT_HOOK_TIMEOUT, force: bool = False) -> str:
+    """在当前仓库安装钩子，返回钩子文件路径
+
+    Raises:
+        RuntimeError: 已存在其他prepare-commit-msg钩子且未指定force
+    """
+    path = hook_path()
+    if os.path.exists(path) and not _is_git_ai_hook(path) and not force:
+        raise RuntimeError(f"已存在其他{HOOK_NAME}钩子: {path}，如需覆盖请使用 --force")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 使用安装时的解释器，保证钩子运行在安装git-ai的环境中
+    script = (
+        "#!/bin/sh\n"
+        f"{HOOK_MARKER}\n"
+        "# 由 git-ai hook install 生成，git-ai hook uninstall 移除\n"
+        f"exec {shlex.quote(sys.executable)} -m git_commit_generator.hook run --timeout {timeout:g} \"$@\"\n"
+    )
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(script)
+    os.chmod(path, 0o755)
+    return path
+
+
+def uninstall() -> bool:
+    """移除git-ai安装的钩子，不存在或不是git-ai的钩子时返回False"""
+    path = hook_path()
+    if not _is_git_ai_hook(path):
+        return False
+    os.remove(path)
+    return True
+
+
+def _comment_prefixes() -> Tuple[str, ...]:
+    """当前仓库提交信息中注释行可能使用的前缀"""
+    from git_commit_generator.git_operations import GitOperations
+    try:
+        comment_char = GitOperations.get_comment_char()
+    except RuntimeError:
+        comment_char = '#'
+    return tuple(AUTO_COMMENT_CHARS) if comment_char == 'auto' else (comment_char,)
+
+
+def _has_message(content: str, comment_prefixes: Tuple[str, ...] = ('#',)) -> bool:
+    """提交信息文件中是否已有非注释内容，剪刀线（git commit -v）之后的diff不计入"""
+    for line in content.splitlines():
+        prefix = next((p for p in comment_prefixes if line.startswith(p)), None)
+        if prefix is not None:
+            if line[len(prefix):].strip() == SCISSORS:
+                break
+            continue
+        if line.strip():
+            return True
+    return False
+
+
+def _generate(result: Dict[str, str], timeout: float):
+    """生成提交信息并写入result['message']，在后台线程中运行"""
+    from git_commit_generator import client
+    try:
+        result['message'] = client.generate(use_cache=True, timeout=timeout)
+        return
+    except client.DaemonNotRunning:
+        pass
+
+    from git_commit_generator.config import ConfigManager
+    from git_commit_generator.core import CommitGenerator
+    generator = CommitGenerator(ConfigManager())
+    tree = generator.git.get_index_tree()
+    cached = generator.get_message_for_tree(tree)
+    if cached:
+        result['message'] = cached
+        return
+    diff_content = generator.get_staged_diff()
+    if not diff_content:
+        return
+    message = generator.generate_commit_message(diff_content)
+    generator.remember_tree(tree, message)
+    result['message'] = message
+
+
+def run(message_file: str, source: str = '', timeout: float = DEFAULT_HOOK_TIMEOUT) -> bool:
+    """填充提交信息文件
+
+    Returns:
+        bool: 是否在时限内完成（未超时即为True，无论是否写入了内容）
+    """
+    if source in SKIP_SOURCES:
+        return True
+    try:
+        with open(message_file, 'r', encoding='utf-8') as f:
+            original = f.read()
+    except OSError as e:
+        print(f"git-ai: 读取提交信息文件失败: {str(e)}", file=sys.stderr)
+        return True
+    if _has_message(original, _comment_prefixes()):
+        return True
+
+    result: Dict[str, str] = {}
+    errors: List[Exception] = []
+
+    def worker():
+        try:
+            _generate(result, timeout)
+        except Exception as e:
+            errors.append(e)
+
+    start = time.monotonic()
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        print(f"git-ai: 生成提交信息超时（{timeout:g}秒），使用空白模板", file=sys.stderr)
+        return False
+    if errors:
+        print(f"git-ai: 生成提交信息失败，使用空白模板: {str(errors[0])}", file=sys.stderr)
+        return True
+    message = result.get('message')
+    if not message:
+        return True
+    try:
+        with open(message_file, 'w', encoding='utf-8') as f:
+            # 保留git写入的注释（暂存文件列表等），生成的信息放在最前面
+            f.write(f"{message}\n\n{original}" if original else f"{message}\n")
+    except OSError as e:
+        print(f"git-ai: 写入提交信息文件失败: {str(e)}", file=sys.stderr)
+    else:
+        print(f"git-ai: 已生成提交信息（{time.monotonic() - start:.1f}秒）", file=sys.stderr)
+    return True
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='git-ai-hook', description="git-ai的prepare-commit-msg钩子")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="由git调用，填充提交信息文件")
+    run_parser.add_argument('message_file')
+    run_parser.add_argument('source', nargs='?', default='')
+    run_parser.add_argument('sha', nargs='?', default='')
+    run_parser.add_argument('--timeout', type=float, default=DEFAULT_HOOK_TIMEOUT)
+    options = parser.parse_args(args)
+
+    finished = run(options.message_file, options.source, options.timeout)
+    if not finished:
+        # 后台仍有未完成的请求（如map阶段的线程池），不等待其结束，直接退出以免阻塞提交
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
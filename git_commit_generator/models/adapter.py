@@ -1,24 +1,47 @@
+from typing import Iterator, Optional
+from git_commit_generator.config_store import get_provider_profile, get_hedge_policy, get_fallback_providers
 from .provider import Provider
+from .resilience import FallbackChain
 
 class ModelAdapter:
     def __init__(self, provider_name: str):
-        self.provider_instance = Provider()
-        self.provider_instance.current_provider = provider_name
-        # 重新初始化Provider实例的配置
-        from git_commit_generator.config import ConfigManager
-        config = ConfigManager()._load_config()
-        providers = config.get('providers', {})
-        self.provider_instance.max_tokens = providers.get(provider_name, {}).get('max_tokens', 1024)
-        self.provider_instance.api_key = providers.get(provider_name, {}).get('api_key', '')
-        self.provider_instance.model_name = providers.get(provider_name, {}).get('model_name', '')
-        self.provider_instance.model_url = providers.get(provider_name, {}).get('model_url', '')
-        self.provider_instance.provider_type = self.provider_instance._get_provider_type()
+        self.provider_instance = Provider(get_provider_profile(provider_name))
         self.provider_name = provider_name
+        # 主提供商后接fallback_providers配置的备用提供商，每个提供商按自身max_retries重试
+        self.chain = FallbackChain([self.provider_instance] + [
+            Provider(get_provider_profile(name)) for name in get_fallback_providers(provider_name)
+        ])
+        # 配置了hedge_provider时启用对冲请求
+        self.hedged = None
+        hedge = get_hedge_policy(provider_name)
+        if hedge is not None:
+            from .hedging import HedgedStream
+            secondary = FallbackChain([Provider(get_provider_profile(hedge.provider))], self.chain.breaker)
+            self.hedged = HedgedStream(self.chain, secondary, hedge.delay)
+
+    @property
+    def last_provider(self) -> Optional[str]:
+        """最近一次请求实际返回结果的提供商"""
+        if self.hedged is not None and self.hedged.winner:
+            return self.hedged.winner
+        return self.chain.current_provider
 
     def generate_commit(self, diff: str) -> str:
         """生成提交信息"""
-        return self.provider_instance.generate(diff)
+        return self.generate(diff)
+
+    def generate(self, prompt: str, hedge: bool = True) -> str:
+        """统一生成接口
+
+        :param hedge: 是否允许对冲请求；map-reduce的中间请求数量多且不在关键路径的末端，
+            对冲会成倍增加请求量，应传入False
+        """
+        if hedge and self.hedged is not None:
+            return self.hedged.generate(prompt)
+        return self.chain.generate(prompt)
 
-    def generate(self, prompt: str) -> str:
-        """统一生成接口"""
-        return self.provider_instance.generate(prompt)
\ No newline at end of file
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """统一流式生成接口"""
+        if self.hedged is not None:
+            return self.hedged.generate_stream(prompt)
+        return self.chain.generate_stream(prompt)
@@ -0,0 +1,111 @@
+import queue
+import threading
+from typing import Iterator, List, Optional
+
+# 队列事件类型
+_CHUNK = 'chunk'
+_ERROR = 'error'
+_END = 'end'
+
+
+class _Attempt:
+    """在后台线程中运行的一次流式请求，文本块通过共享队列交给调用方"""
+
+    def __init__(self, index: int, provider, prompt: str, events: 'queue.Queue'):
+        self.index = index
+        self.provider = provider
+        self.cancelled = threading.Event()
+        self._prompt = prompt
+        self._events = events
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        stream = self.provider.generate_stream(self._prompt)
+        try:
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    return
+                self._events.put((self.index, _CHUNK, chunk))
+            self._events.put((self.index, _END, None))
+        except Exception as e:
+            self._events.put((self.index, _ERROR, e))
+        finally:
+            # 在本线程内关闭生成器，从而关闭底层的流式响应并归还连接
+            stream.close()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class HedgedStream:
+    """对冲的流式请求
+
+    先向主提供商发出请求，若在delay秒内没有收到首个文本块（或主请求已失败），
+    再向备用提供商发出同一请求。先产出文本块的一方胜出，之后只转发它的输出，
+    另一方被取消：其后台线程在收到下一个数据块时退出并关闭连接。
+    """
+
+    def __init__(self, primary, secondary, delay: float):
+        """
+        :param primary: 主提供商（Provider或FallbackChain等具有generate_stream和current_provider的对象）
+        :param secondary: 备用提供商
+        :param delay: 发出对冲请求前等待首个token的秒数
+        """
+        self.primary = primary
+        self.secondary = secondary
+        self.delay = delay
+        # 最近一次请求胜出的提供商名称
+        self.winner: Optional[str] = None
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """流式生成，两个提供商都失败时抛出主提供商的异常"""
+        events: 'queue.Queue' = queue.Queue()
+        attempts: List[_Attempt] = [_Attempt(0, self.primary, prompt, events)]
+        errors: List[Optional[Exception]] = [None, None]
+        winner: Optional[_Attempt] = None
+        self.winner = None
+
+        def hedge():
+            attempts.append(_Attempt(1, self.secondary, prompt, events))
+
+        try:
+            while True:
+                try:
+                    timeout = self.delay if len(attempts) == 1 and winner is None else None
+                    index, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    # 主提供商在延迟内没有返回首个token
+                    hedge()
+                    continue
+
+                if winner is not None and index != winner.index:
+                    continue
+                if kind == _CHUNK:
+                    if winner is None:
+                        winner = attempts[index]
+                        self.winner = winner.provider.current_provider
+                        for attempt in attempts:
+                            if attempt is not winner:
+                                attempt.cancel()
+                    yield payload
+                elif kind == _END:
+                    if winner is None:
+                        # 空响应也算完成
+                        self.winner = attempts[index].provider.current_provider
+                    return
+                else:
+                    if winner is not None:
+                        raise payload
+                    errors[index] = payload
+                    if len(attempts) == 1:
+                        # 主请求在延迟内失败，立即改用备用提供商
+                        hedge()
+                    elif all(errors[attempt.index] is not None for attempt in attempts):
+                        raise errors[0]
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def generate(self, prompt: str) -> str:
+        """非流式生成，同样按首个文本块到达的先后决定使用哪个提供商"""
+        return ''.join(self.generate_stream(prompt)).strip()
@@ -1,47 +1,91 @@
 import json
-import os
-from typing import Dict, Any, List
-from requests import api
+import logging
+import time
+from typing import Dict, Any, List, Iterator, NamedTuple, Optional, Tuple, Union
+from git_commit_generator.config_store import ConfigStore, ProviderProfile, PROVIDER_FILE, get_provider_profile
+from .transport import Transport
+from .rate_limit import get_rate_limiter
+from git_commit_generator import tracing
+from git_commit_generator.tokens import get_estimator
+
+logger = logging.getLogger(__name__)
+
+# 留给生成结果的最少token数，提示词占满上下文窗口到低于该值时不再发送请求
+MIN_OUTPUT_TOKENS = 64
+
+
+class Prompt(NamedTuple):
+    """拆分为固定前缀与可变部分的提示词
+
+    system为要求说明、示例等不随diff变化的内容，以系统消息/系统指令的形式放在请求最前面，
+    使提供商能够缓存这段前缀；user为本次的diff等可变内容。
+    """
+    system: str
+    user: str
+
+
+class ProviderError(Exception):
+    """提供商请求失败
+
+    保留HTTP状态码与Retry-After，供上层判断是否值得重试或切换提供商。
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class ContextLengthError(ProviderError):
+    """提示词超出提供商上下文窗口，发送前即被拒绝，不计入断路器的失败次数"""
 
 
 class Provider:
     """统一的Provider类，能够适配各种大模型API"""
     
-    def __init__(self):
-        from git_commit_generator.config import ConfigManager
-        self.config = ConfigManager()._load_config()
-        self.current_provider = self.config.get('current_provider', '')
-        providers = self.config.get('providers', {})
-        self.max_tokens = providers.get(self.current_provider, {}).get('max_tokens', 1024)
-        self.api_key = providers.get(self.current_provider, {}).get('api_key', '')
-        self.model_name = providers.get(self.current_provider, {}).get('model_name', '')
-        self.model_url = providers.get(self.current_provider, {}).get('model_url', '')
-        self.provider_type = self._get_provider_type()
-        
+    def __init__(self, profile: Optional[ProviderProfile] = None):
+        """
+        :param profile: 提供商配置，为空时使用当前选中的提供商
+        """
+        self.apply_profile(profile or get_provider_profile())
+
+    def apply_profile(self, profile: ProviderProfile):
+        """应用提供商配置"""
+        self.profile = profile
+        self.current_provider = profile.name
+        self.provider_type = profile.provider_type
+        self.api_key = profile.api_key
+        self.model_name = profile.model_name
+        self.model_url = profile.model_url
+        self.max_tokens = profile.max_tokens
+        self.context_window = profile.context_window
+        self.connect_timeout = profile.connect_timeout
+        self.read_timeout = profile.read_timeout
+        self.pool_maxsize = profile.pool_maxsize
+        self.max_retries = profile.max_retries
+        self.rate_limiter = get_rate_limiter(profile)
+        self.estimator = get_estimator(profile.provider_type, profile.name, profile.model_name)
+        # 最近一次请求的token用量（prompt_tokens/completion_tokens），提供商未返回时为None
+        self.last_usage: Optional[Dict[str, int]] = None
         
     def _read_provider_file(self, error_message: str) -> Dict[str, Any]:
-        """读取提供商配置文件"""
-        try:
-            file_path = os.path.join(os.path.dirname(__file__), '.provider.json')
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+        """读取提供商配置文件（进程内缓存，返回结果只读）"""
+        providers = ConfigStore.load_json(PROVIDER_FILE)
+        if providers is None:
             raise FileNotFoundError(error_message)
-
-    def _get_provider_type(self) -> str:
-        """根据提供商名称获取提供商类型"""
-        json_file_providers = self._read_provider_file("无法加载提供商类型")
-        provider_info = json_file_providers.get(self.current_provider, {})
-        return provider_info.get('provider', 'OtherProvider')
+        return providers
 
     def _write_provider_file(self, data: Dict[str, Any], error_message: str) -> None:
         """写入提供商配置文件"""
         try:
-            file_path = os.path.join(os.path.dirname(__file__), '.provider.json')
-            with open(file_path, 'w', encoding='utf-8') as f:
+            with open(PROVIDER_FILE, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
         except (FileNotFoundError, PermissionError) as e:
             raise IOError(f"{error_message}: {str(e)}")
+        finally:
+            ConfigStore.invalidate(PROVIDER_FILE)
 
     def get_providers(self) -> List[str]:
         """获取所有模型提供商"""
@@ -76,37 +120,81 @@ class Provider:
             
         return headers
     
-    def _prepare_data(self, prompt: str) -> Dict[str, Any]:
-        """根据不同提供商准备请求数据"""
+    @staticmethod
+    def _split_prompt(prompt: Union[str, Prompt]) -> Tuple[str, str]:
+        """返回(固定前缀, 可变内容)，普通字符串提示词没有固定前缀"""
+        if isinstance(prompt, Prompt):
+            return prompt.system, prompt.user
+        return '', prompt
+
+    def estimate_prompt_tokens(self, prompt: Union[str, Prompt]) -> int:
+        """估算提示词（含系统消息）的token数"""
+        system, user = self._split_prompt(prompt)
+        return (self.estimator.count(system) if system else 0) + self.estimator.count(user)
+
+    def _prepare_data(self, prompt: Union[str, Prompt], stream: bool = False,
+                      max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """根据不同提供商准备请求数据
+
+        固定前缀放在各提供商的系统消息位置并排在最前：OpenAI/DeepSeek等按请求前缀自动缓存，
+        Anthropic需要显式的cache_control标记，Google使用systemInstruction。
+        
+        Args:
+            prompt: 提示词，Prompt时拆分为系统消息与用户消息
+            stream: 是否请求流式（SSE）响应，Google通过URL区分，不在请求体中标记
+            max_tokens: 本次生成的token上限，为空时使用配置的max_tokens
+        """
+        max_tokens = max_tokens or self.max_tokens
+        system, user = self._split_prompt(prompt)
         if self.provider_type == "HuggingFaceProvider":
-            return {
-                "inputs": prompt,
+            data = {
+                "inputs": f"{system}\n\n{user}" if system else user,
                 "parameters": {
-                    "max_new_tokens": self.max_tokens,
+                    "max_new_tokens": max_tokens,
                     "temperature": 0.7
                 }
             }
         elif self.provider_type == "GoogleProvider":
-            return {
+            data = {
                 "contents": [{
-                    "parts": [{"text": prompt}]
-                }]
+                    "role": "user",
+                    "parts": [{"text": user}]
+                }],
+                "generationConfig": {"maxOutputTokens": max_tokens}
             }
+            if system:
+                data["systemInstruction"] = {"parts": [{"text": system}]}
+            return data
         elif self.current_provider == "Baidu":
-            return {
-                "messages": [{"role": "user", "content": prompt}],
+            data = {
+                "messages": [{"role": "user", "content": user}],
                 "temperature": 0.7,
                 "top_p": 0.8
             }
+            if system:
+                data["system"] = system
+        elif self.current_provider == "Anthropic":
+            data = {
+                "model": self.model_name,
+                "messages": [{"role": "user", "content": user}],
+                "temperature": 0.7,
+                "max_tokens": max_tokens
+            }
+            if system:
+                data["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
         else:  # OpenAI和Azure等使用类似格式
-            return {
+            messages = [{"role": "system", "content": system}] if system else []
+            data = {
                 "model": self.model_name,
-                "messages": [{"role": "user", "content": prompt}],
+                "messages": messages + [{"role": "user", "content": user}],
                 "temperature": 0.7,
-                "max_tokens": self.max_tokens
+                "max_tokens": max_tokens
             }
+        if stream:
+            data["stream"] = True
+        return data
     
-    def _prepare_url(self) -> str:
+    def _prepare_url(self, stream: bool = False) -> str:
         """根据不同提供商准备请求URL"""
         if self.provider_type == "AzureProvider":
             return f"{self.model_url}?api-version=2023-05-15"
@@ -115,6 +203,10 @@ class Provider:
             # 实际使用时，需要通过API获取access_token
             # 这里假设api_key就是access_token
             return f"{self.model_url}?access_token={self.api_key}"
+        elif self.provider_type == "GoogleProvider" and stream:
+            # Google的流式接口为streamGenerateContent，并通过alt=sse返回SSE格式
+            url = self.model_url.replace(':generateContent', ':streamGenerateContent')
+            return f"{url}{'&' if '?' in url else '?'}alt=sse"
         return self.model_url
     
     def _parse_response(self, response_json: Dict[str, Any]) -> str:
@@ -132,6 +224,42 @@ class Provider:
         else:  # OpenAI, Azure, DeepSeek, ChatGLM等使用类似格式
             return response_json['choices'][0]['message']['content'].strip()
     
+    def _parse_stream_chunk(self, chunk_json: Dict[str, Any]) -> str:
+        """根据不同提供商解析流式响应中的单个数据块，返回本块新增的文本"""
+        if self.provider_type == "HuggingFaceProvider":
+            token = chunk_json.get('token') or {}
+            return '' if token.get('special') else token.get('text', '')
+        elif self.provider_type == "GoogleProvider":
+            candidates = chunk_json.get('candidates') or [{}]
+            parts = candidates[0].get('content', {}).get('parts') or [{}]
+            return parts[0].get('text', '')
+        elif self.current_provider == "Anthropic":
+            # 仅content_block_delta事件携带文本，其余事件（message_start/ping等）忽略
+            if chunk_json.get('type') == 'content_block_delta':
+                return chunk_json.get('delta', {}).get('text', '')
+            return ''
+        elif self.current_provider == "Baidu":
+            return chunk_json.get('result', '')
+        else:  # OpenAI, Azure, DeepSeek, ChatGLM, Moonshot等使用类似格式
+            choices = chunk_json.get('choices') or [{}]
+            return choices[0].get('delta', {}).get('content') or ''
+
+    def _iter_sse_data(self, response) -> Iterator[Dict[str, Any]]:
+        """逐行读取SSE响应，产出每个data字段解析后的JSON"""
+        # SSE规定使用UTF-8编码；响应头未声明charset时requests会按ISO-8859-1解码，导致中文乱码
+        response.encoding = 'utf-8'
+        # chunk_size=None时按服务端发送的分块读取，否则要攒满固定字节数才产出，首块会被推迟
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            payload = line[len('data:'):].strip()
+            if payload == '[DONE]':
+                break
+            try:
+                yield json.loads(payload)
+            except json.JSONDecodeError:
+                continue
+
     def _get_error_message(self) -> str:
         """获取错误信息前缀"""
         provider_error_messages = {
@@ -149,21 +277,168 @@ class Provider:
             
         return provider_error_messages.get(self.provider_type, "API请求失败")
 
-    def generate(self, prompt: str) -> str:
+    def _wrap_error(self, error: Exception) -> ProviderError:
+        """将请求异常包装为ProviderError：429、5xx以及连接错误/超时视为可重试"""
+        if isinstance(error, ProviderError):
+            return error
+        import requests
+        response = getattr(error, 'response', None)
+        status_code = getattr(response, 'status_code', None)
+        retry_after = None
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                retry_after = None
+        retryable = (status_code == 429 or (status_code is not None and status_code >= 500)
+                     or isinstance(error, (requests.ConnectionError, requests.Timeout,
+                                           requests.exceptions.ChunkedEncodingError)))
+        return ProviderError(f"{self._get_error_message()}: {str(error)}",
+                             status_code=status_code, retryable=retryable, retry_after=retry_after)
+
+    def _plan_request(self, prompt: Union[str, Prompt]) -> Tuple[int, int]:
+        """估算提示词token数并确定本次的生成上限
+
+        生成上限取配置的max_tokens与上下文窗口剩余空间中的较小值；
+        剩余空间不足MIN_OUTPUT_TOKENS时直接拒绝，避免发出注定因超长而失败的请求。
+
+        Returns:
+            (提示词估算token数, 生成token上限)
+        """
+        prompt_tokens = self.estimate_prompt_tokens(prompt)
+        max_tokens = min(int(self.max_tokens), int(self.context_window) - prompt_tokens)
+        if max_tokens < MIN_OUTPUT_TOKENS:
+            raise ContextLengthError(
+                f"{self._get_error_message()}: 提示词约{prompt_tokens} tokens，"
+                f"超出上下文窗口({self.context_window})，请减少暂存的变更或调大context_window")
+        return prompt_tokens, max_tokens
+
+    def _rate_limited(self, tokens: int):
+        """在提供商限流器（未配置时不限制）的范围内执行请求
+
+        Args:
+            tokens: 本次请求预计消耗的token数（提示词 + 生成上限），用于tpm限流
+        """
+        if self.rate_limiter is None:
+            from contextlib import nullcontext
+            return nullcontext()
+        return self.rate_limiter.acquire(tokens)
+
+    def _parse_usage(self, response_json: Dict[str, Any]) -> Dict[str, int]:
+        """提取响应（或流式数据块）中的token用量
+
+        统一为prompt_tokens（提示词总数，含缓存部分）、completion_tokens、
+        cached_tokens（命中缓存的提示词token数）和cache_write_tokens（本次写入缓存的token数，仅Anthropic）。
+        """
+        if self.provider_type == "GoogleProvider":
+            usage = response_json.get('usageMetadata') or {}
+            fields = {'prompt_tokens': usage.get('promptTokenCount'),
+                      'completion_tokens': usage.get('candidatesTokenCount'),
+                      'cached_tokens': usage.get('cachedContentTokenCount')}
+        elif self.current_provider == "Anthropic":
+            # 流式响应的提示词用量在message_start事件的message.usage中
+            usage = response_json.get('usage') or (response_json.get('message') or {}).get('usage') or {}
+            # Anthropic的input_tokens不含读写缓存的部分
+            cache_read = usage.get('cache_read_input_tokens') or 0
+            cache_write = usage.get('cache_creation_input_tokens') or 0
+            input_tokens = usage.get('input_tokens')
+            fields = {'prompt_tokens': input_tokens + cache_read + cache_write if isinstance(input_tokens, int) else None,
+                      'completion_tokens': usage.get('output_tokens'),
+                      'cached_tokens': cache_read,
+                      'cache_write_tokens': cache_write}
+        else:
+            usage = response_json.get('usage') or {}
+            if not isinstance(usage, dict):
+                return {}
+            details = usage.get('prompt_tokens_details') or {}
+            fields = {'prompt_tokens': usage.get('prompt_tokens'),
+                      'completion_tokens': usage.get('completion_tokens'),
+                      # OpenAI为prompt_tokens_details.cached_tokens，DeepSeek为prompt_cache_hit_tokens
+                      'cached_tokens': details.get('cached_tokens') or usage.get('prompt_cache_hit_tokens')}
+        return {key: value for key, value in fields.items() if isinstance(value, int) and value > 0}
+
+    def _record_usage(self, usage: Dict[str, int], prompt: Union[str, Prompt]):
+        """记录用量，并用实际提示词token数校准估算器"""
+        if not usage:
+            return
+        self.last_usage = usage
+        if 'prompt_tokens' in usage:
+            system, user = self._split_prompt(prompt)
+            self.estimator.observe(self.estimator.raw_count(system) + self.estimator.raw_count(user),
+                                   usage['prompt_tokens'])
+
+    def _post(self, url: str, **kwargs):
+        """通过共享连接池发送请求"""
+        return Transport.post(
+            url,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            pool_maxsize=self.pool_maxsize,
+            **kwargs
+        )
+
+    def generate(self, prompt: Union[str, Prompt]) -> str:
         """统一的生成接口，适配各种大模型API"""
+        prompt_tokens, max_tokens = self._plan_request(prompt)
         headers = self._prepare_headers()
-        data = self._prepare_data(prompt)
+        data = self._prepare_data(prompt, max_tokens=max_tokens)
         url = self._prepare_url()
+        self.last_usage = None
         
         try:
-            # 需要调试的提供商，保留调试信息
-            print(self.model_name, url)
-                
-            response = api.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            return self._parse_response(response.json())
+            # 查询参数中可能带有access_token等凭据，调试信息中不记录
+            logger.debug(f"请求 {self.model_name}: {url.split('?', 1)[0]}")
+            with tracing.span('provider.generate', 'network', provider=self.current_provider,
+                              model=self.model_name) as span:
+                with self._rate_limited(prompt_tokens + max_tokens):
+                    response = self._post(url, headers=headers, json=data)
+                response.raise_for_status()
+                with tracing.span('provider.parse', 'network'):
+                    response_json = response.json()
+                    self._record_usage(self._parse_usage(response_json), prompt)
+                    span.set(**(self.last_usage or {}))
+                    return self._parse_response(response_json)
         except Exception as e:
-            error_message = self._get_error_message()
-            
-            raise Exception(f"{error_message}: {str(e)}")
+            raise self._wrap_error(e)
+
+    def generate_stream(self, prompt: Union[str, Prompt]) -> Iterator[str]:
+        """流式生成接口，逐块产出模型返回的文本
+        
+        提供商不支持流式而直接返回完整JSON时，退化为一次性产出全部文本。
+        """
+        prompt_tokens, max_tokens = self._plan_request(prompt)
+        headers = self._prepare_headers()
+        data = self._prepare_data(prompt, stream=True, max_tokens=max_tokens)
+        url = self._prepare_url(stream=True)
+        self.last_usage = None
+        
+        start = time.perf_counter()
+        first_token = True
+        usage: Dict[str, int] = {}
+        try:
+            with self._rate_limited(prompt_tokens + max_tokens), \
+                    self._post(url, headers=headers, json=data, stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '')
+                if 'text/event-stream' not in content_type:
+                    response_json = response.json()
+                    self._record_usage(self._parse_usage(response_json), prompt)
+                    yield self._parse_response(response_json)
+                    return
+                for chunk_json in self._iter_sse_data(response):
+                    # 用量分散在不同事件中（如Anthropic的message_start与message_delta），逐块合并
+                    usage.update(self._parse_usage(chunk_json))
+                    text = self._parse_stream_chunk(chunk_json)
+                    if text:
+                        if first_token:
+                            first_token = False
+                            tracing.record_since('provider.first_token', start, 'network',
+                                                 provider=self.current_provider)
+                        yield text
+            self._record_usage(usage, prompt)
+        except Exception as e:
+            raise self._wrap_error(e)
+        finally:
+            tracing.record_since('provider.stream', start, 'network', provider=self.current_provider,
+                                 model=self.model_name, **(self.last_usage or {}))
 
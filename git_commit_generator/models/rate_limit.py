@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from git_commit_generator.cache import default_cache_dir
+from git_commit_generator.config_store import ProviderProfile
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，只能在进程内限流
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 等待配额或并发槽位时单次休眠的上限（秒），使多个等待者能及时感知释放
+MAX_WAIT_STEP = 1.0
+# 分多次补充的浮点误差容限，避免余量只差极小值时反复休眠近乎为0的时间
+LEVEL_EPSILON = 1e-9
+
+
+class _FileLock:
+    """基于fcntl.flock的文件锁，进程退出时由操作系统自动释放"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RateLimiter:
+    """单个提供商的客户端限流器
+
+    - 请求数（rpm）与token数（tpm）各用一个令牌桶限制，桶容量为每分钟配额，按配额匀速补充；
+    - max_in_flight限制同时进行中的请求数，流式请求在整个流结束前都占用槽位；
+    - shared为True时，令牌桶状态保存在缓存目录的状态文件中，并发槽位用一组锁文件实现，
+      同一用户的多个进程共享配额（依赖fcntl，不可用时退化为进程内限流）。
+    """
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0, max_in_flight: int = 0,
+                 shared: bool = False, state_dir: Optional[str] = None,
+                 sleep=time.sleep, clock=time.time):
+        self.name = name
+        self.rpm = max(0, int(rpm))
+        self.tpm = max(0, int(tpm))
+        self.max_in_flight = max(0, int(max_in_flight))
+        self.shared = shared and fcntl is not None
+        if shared and fcntl is None:
+            logger.debug("当前平台不支持文件锁，限流只在进程内生效")
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+        self._levels = {'requests': float(self.rpm), 'tokens': float(self.tpm), 'updated': clock()}
+        if self.shared:
+            self.state_dir = os.path.join(state_dir or default_cache_dir(), 'ratelimit')
+            os.makedirs(self.state_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm or self.max_in_flight)
+
+    def _state_path(self, suffix: str) -> str:
+        return os.path.join(self.state_dir, f"{self.name}{suffix}")
+
+    def _try_take(self, levels: Dict[str, float], tokens: int, now: float) -> float:
+        """按经过的时间补充令牌后尝试扣除，成功返回0，否则返回还需等待的秒数"""
+        elapsed = max(0.0, now - levels.get('updated', now))
+        levels['updated'] = now
+        wait = 0.0
+        for key, per_minute, amount in (('requests', self.rpm, 1), ('tokens', self.tpm, tokens)):
+            if not per_minute:
+                continue
+            # 单次请求超过整桶容量时按整桶计，否则永远无法满足
+            amount = min(amount, per_minute)
+            level = min(float(per_minute), levels.get(key, per_minute) + elapsed * per_minute / 60.0)
+            levels[key] = level
+            if level + LEVEL_EPSILON < amount:
+                wait = max(wait, (amount - level) * 60.0 / per_minute)
+        if wait:
+            return wait
+        levels['requests'] = levels.get('requests', 0) - (1 if self.rpm else 0)
+        levels['tokens'] = levels.get('tokens', 0) - (min(tokens, self.tpm) if self.tpm else 0)
+        return 0.0
+
+    def _take_shared(self, tokens: int) -> float:
+        """在文件锁保护下读写共享的令牌桶状态"""
+        with _FileLock(self._state_path('.lock')):
+            path = self._state_path('.json')
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    levels = json.load(f)
+            except (OSError, ValueError):
+                levels = {'requests': float(self.rpm), 'tokens': float(self.tpm), 'updated': self._clock()}
+            wait = self._try_take(levels, tokens, self._clock())
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(levels, f)
+            os.replace(tmp_path, path)
+            return wait
+
+    def _reserve(self, tokens: int):
+        """阻塞直到令牌桶中有足够的请求数与token配额"""
+        if not (self.rpm or self.tpm):
+            return
+        while True:
+            if self.shared:
+                wait = self._take_shared(tokens)
+            else:
+                with self._lock:
+                    wait = self._try_take(self._levels, tokens, self._clock())
+            if not wait:
+                return
+            logger.debug(f"{self.name}达到速率上限，等待{wait:.2f}秒")
+            self._sleep(min(wait, MAX_WAIT_STEP))
+
+    def _acquire_slot(self) -> Optional[_FileLock]:
+        """占用一个并发槽位，共享模式下返回持有的槽位文件锁"""
+        if not self.max_in_flight:
+            return None
+        if not self.shared:
+            self._semaphore.acquire()
+            return None
+        slots = [_FileLock(self._state_path(f'.slot{i}')) for i in range(self.max_in_flight)]
+        delay = 0.05
+        while True:
+            for slot in slots:
+                if slot.acquire(blocking=False):
+                    return slot
+            self._sleep(delay)
+            delay = min(delay * 2, MAX_WAIT_STEP)
+
+    @contextmanager
+    def acquire(self, tokens: int = 0) -> Iterator[None]:
+        """在限流范围内执行一次请求
+
+        Args:
+            tokens: 本次请求预计消耗的token数（提示词+最大生成长度）
+        """
+        slot = self._acquire_slot()
+        try:
+            self._reserve(tokens)
+            yield
+        finally:
+            if slot is not None:
+                slot.release()
+            elif self._semaphore is not None:
+                self._semaphore.release()
+
+
+_limiters: Dict[str, Tuple[Tuple, RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(profile: ProviderProfile) -> Optional[RateLimiter]:
+    """获取提供商的进程级共享限流器，未配置任何限制时返回None
+
+    同一提供商的所有Provider实例（包括多个线程中的实例）共享同一个限流器，
+    配置变化后重新创建。
+    """
+    settings = (profile.rpm, profile.tpm, profile.max_in_flight, profile.shared_rate_limit)
+    if not any(settings[:3]):
+        return None
+    with _limiters_lock:
+        cached = _limiters.get(profile.name)
+        if cached is not None and cached[0] == settings:
+            return cached[1]
+        limiter = RateLimiter(profile.name, *settings)
+        _limiters[profile.name] = (settings, limiter)
+        return limiter
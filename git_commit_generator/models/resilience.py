@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from git_commit_generator.cache import default_cache_dir
+from .provider import Provider, ProviderError, ContextLengthError
+
+logger = logging.getLogger(__name__)
+
+# 指数退避：第n次重试前等待 base * 2^(n-1) 秒（加随机抖动），不超过上限
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# 连续失败该次数后断路，冷却期内跳过该提供商
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 60.0
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """计算第attempt次（从1开始）重试前的等待时间，服务端给出Retry-After时优先使用"""
+    if retry_after is not None and retry_after >= 0:
+        return min(retry_after, BACKOFF_MAX)
+    delay = min(BACKOFF_BASE * (2 ** (attempt - 1)), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class CircuitBreaker:
+    """按提供商记录连续失败次数的断路器，状态持久化在缓存目录中
+
+    连续失败达到阈值后断开，冷却期内allow返回False；冷却期过后允许一次试探请求（半开），
+    成功则复位，失败则重新计时。状态文件采用临时文件+原子替换写入，多个进程共享。
+    """
+
+    def __init__(self, state_file: Optional[str] = None,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = COOLDOWN_SECONDS):
+        self.state_file = state_file or os.path.join(default_cache_dir(), 'circuit.json')
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: Dict[str, Dict[str, float]]):
+        try:
+            directory = os.path.dirname(self.state_file)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_file)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.debug(f"写入断路器状态失败: {str(e)}")
+
+    def allow(self, provider: str) -> bool:
+        """提供商当前是否允许请求"""
+        entry = self._load().get(provider)
+        if not entry or entry.get('failures', 0) < self.failure_threshold:
+            return True
+        return time.time() - entry.get('opened_at', 0) >= self.cooldown
+
+    def record_success(self, provider: str):
+        with self._lock:
+            state = self._load()
+            if provider in state:
+                del state[provider]
+                self._save(state)
+
+    def record_failure(self, provider: str):
+        with self._lock:
+            state = self._load()
+            entry = state.setdefault(provider, {'failures': 0, 'opened_at': 0})
+            entry['failures'] = entry.get('failures', 0) + 1
+            if entry['failures'] >= self.failure_threshold:
+                entry['opened_at'] = time.time()
+            self._save(state)
+
+
+class FallbackChain:
+    """带重试与断路器的提供商链
+
+    按顺序尝试各提供商：每个提供商对可重试错误（429、5xx、连接错误/超时）按指数退避
+    重试max_retries次；失败后切换到下一个提供商。断路中的提供商会被跳过，
+    若所有提供商都处于断路状态则仍按顺序尝试，避免直接失败。
+    流式请求一旦已经产出文本就不再重试或切换，以免输出重复内容。
+    """
+
+    def __init__(self, providers: List[Provider], breaker: Optional[CircuitBreaker] = None,
+                 sleep=time.sleep):
+        if not providers:
+            raise ValueError("提供商链不能为空")
+        self.providers = providers
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        # 最近一次成功返回结果的提供商
+        self.current_provider = providers[0].current_provider
+
+    def _candidates(self) -> List[Provider]:
+        if len(self.providers) == 1:
+            return self.providers
+        allowed = [p for p in self.providers if self.breaker.allow(p.current_provider)]
+        return allowed or self.providers
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """流式生成，所有提供商都失败时抛出最后一个错误"""
+        last_error: Optional[Exception] = None
+        candidates = self._candidates()
+        for provider in candidates:
+            name = provider.current_provider
+            attempt = 0
+            while True:
+                yielded = False
+                try:
+                    for chunk in provider.generate_stream(prompt):
+                        if not yielded:
+                            yielded = True
+                            self.current_provider = name
+                        yield chunk
+                    self.breaker.record_success(name)
+                    self.current_provider = name
+                    return
+                except ProviderError as e:
+                    if yielded:
+                        raise
+                    last_error = e
+                    attempt += 1
+                    if not e.retryable or attempt > provider.max_retries:
+                        break
+                    delay = backoff_delay(attempt, e.retry_after)
+                    logger.debug(f"{name}请求失败（{e.status_code}），{delay:.1f}秒后第{attempt}次重试")
+                    self._sleep(delay)
+            # 提示词超长是本地拒绝的，不代表提供商不可用
+            if not isinstance(last_error, ContextLengthError):
+                self.breaker.record_failure(name)
+            if provider is not candidates[-1]:
+                logger.warning(f"提供商{name}不可用，尝试下一个提供商: {str(last_error)}")
+        raise last_error
+
+    def generate(self, prompt: str) -> str:
+        """非流式生成，重试与切换规则与流式一致"""
+        last_error: Optional[Exception] = None
+        candidates = self._candidates()
+        for provider in candidates:
+            name = provider.current_provider
+            for attempt in range(provider.max_retries + 1):
+                try:
+                    result = provider.generate(prompt)
+                    self.breaker.record_success(name)
+                    self.current_provider = name
+                    return result
+                except ProviderError as e:
+                    last_error = e
+                    if not e.retryable or attempt >= provider.max_retries:
+                        break
+                    delay = backoff_delay(attempt + 1, e.retry_after)
+                    logger.debug(f"{name}请求失败（{e.status_code}），{delay:.1f}秒后第{attempt + 1}次重试")
+                    self._sleep(delay)
+            # 提示词超长是本地拒绝的，不代表提供商不可用
+            if not isinstance(last_error, ContextLengthError):
+                self.breaker.record_failure(name)
+            if provider is not candidates[-1]:
+                logger.warning(f"提供商{name}不可用，尝试下一个提供商: {str(last_error)}")
+        raise last_error
@@ -0,0 +1,83 @@
+import threading
+from typing import Dict, Tuple, TYPE_CHECKING
+from urllib.parse import urlparse
+
+from git_commit_generator.config_store import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_POOL_MAXSIZE
+from git_commit_generator import tracing
+
+if TYPE_CHECKING:
+    import requests
+
+
+class Transport:
+    """进程级HTTP传输层，按提供商主机复用长连接的Session
+
+    requests.api.post每次调用都会新建并销毁Session，导致每次生成都要重新完成
+    TCP/TLS握手。这里为每个 scheme://host 维护一个带连接池的Session，
+    使重新生成(r)和批量调用能够复用已建立的连接。
+    """
+
+    _sessions: Dict[Tuple[str, str], 'requests.Session'] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> Tuple[str, str]:
+        """获取URL对应的连接池键"""
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc
+
+    @classmethod
+    def get_session(cls, url: str, pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> 'requests.Session':
+        """获取URL所属主机的共享Session，不存在时创建
+
+        Args:
+            url: 请求地址
+            pool_maxsize: 该主机连接池的最大连接数，仅在首次创建时生效
+
+        Returns:
+            requests.Session: 绑定了连接池的Session
+        """
+        key = cls._host_key(url)
+        session = cls._sessions.get(key)
+        if session is not None:
+            return session
+        # requests导入较慢，仅在首次发起网络请求时加载
+        import requests
+        from requests.adapters import HTTPAdapter
+        with cls._lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(pool_maxsize))
+                session.mount(f"{key[0]}://{key[1]}", adapter)
+                cls._sessions[key] = session
+        return session
+
+    @classmethod
+    def post(cls, url: str,
+             connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+             read_timeout: float = DEFAULT_READ_TIMEOUT,
+             pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+             **kwargs) -> 'requests.Response':
+        """通过共享Session发送POST请求
+
+        Args:
+            url: 请求地址
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取响应超时（秒），流式请求时为两个数据块之间的最大间隔
+            pool_maxsize: 连接池大小
+            **kwargs: 透传给requests的其他参数（headers/json/stream等）
+        """
+        session = cls.get_session(url, pool_maxsize)
+        # 流式请求在收到响应头时返回，此时的耗时即首字节时间(TTFB)
+        name = 'http.ttfb' if kwargs.get('stream') else 'http.request'
+        with tracing.span(name, 'network', host=cls._host_key(url)[1]):
+            return session.post(url, timeout=(float(connect_timeout), float(read_timeout)), **kwargs)
+
+    @classmethod
+    def close_all(cls):
+        """关闭所有Session并释放连接"""
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
@@ -0,0 +1,107 @@
+import posixpath
+from typing import Dict, List, Optional
+
+
+class RepoSnapshot:
+    """仓库状态快照
+
+    由一次 `git status --porcelain=v2 -z --branch` 的输出解析得到，
+    可在内存中回答暂存/未暂存/未跟踪/冲突文件以及分支、上游和领先落后数等查询，
+    避免为每个查询单独启动git子进程。
+    """
+
+    def __init__(self):
+        self.branch_oid: str = ''
+        self.branch: str = ''
+        self.upstream: Optional[str] = None
+        self.ahead: int = 0
+        self.behind: int = 0
+        self.staged: List[str] = []
+        self.unstaged: List[str] = []
+        self.untracked: List[str] = []
+        self.unmerged: List[str] = []
+        self.ignored: List[str] = []
+        # 重命名/复制的文件：新路径 -> 原路径
+        self.renamed: Dict[str, str] = {}
+
+    @classmethod
+    def parse(cls, output: str, prefix: str = '') -> 'RepoSnapshot':
+        """解析porcelain v2（-z）格式的git status输出
+
+        porcelain格式中的路径总是相对仓库根目录，这里按prefix转换为相对当前目录的路径，
+        与 git ls-files 等命令的输出保持一致，可直接用于打开文件或 git add。
+
+        Args:
+            output: git status --porcelain=v2 -z --branch 的标准输出
+            prefix: 当前目录相对仓库根目录的前缀（git rev-parse --show-prefix），位于根目录时为空
+
+        Returns:
+            RepoSnapshot: 解析后的快照
+        """
+        snapshot = cls()
+        relative = cls._relative_path if prefix else (lambda path, _: path)
+        records = output.split('\0')
+        i = 0
+        while i < len(records):
+            record = records[i]
+            i += 1
+            if not record:
+                continue
+            kind = record[0]
+            if kind == '#':
+                snapshot._parse_header(record)
+            elif kind in ('1', '2'):
+                # 1 XY sub mH mI mW hH hI path
+                # 2 XY sub mH mI mW hH hI Xscore path\0origPath
+                fields = record.split(' ', 9 if kind == '2' else 8)
+                xy, path = fields[1], relative(fields[-1], prefix)
+                if kind == '2' and i < len(records):
+                    snapshot.renamed[path] = relative(records[i], prefix)
+                    i += 1
+                if xy[0] != '.':
+                    snapshot.staged.append(path)
+                if xy[1] != '.':
+                    snapshot.unstaged.append(path)
+            elif kind == 'u':
+                # u XY sub m1 m2 m3 mW h1 h2 h3 path
+                snapshot.unmerged.append(relative(record.split(' ', 10)[-1], prefix))
+            elif kind == '?':
+                snapshot.untracked.append(relative(record[2:], prefix))
+            elif kind == '!':
+                snapshot.ignored.append(relative(record[2:], prefix))
+        return snapshot
+
+    @staticmethod
+    def _relative_path(path: str, prefix: str) -> str:
+        """把相对仓库根目录的路径转换为相对prefix目录的路径，保留目录条目末尾的/"""
+        relative = posixpath.relpath(path, prefix.rstrip('/'))
+        return relative + '/' if path.endswith('/') else relative
+
+    def _parse_header(self, record: str):
+        parts = record.split(' ')
+        if len(parts) < 3:
+            return
+        key, value = parts[1], ' '.join(parts[2:])
+        if key == 'branch.oid':
+            self.branch_oid = '' if value == '(initial)' else value
+        elif key == 'branch.head':
+            # 与 git branch --show-current 保持一致：分离头指针时返回空字符串
+            self.branch = '' if value == '(detached)' else value
+        elif key == 'branch.upstream':
+            self.upstream = value
+        elif key == 'branch.ab' and len(parts) >= 4:
+            self.ahead = abs(int(parts[2]))
+            self.behind = abs(int(parts[3]))
+
+    @property
+    def has_upstream(self) -> bool:
+        return self.upstream is not None
+
+    @property
+    def has_conflicts(self) -> bool:
+        return bool(self.unmerged)
+
+    @property
+    def unstaged_files(self) -> List[str]:
+        """未暂存的文件：未跟踪文件与工作区已修改文件的并集（保持顺序并去重）"""
+        return list(dict.fromkeys(self.untracked + self.unstaged))
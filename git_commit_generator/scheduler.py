@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 同时执行的阶段数上限，阶段多为git子进程或网络请求，线程足够
+DEFAULT_MAX_WORKERS = 4
+
+
+class StageGraph:
+    """按依赖关系并发执行的阶段图
+
+    每个阶段在其依赖全部完成后才提交到线程池，因此等待依赖的阶段不会占用工作线程；
+    依赖失败时下游阶段直接以同一异常结束，不会执行。调用方通过result按需取结果，
+    只在真正需要某个阶段的结果时才阻塞，整体耗时收敛到关键路径。
+    工作线程为守护线程，进程退出时不等待仍在执行的阶段（如无需再用结果的网络探测）。
+
+    示例：
+        graph = StageGraph()
+        graph.add('snapshot', git_op.get_snapshot)
+        graph.add('conflicts', git_op.check_conflicts, after=['snapshot'])
+        graph.start()
+        has_conflicts, *_ = graph.result('conflicts')
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._stages: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._timings: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._queue: Optional['queue.SimpleQueue[Optional[Callable[[], None]]]'] = None
+        self._workers: List[threading.Thread] = []
+
+    def add(self, name: str, func: Callable, after: Iterable[str] = ()) -> 'StageGraph':
+        """添加阶段
+
+        Args:
+            name: 阶段名称
+            func: 阶段函数，按after中的顺序接收各依赖阶段的结果作为位置参数
+            after: 依赖的阶段名称，必须已经添加
+
+        Raises:
+            ValueError: 阶段重名、依赖不存在或图已启动
+        """
+        after = tuple(after)
+        if self._queue is not None:
+            raise ValueError("阶段图已启动，不能再添加阶段")
+        if name in self._stages:
+            raise ValueError(f"阶段{name}已存在")
+        missing = [dep for dep in after if dep not in self._stages]
+        if missing:
+            raise ValueError(f"阶段{name}依赖的阶段不存在: {', '.join(missing)}")
+        self._stages[name] = (func, after)
+        self._futures[name] = Future()
+        return self
+
+    def start(self) -> 'StageGraph':
+        """启动所有阶段，立即返回"""
+        if self._queue is not None:
+            return self
+        self._queue = queue.SimpleQueue()
+        for index in range(max(1, min(self.max_workers, len(self._stages)))):
+            worker = threading.Thread(target=self._work, name=f'git-ai-stage-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        for name, (_, after) in self._stages.items():
+            if not after:
+                self._submit(name)
+            else:
+                self._wait_for(name, after)
+        return self
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            task()
+
+    def _wait_for(self, name: str, after: Tuple[str, ...]):
+        """所有依赖完成时（以最后一个完成的依赖的回调）提交阶段"""
+        remaining = [len(after)]
+
+        def on_done(_):
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self._submit(name)
+
+        for dep in after:
+            self._futures[dep].add_done_callback(on_done)
+
+    def _submit(self, name: str):
+        func, after = self._stages[name]
+        future = self._futures[name]
+        for dep in after:
+            dep_future = self._futures[dep]
+            if dep_future.cancelled():
+                future.cancel()
+                return
+            error = dep_future.exception()
+            if error is not None:
+                future.set_exception(error)
+                return
+        args = [self._futures[dep].result() for dep in after]
+
+        def run():
+            # 排队期间可能已被cancel/shutdown取消，此时不再执行；标记为运行中后cancel不再生效
+            if not future.set_running_or_notify_cancel():
+                return
+            started = time.perf_counter()
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._timings[name] = (started, time.perf_counter())
+
+        self._queue.put(run)
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        """阻塞直到阶段完成并返回结果，阶段失败时抛出其异常"""
+        return self._futures[name].result(timeout)
+
+    def done(self, name: str) -> bool:
+        return self._futures[name].done()
+
+    def cancel(self, names: Optional[List[str]] = None):
+        """取消尚未开始执行的阶段（已在执行的阶段会继续完成）"""
+        for name in names or list(self._futures):
+            self._futures[name].cancel()
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """已完成阶段的耗时（秒）"""
+        return {name: end - start for name, (start, end) in self._timings.items()}
+
+    def shutdown(self, wait: bool = False):
+        """取消未开始的阶段并让工作线程在当前阶段结束后退出
+
+        Args:
+            wait: 是否等待正在执行的阶段完成；为False时立即返回，进程退出也不会等待这些阶段
+        """
+        self.cancel()
+        if self._queue is None:
+            return
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,144 @@
+import logging
+import threading
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeGenerator:
+    """在后台提前生成提交信息
+
+    暂存区内容一确定就在后台线程中开始生成，用户还在查看面板、选择文件时请求已经在进行。
+    任务以暂存区树对象ID为标识，暂存区变化后再次start会取消旧任务并重新开始；
+    取消通过流式生成的块间检查实现，中断后底层连接随生成器关闭而释放。
+    已收到的块会被缓冲，前台通过follow先回放这些块，再跟随仍在进行的生成继续输出。
+    """
+
+    def __init__(self, generator):
+        """
+        :param generator: CommitGenerator实例
+        """
+        self.generator = generator
+        self._lock = threading.Lock()
+        # 新块到达、任务结束或被替换时通知follow
+        self._changed = threading.Condition(self._lock)
+        self._tree: Optional[str] = None
+        self._cancel: Optional[threading.Event] = None
+        self._done: Optional[threading.Event] = None
+        self._diff: Optional[str] = None
+        self._message: Optional[str] = None
+        self._chunks: List[str] = []
+
+    def start(self) -> bool:
+        """基于当前暂存区开始生成
+
+        暂存区与进行中（或已完成）的任务一致时不做任何事，否则取消旧任务并重新开始。
+
+        Returns:
+            bool: 是否启动了新任务
+        """
+        try:
+            tree = self.generator.git.get_index_tree()
+        except RuntimeError as e:
+            # 存在未合并文件等情况下无法写出树对象，此时不做预生成
+            logger.debug(f"无法获取暂存区树对象，跳过预生成: {str(e)}")
+            self.cancel()
+            return False
+        with self._lock:
+            if tree == self._tree:
+                return False
+            self._cancel_locked()
+            cancel, done = threading.Event(), threading.Event()
+            self._tree, self._cancel, self._done = tree, cancel, done
+            self._diff = self._message = None
+            self._chunks = []
+            self._changed.notify_all()
+        threading.Thread(target=self._run, args=(tree, cancel, done), daemon=True).start()
+        return True
+
+    def _run(self, tree: str, cancel: threading.Event, done: threading.Event):
+        try:
+            diff_content = self.generator.get_staged_diff()
+            if not diff_content or cancel.is_set():
+                return
+            with self._changed:
+                if not cancel.is_set():
+                    self._diff = diff_content
+                    self._changed.notify_all()
+            chunks = []
+            for chunk in self.generator.generate_commit_message_stream(diff_content):
+                if cancel.is_set():
+                    return
+                chunks.append(chunk)
+                with self._changed:
+                    if not cancel.is_set():
+                        self._chunks.append(chunk)
+                        self._changed.notify_all()
+            message = ''.join(chunks).strip()
+            with self._changed:
+                if not cancel.is_set():
+                    self._message = message
+            # 使用本次生成的结果，self._message可能已被更新的任务覆盖
+            self.generator.remember_tree(tree, message)
+        except Exception as e:
+            # 预生成失败不影响主流程，前台会重新生成并正常报告错误
+            logger.debug(f"预生成提交信息失败: {str(e)}")
+        finally:
+            with self._changed:
+                done.set()
+                self._changed.notify_all()
+
+    def _cancel_locked(self):
+        if self._cancel is not None:
+            self._cancel.set()
+
+    def cancel(self):
+        """取消进行中的任务"""
+        with self._lock:
+            self._cancel_locked()
+            self._tree = None
+
+    def follow(self, diff_content: str, timeout: Optional[float] = None) -> Optional[Iterator[str]]:
+        """跟随与给定diff对应的预生成任务
+
+        返回的迭代器先产出已缓冲的块，再随生成进行产出后续的块。任务基于的diff与给定diff不一致
+        （暂存区已变化）或任务没有可用的diff时返回None，由调用方重新生成。
+
+        Args:
+            diff_content: 当前暂存区diff
+            timeout: 等待任务获取diff以及等待每个新块的最长时间（秒），None表示一直等待
+
+        Returns:
+            Optional[Iterator[str]]: 提交信息的文本块；迭代过程中任务失败、被取消时抛出RuntimeError，
+            超过timeout仍没有新块时抛出TimeoutError，调用方可据此改为在前台生成
+        """
+        with self._changed:
+            done = self._done
+            if done is None:
+                return None
+            ready = self._changed.wait_for(
+                lambda: self._done is not done or self._diff is not None or done.is_set(), timeout)
+            if not ready or self._done is not done or self._diff != diff_content:
+                return None
+        return self._follow(done, timeout)
+
+    def _follow(self, done: threading.Event, timeout: Optional[float]) -> Iterator[str]:
+        index = 0
+        while True:
+            with self._changed:
+                ready = self._changed.wait_for(
+                    lambda: self._done is not done or len(self._chunks) > index or done.is_set(), timeout)
+                if self._done is not done:
+                    raise RuntimeError("暂存区已变化，预生成任务已被替换")
+                if not ready:
+                    raise TimeoutError(f"预生成超过{timeout:g}秒没有新的输出")
+                # 块在done之前写入，任务结束时这里已取到全部剩余的块
+                chunks = self._chunks[index:]
+                finished = done.is_set()
+                message = self._message
+            index += len(chunks)
+            yield from chunks
+            if finished:
+                if message is None:
+                    raise RuntimeError("预生成失败或已被取消")
+                return
@@ -0,0 +1,161 @@
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from git_commit_generator.cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# 中日韩文字与全角符号，各家分词器对这部分的切分粒度差异最大
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+# 每条消息在提示词之外的固定开销（角色标记、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 8
+# 实际token数少于该值时不参与校准，短文本的比例波动太大
+MIN_CALIBRATION_TOKENS = 50
+# 校准系数的指数滑动平均权重与取值范围
+CALIBRATION_WEIGHT = 0.3
+MIN_SCALE = 0.5
+MAX_SCALE = 2.5
+
+
+class TokenRatio(NamedTuple):
+    """分词器的经验比例
+
+    ascii_chars_per_token: 英文/代码平均每个token的字符数
+    cjk_tokens_per_char: 每个中日韩字符对应的token数
+    other_tokens_per_char: 其余非ASCII字符（表情、其他语言）对应的token数
+    """
+    ascii_chars_per_token: float
+    cjk_tokens_per_char: float
+    other_tokens_per_char: float = 1.0
+
+
+# 按提供商类型区分的经验比例；未知提供商使用偏保守（高估）的默认值
+PROVIDER_RATIOS: Dict[str, TokenRatio] = {
+    'OpenaiProvider': TokenRatio(4.0, 1.0),
+    'AzureProvider': TokenRatio(4.0, 1.0),
+    'AnthropicProvider': TokenRatio(3.5, 1.3),
+    'GoogleProvider': TokenRatio(4.0, 0.8),
+    'DeepseekProvider': TokenRatio(3.8, 0.6),
+    'ChatGLMProvider': TokenRatio(3.8, 0.7),
+    'MoonshotProvider': TokenRatio(3.8, 0.7),
+    'BaiduProvider': TokenRatio(3.5, 0.7),
+    'HuggingFaceProvider': TokenRatio(3.3, 1.3),
+}
+DEFAULT_RATIO = TokenRatio(3.3, 1.3)
+
+
+class TokenEstimator:
+    """无依赖的token数估算器
+
+    按ASCII、中日韩字符和其他字符分别套用提供商的经验比例，结果再乘以校准系数。
+    校准系数由API返回的实际提示词token数与估算值之比做滑动平均得到，
+    按提供商+模型持久化在缓存目录的tokens.json中，随使用次数增加逐渐贴近真实分词器。
+    """
+
+    def __init__(self, key: str, ratio: TokenRatio = DEFAULT_RATIO, state_file: Optional[str] = None):
+        self.key = key
+        self.ratio = ratio
+        self.state_file = state_file or os.path.join(default_cache_dir(), 'tokens.json')
+        self._lock = threading.Lock()
+        self._scale: Optional[float] = None
+
+    def _load_state(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Dict[str, float]]):
+        try:
+            directory = os.path.dirname(self.state_file)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_file)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.debug(f"写入token校准数据失败: {str(e)}")
+
+    @property
+    def scale(self) -> float:
+        """当前校准系数，首次访问时从状态文件读取"""
+        if self._scale is None:
+            entry = self._load_state().get(self.key) or {}
+            try:
+                self._scale = min(MAX_SCALE, max(MIN_SCALE, float(entry.get('scale', 1.0))))
+            except (TypeError, ValueError):
+                self._scale = 1.0
+        return self._scale
+
+    def raw_count(self, text: str) -> float:
+        """未校准的估算值"""
+        if not text:
+            return 0.0
+        ascii_chars = len(text.encode('ascii', 'ignore'))
+        cjk_chars = len(_CJK_PATTERN.findall(text)) if ascii_chars < len(text) else 0
+        other_chars = len(text) - ascii_chars - cjk_chars
+        return (ascii_chars / self.ratio.ascii_chars_per_token
+                + cjk_chars * self.ratio.cjk_tokens_per_char
+                + other_chars * self.ratio.other_tokens_per_char)
+
+    def count(self, text: str) -> int:
+        """估算文本作为一条消息发送时的token数"""
+        return int(math.ceil(self.raw_count(text) * self.scale)) + MESSAGE_OVERHEAD_TOKENS
+
+    def chars_per_token(self, text: str = '') -> float:
+        """文本的平均字符/token比例，用于把token预算换算为字符预算；文本为空时按纯ASCII计"""
+        raw = self.raw_count(text)
+        if not raw:
+            return self.ratio.ascii_chars_per_token / self.scale
+        return len(text) / (raw * self.scale)
+
+    def observe(self, raw_estimate: float, actual_tokens: int):
+        """用API返回的实际提示词token数校准
+
+        Args:
+            raw_estimate: 发送前对提示词的raw_count结果
+            actual_tokens: 响应usage中的提示词token数
+        """
+        if actual_tokens < MIN_CALIBRATION_TOKENS or raw_estimate <= 0:
+            return
+        ratio = (actual_tokens - MESSAGE_OVERHEAD_TOKENS) / raw_estimate
+        ratio = min(MAX_SCALE, max(MIN_SCALE, ratio))
+        with self._lock:
+            state = self._load_state()
+            entry = state.get(self.key) or {}
+            samples = int(entry.get('samples', 0))
+            scale = ratio if not samples else (1 - CALIBRATION_WEIGHT) * float(entry.get('scale', 1.0)) + CALIBRATION_WEIGHT * ratio
+            state[self.key] = {'scale': round(scale, 4), 'samples': samples + 1}
+            self._scale = scale
+            self._save_state(state)
+
+
+_estimators: Dict[Tuple[str, str, str], TokenEstimator] = {}
+_estimators_lock = threading.Lock()
+
+
+def get_estimator(provider_type: str, provider_name: str, model_name: str) -> TokenEstimator:
+    """获取提供商+模型对应的进程级共享估算器"""
+    registry_key = (provider_type, provider_name, model_name)
+    with _estimators_lock:
+        estimator = _estimators.get(registry_key)
+        if estimator is None:
+            ratio = PROVIDER_RATIOS.get(provider_type, DEFAULT_RATIO)
+            estimator = TokenEstimator(f"{provider_name}/{model_name}", ratio)
+            _estimators[registry_key] = estimator
+        return estimator
@@ -0,0 +1,210 @@
+"""阶段耗时追踪
+
+通过 `--profile` 参数或 GIT_AI_PROFILE 环境变量启用（环境变量值以.json结尾时作为trace文件路径）。
+启用后记录git命令、提示词构建、网络请求（DNS/连接/首字节/总耗时）、响应解析和界面渲染等阶段的耗时，
+结束时输出汇总表，并写出可在 chrome://tracing 或 Perfetto 中打开的Chrome Trace格式JSON。
+
+未启用时span返回共享的空上下文，开销仅为一次全局变量判断。
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_enabled = False
+_events: List[Dict[str, Any]] = []
+_origin = time.perf_counter()
+_hooks_installed = False
+_trace_path: Optional[str] = None
+
+
+class _NullSpan:
+    """未启用追踪时使用的空上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _record(self.name, self.category, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """补充记录在span上的参数"""
+        self.args.update(args)
+
+
+def _record(name: str, category: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+    # list.append是原子操作，多线程记录无需加锁
+    _events.append({
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': (start - _origin) * 1e6,
+        'dur': (end - start) * 1e6,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': args or {},
+    })
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, category: str = 'app', **args):
+    """记录一个阶段的耗时
+
+    示例：
+        with tracing.span('prompt.build', files=12):
+            ...
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def mark(name: str, category: str = 'app', **args):
+    """记录一个瞬时事件（如首个token到达）"""
+    if not _enabled:
+        return
+    now = time.perf_counter()
+    _events.append({
+        'name': name, 'cat': category, 'ph': 'i', 's': 't',
+        'ts': (now - _origin) * 1e6, 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args,
+    })
+
+
+def record_since(name: str, start: float, category: str = 'app', **args):
+    """记录从start（time.perf_counter()）到现在的阶段，用于无法用with包裹的场景"""
+    if _enabled:
+        _record(name, category, start, time.perf_counter(), args)
+
+
+def _install_http_hooks():
+    """启用追踪时才给DNS解析与建立连接加计时，未启用时不修改任何库"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+
+    import socket
+    original_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, *args, **kwargs):
+        with span('http.dns', 'network', host=str(host)):
+            return original_getaddrinfo(host, *args, **kwargs)
+
+    socket.getaddrinfo = getaddrinfo
+
+    try:
+        from urllib3.connection import HTTPConnection
+    except ImportError:
+        return
+    original_connect = HTTPConnection.connect
+
+    def connect(self, *args, **kwargs):
+        # 包含DNS解析、TCP连接，HTTPS时还包含TLS握手
+        with span('http.connect', 'network', host=str(getattr(self, 'host', ''))):
+            return original_connect(self, *args, **kwargs)
+
+    HTTPConnection.connect = connect
+
+
+def enable(trace_path: Optional[str] = None):
+    """启用追踪
+
+    Args:
+        trace_path: trace文件路径，为空时写入系统临时目录
+    """
+    global _enabled, _trace_path
+    _enabled = True
+    if trace_path:
+        _trace_path = trace_path
+    _install_http_hooks()
+
+
+def events() -> List[Dict[str, Any]]:
+    return list(_events)
+
+
+def summarize() -> List[Dict[str, Any]]:
+    """按阶段名称汇总：次数、总耗时、平均与最大耗时（毫秒），按总耗时降序"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for event in _events:
+        if event['ph'] != 'X':
+            continue
+        entry = stats.setdefault(event['name'], {'name': event['name'], 'category': event['cat'],
+                                                 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        duration = event['dur'] / 1000
+        entry['count'] += 1
+        entry['total_ms'] += duration
+        entry['max_ms'] = max(entry['max_ms'], duration)
+    for entry in stats.values():
+        entry['mean_ms'] = entry['total_ms'] / entry['count']
+    return sorted(stats.values(), key=lambda entry: entry['total_ms'], reverse=True)
+
+
+def write_chrome_trace(path: Optional[str] = None) -> str:
+    """写出Chrome Trace格式的JSON文件，返回文件路径"""
+    path = path or _trace_path or os.path.join(tempfile.gettempdir(), f"git-ai-trace-{os.getpid()}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': _events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    return path
+
+
+def report(console=None):
+    """输出汇总表并写出trace文件"""
+    if not _enabled or not _events:
+        return
+    from rich.table import Table
+    if console is None:
+        from rich.console import Console
+        console = Console(stderr=True)
+    table = Table(title="git-ai 阶段耗时", title_justify="left")
+    table.add_column("阶段")
+    table.add_column("类别")
+    table.add_column("次数", justify="right")
+    table.add_column("总耗时(ms)", justify="right")
+    table.add_column("平均(ms)", justify="right")
+    table.add_column("最大(ms)", justify="right")
+    for entry in summarize():
+        table.add_row(entry['name'], entry['category'], str(entry['count']), f"{entry['total_ms']:.1f}",
+                      f"{entry['mean_ms']:.1f}", f"{entry['max_ms']:.1f}")
+    console.print(table)
+    try:
+        console.print(f"trace文件: {write_chrome_trace()}（可在chrome://tracing或ui.perfetto.dev中打开）")
+    except OSError as e:
+        console.print(f"写入trace文件失败: {str(e)}")
+
+
+_env_value = os.environ.get('GIT_AI_PROFILE', '')
+if _env_value and _env_value.lower() not in ('0', 'false', 'no', 'off'):
+    enable(_env_value if _env_value.endswith('.json') else None)
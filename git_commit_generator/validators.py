@@ -1,6 +1,5 @@
 from urllib.parse import urlparse
 from typing import Any
-import requests
 
 class FieldValidator:
     @classmethod
@@ -22,6 +21,7 @@ class UrlValidator(FieldValidator):
             raise ValueError("无效的URL格式，必须包含协议和域名")
         
         # 可选连通性检查（根据性能需求决定是否启用）
+        # import requests
         # try:
         #     resp = requests.head(value, timeout=3)
         #     if resp.status_code >= 400:
@@ -49,6 +49,125 @@ class MaxTokensValidator(FieldValidator):
             raise ValueError("max_tokens需在100-4096范围内")
         return value
 
+class TimeoutValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> float:
+        try:
+            timeout = float(value)
+        except (TypeError, ValueError):
+            raise TypeError("超时时间必须为数字（单位：秒）")
+        if timeout <= 0 or timeout > 600:
+            raise ValueError("超时时间需在0-600秒范围内")
+        return timeout
+
+class PoolSizeValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> int:
+        try:
+            size = int(value)
+        except (TypeError, ValueError):
+            raise TypeError("连接池大小必须为整数")
+        if size < 1 or size > 100:
+            raise ValueError("连接池大小需在1-100范围内")
+        return size
+
+class ContextWindowValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> int:
+        try:
+            size = int(value)
+        except (TypeError, ValueError):
+            raise TypeError("context_window必须为整数")
+        if size < 1024:
+            raise ValueError("context_window不能小于1024")
+        return size
+
+class HedgeProviderValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value: str) -> str:
+        # none表示关闭对冲请求
+        if value == 'none':
+            return value
+        return ProviderValidator.validate(value)
+
+class HedgeDelayValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> float:
+        try:
+            delay = float(value)
+        except (TypeError, ValueError):
+            raise TypeError("hedge_delay必须为数字（单位：秒）")
+        if delay < 0 or delay > 60:
+            raise ValueError("hedge_delay需在0-60秒范围内")
+        return delay
+
+class MaxRetriesValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> int:
+        try:
+            retries = int(value)
+        except (TypeError, ValueError):
+            raise TypeError("max_retries必须为整数")
+        if retries < 0 or retries > 10:
+            raise ValueError("max_retries需在0-10范围内")
+        return retries
+
+class FallbackProvidersValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> str:
+        # 逗号分隔的提供商名称，none表示不使用备用提供商
+        if value == 'none':
+            return value
+        names = [name.strip() for name in str(value).split(',')]
+        for name in names:
+            ProviderValidator.validate(name)
+        return ','.join(names)
+
+class RateLimitValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> int:
+        try:
+            limit = int(value)
+        except (TypeError, ValueError):
+            raise TypeError("限流配置必须为整数")
+        if limit < 0:
+            raise ValueError("限流配置不能为负数（0表示不限制）")
+        return limit
+
+class ByteSizeValidator(FieldValidator):
+    # 支持K/M后缀，如512K、4M
+    _UNITS = {'k': 1024, 'm': 1024 * 1024}
+
+    @classmethod
+    def validate(cls, value) -> int:
+        text = str(value).strip().lower().rstrip('b')
+        unit = cls._UNITS.get(text[-1:], 1)
+        try:
+            size = int(float(text[:-1] if unit > 1 else text) * unit)
+        except (TypeError, ValueError):
+            raise TypeError("字节数必须为整数，可带K/M后缀（如512K、4M）")
+        if size < 1024:
+            raise ValueError("字节数不能小于1024（1K）")
+        return size
+
+class ContextLinesValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> int:
+        try:
+            lines = int(value)
+        except (TypeError, ValueError):
+            raise TypeError("diff_context_lines必须为整数")
+        if lines < 0 or lines > 20:
+            raise ValueError("diff_context_lines需在0-20范围内")
+        return lines
+
+class BoolValidator(FieldValidator):
+    @classmethod
+    def validate(cls, value) -> str:
+        if str(value).strip().lower() not in ('true', 'false', '1', '0', 'yes', 'no', 'on', 'off'):
+            raise ValueError("取值必须为true或false")
+        return value
+
 class ModelNameValidator(FieldValidator):
     @classmethod
     def validate(cls, value: str) -> str:
@@ -60,7 +179,22 @@ class FieldValidatorFactory:
         'model_url': UrlValidator,
         'api_key': ApiKeyValidator,
         'max_tokens': MaxTokensValidator,
-        'model_name': ModelNameValidator
+        'model_name': ModelNameValidator,
+        'connect_timeout': TimeoutValidator,
+        'read_timeout': TimeoutValidator,
+        'pool_maxsize': PoolSizeValidator,
+        'context_window': ContextWindowValidator,
+        'hedge_provider': HedgeProviderValidator,
+        'hedge_delay': HedgeDelayValidator,
+        'max_retries': MaxRetriesValidator,
+        'fallback_providers': FallbackProvidersValidator,
+        'rpm': RateLimitValidator,
+        'tpm': RateLimitValidator,
+        'max_in_flight': RateLimitValidator,
+        'shared_rate_limit': BoolValidator,
+        'max_diff_bytes': ByteSizeValidator,
+        'max_file_diff_bytes': ByteSizeValidator,
+        'diff_context_lines': ContextLinesValidator
     }
 
     @classmethod
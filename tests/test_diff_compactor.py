@@ -0,0 +1,53 @@
+import random
+
+from git_commit_generator.diff_compactor import PROMPT_OVERHEAD_TOKENS, DiffCompactor
+
+NAMES = ['src/app.py', 'src/util/helpers.py', 'lib/core.js', 'package-lock.json', 'dist/bundle.js',
+         'vendor/lib/x.go', 'assets/logo.png', 'docs/说明.md', 'a/very/long/path/to/some/deeply/nested/module.py']
+
+
+def compactor(budget_chars: int) -> DiffCompactor:
+    return DiffCompactor(budget_chars + PROMPT_OVERHEAD_TOKENS, 0, chars_per_token=1)
+
+
+def random_file(rng: random.Random, index: int) -> str:
+    name = rng.choice(NAMES).replace('.', f'{index}.', 1)
+    lines = [f"diff --git a/{name} b/{name}", "index 1111111..2222222 100644"]
+    if name.endswith('.png'):
+        lines.append(f"Binary files a/{name} and b/{name} differ")
+        return '\n'.join(lines)
+    lines += [f"--- a/{name}", f"+++ b/{name}"]
+    for hunk in range(rng.randint(1, 6)):
+        lines.append(f"@@ -{hunk * 10 + 1},3 +{hunk * 10 + 1},4 @@ def func_{hunk}():")
+        for _ in range(rng.randint(1, 15)):
+            prefix = rng.choice('+- ')
+            lines.append(prefix + 'x' * rng.randint(0, 120))
+    return '\n'.join(lines)
+
+
+def random_diff(rng: random.Random) -> str:
+    return '\n'.join(random_file(rng, i) for i in range(rng.randint(1, 40)))
+
+
+def test_compact_never_exceeds_budget():
+    rng = random.Random(20240601)
+    for _ in range(300):
+        diff = random_diff(rng)
+        budget = rng.choice([0, 50, 120, 300, 800, 2000, 5000, 20000])
+        result = compactor(budget).compact(diff)
+        assert len(result) <= budget, (budget, len(result))
+
+
+def test_compact_keeps_small_diff_unchanged():
+    diff = random_file(random.Random(1), 0)
+    assert compactor(len(diff)).compact(diff) == diff
+
+
+def test_compact_lists_omitted_files():
+    rng = random.Random(7)
+    diff = '\n'.join(random_file(rng, i) for i in range(20)) + '\n' + \
+        "diff --git a/package-lock.json b/package-lock.json\n@@ -1 +1 @@\n-a\n+b"
+    result = compactor(3000).compact(diff)
+    assert len(result) <= 3000
+    assert "以下文件内容已省略：" in result
+    assert "package-lock.json" in result
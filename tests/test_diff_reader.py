@@ -0,0 +1,132 @@
+import os
+import subprocess
+
+import pytest
+
+from git_commit_generator.diff_reader import DiffReader, parse_numstat
+from git_commit_generator.git_operations import GitOperations
+
+SOURCE = ''.join(f"line {i}\n" for i in range(50))
+
+
+def git(repo, *args):
+    return subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True).stdout
+
+
+def write(repo, path, content):
+    full = os.path.join(repo, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, 'wb') as f:
+        f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = str(tmp_path / 'repo')
+    os.makedirs(path)
+    git(path, 'init', '-q')
+    git(path, 'config', 'user.email', 'test@example.com')
+    git(path, 'config', 'user.name', 'test')
+    git(path, 'config', 'commit.gpgsign', 'false')
+    write(path, 'old name.py', SOURCE)
+    write(path, 'mode.sh', SOURCE)
+    write(path, 'removed.py', SOURCE)
+    git(path, 'add', '-A')
+    git(path, 'commit', '-q', '-m', 'init')
+
+    os.makedirs(os.path.join(path, 'src'))
+    git(path, 'mv', 'old name.py', 'src/new name.py')
+    os.chmod(os.path.join(path, 'mode.sh'), 0o755)
+    git(path, 'rm', '-q', 'removed.py')
+    write(path, '*glob[1].py', "print('glob')\n")
+    write(path, 'dist/xglob1.py', "print('dist')\n")
+    write(path, 'sp ace.py', "print('space')\n")
+    write(path, 'quo"te.py', "print('quote')\n")
+    write(path, '中文/模块.py', "print('中文')\n")
+    write(path, 'image.bin', b'\x00\x01\x02' * 100)
+    git(path, 'add', '-A')
+    return path
+
+
+def staged_stats(repo):
+    output = git(repo, 'diff', '--cached', '--numstat', '--summary', '-z').decode('utf-8')
+    return {stat.path: stat for stat in parse_numstat(output)}
+
+
+def test_parse_numstat(repo):
+    stats = staged_stats(repo)
+    assert set(stats) == {'src/new name.py', 'mode.sh', 'removed.py', '*glob[1].py', 'dist/xglob1.py',
+                          'sp ace.py', 'quo"te.py', '中文/模块.py', 'image.bin'}
+    assert stats['src/new name.py'].old_path == 'old name.py'
+    assert stats['src/new name.py'].changed_lines == 0
+    assert stats['removed.py'].removed == 50
+    assert stats['removed.py'].header == ('deleted file mode 100644',)
+    assert stats['mode.sh'].header == ('old mode 100644', 'new mode 100755')
+    assert stats['中文/模块.py'].header == ('new file mode 100644',)
+    assert stats['quo"te.py'].header == ('new file mode 100644',)
+    assert stats['image.bin'].binary
+    assert stats['sp ace.py'].added == 1
+
+
+def test_diff_reader_reads_every_file(repo):
+    # 未关闭core.quotePath时非ASCII路径带引号和转义
+    reader = DiffReader(['git', 'diff', '--cached'], max_bytes=1 << 20, max_file_bytes=1 << 20, cwd=repo)
+    chunks = {chunk.path: chunk for chunk in reader.iter_files()}
+    assert set(chunks) == set(staged_stats(repo))
+    assert chunks['image.bin'].binary and not chunks['image.bin'].body
+    assert chunks['removed.py'].removed == 50
+    assert not reader.truncated
+
+
+def test_diff_reader_file_cap(repo):
+    reader = DiffReader(['git', 'diff', '--cached', '--', 'removed.py'],
+                        max_bytes=1 << 20, max_file_bytes=100, cwd=repo)
+    [chunk] = list(reader.iter_files())
+    assert chunk.truncated and chunk.removed == 50
+    assert sum(len(line) + 1 for line in chunk.body) <= 100
+    assert "（+0 -50）" in chunk.text
+
+
+def test_diff_reader_total_cap(repo):
+    reader = DiffReader(['git', 'diff', '--cached'], max_bytes=300, max_file_bytes=1 << 20, cwd=repo)
+    chunks = list(reader.iter_files())
+    assert reader.truncated
+    assert sum(len(line) + 1 for chunk in chunks for line in chunk.body) <= 300
+    assert len(chunks) == len(staged_stats(repo))
+    assert any(chunk.truncated for chunk in chunks)
+
+
+def test_diff_reader_stop_at_cap(repo):
+    reader = DiffReader(['git', 'diff', '--cached'], max_bytes=1, max_file_bytes=1 << 20, cwd=repo,
+                        stop_at_cap=True)
+    chunks = list(reader.iter_files())
+    assert reader.truncated
+    assert len(chunks) < len(staged_stats(repo))
+
+
+def test_diff_reader_nul_in_text_diff(repo):
+    # 强制按文本比较时，内容中的NUL字节使该文件按二进制处理
+    write(repo, '.gitattributes', 'forced.dat diff\n')
+    write(repo, 'forced.dat', b'text\n\x00nul\n')
+    git(repo, 'add', '.gitattributes', 'forced.dat')
+    reader = DiffReader(['git', 'diff', '--cached', '--', 'forced.dat'],
+                        max_bytes=1 << 20, max_file_bytes=1 << 20, cwd=repo)
+    [chunk] = list(reader.iter_files())
+    assert chunk.binary and not chunk.body
+    assert "Binary files" in chunk.text
+
+
+def test_staged_diff_reads_only_fetched_paths(repo):
+    # dist/下的文件只保留统计信息；*glob[1].py若按通配符匹配会把它的完整diff也读出来
+    with GitOperations.working_directory(os.path.join(repo, '中文')):
+        diff = GitOperations.get_staged_diff(max_bytes=1 << 20, max_file_bytes=1 << 20, context_lines=3)
+    headers = [line for line in diff.split('\n') if line.startswith('diff --git ')]
+    assert len(headers) == len(staged_stats(repo))
+    assert headers.count('diff --git a/dist/xglob1.py b/dist/xglob1.py') == 1
+    assert "+print('dist')" not in diff
+    assert "+print('glob')" in diff
+    assert "+print('space')" in diff
+    assert "+print('quote')" in diff
+    assert "diff --git a/中文/模块.py b/中文/模块.py" in diff
+    assert "rename from old name.py" in diff
+    assert "rename to src/new name.py" in diff
@@ -0,0 +1,104 @@
+import pytest
+
+from git_commit_generator.models.rate_limit import MAX_WAIT_STEP, RateLimiter
+
+
+class FakeClock:
+    """休眠只推进时间的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def limiter(clock, **kwargs):
+    return RateLimiter('test', sleep=clock.sleep, clock=clock, **kwargs)
+
+
+def test_full_bucket_allows_burst(clock):
+    rate = limiter(clock, rpm=60)
+    for _ in range(60):
+        with rate.acquire():
+            pass
+    assert not clock.slept
+
+
+def test_empty_bucket_waits_for_refill(clock):
+    rate = limiter(clock, rpm=60)
+    for _ in range(60):
+        with rate.acquire():
+            pass
+    with rate.acquire():
+        pass
+    # 每分钟60个请求，补充一个请求约需1秒
+    assert sum(clock.slept) == pytest.approx(1.0)
+    assert all(step <= MAX_WAIT_STEP for step in clock.slept)
+
+
+def test_bucket_refills_with_elapsed_time(clock):
+    rate = limiter(clock, rpm=60)
+    for _ in range(60):
+        with rate.acquire():
+            pass
+    clock.now += 30
+    for _ in range(30):
+        with rate.acquire():
+            pass
+    assert not clock.slept
+
+
+def test_refill_is_capped_at_bucket_size(clock):
+    rate = limiter(clock, rpm=10)
+    clock.now += 3600
+    for _ in range(10):
+        with rate.acquire():
+            pass
+    with rate.acquire():
+        pass
+    assert sum(clock.slept) == pytest.approx(6.0)
+
+
+def test_token_bucket(clock):
+    rate = limiter(clock, tpm=600)
+    with rate.acquire(tokens=500):
+        pass
+    with rate.acquire(tokens=200):
+        pass
+    # 剩余100个token，还差100个，按每秒10个补充
+    assert sum(clock.slept) == pytest.approx(10.0)
+
+
+def test_oversized_request_takes_whole_bucket(clock):
+    rate = limiter(clock, tpm=600)
+    with rate.acquire(tokens=5000):
+        pass
+    assert not clock.slept
+    with rate.acquire(tokens=60):
+        pass
+    assert sum(clock.slept) == pytest.approx(6.0)
+
+
+def test_shared_bucket_across_limiters(clock, tmp_path):
+    first = limiter(clock, rpm=2, shared=True, state_dir=str(tmp_path))
+    second = limiter(clock, rpm=2, shared=True, state_dir=str(tmp_path))
+    if not first.shared:
+        pytest.skip("当前平台不支持文件锁")
+    for rate in (first, second):
+        with rate.acquire():
+            pass
+    assert not clock.slept
+    with second.acquire():
+        pass
+    assert sum(clock.slept) == pytest.approx(30.0)
@@ -0,0 +1,140 @@
+import json
+import time
+
+import pytest
+
+from git_commit_generator.models.provider import ContextLengthError, ProviderError
+from git_commit_generator.models.resilience import CircuitBreaker, FallbackChain
+
+
+class FakeProvider:
+    """按顺序返回预设结果的提供商：异常实例会被抛出，列表按流式块逐个产出"""
+
+    def __init__(self, name, results, max_retries=2):
+        self.current_provider = name
+        self.max_retries = max_retries
+        self.results = list(results)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        return self.results.pop(0)
+
+    def generate(self, prompt):
+        result = self._next()
+        if isinstance(result, Exception):
+            raise result
+        return ''.join(result)
+
+    def generate_stream(self, prompt):
+        result = self._next()
+        if isinstance(result, Exception):
+            raise result
+        for chunk in result:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+def retryable(retry_after=None):
+    return ProviderError("服务繁忙", status_code=429, retryable=True, retry_after=retry_after)
+
+
+def fatal():
+    return ProviderError("鉴权失败", status_code=401)
+
+
+@pytest.fixture
+def breaker(tmp_path):
+    return CircuitBreaker(str(tmp_path / 'circuit.json'), failure_threshold=2, cooldown=60)
+
+
+def make_chain(providers, breaker):
+    sleeps = []
+    return FallbackChain(providers, breaker, sleep=sleeps.append), sleeps
+
+
+def test_retryable_error_is_retried(breaker):
+    provider = FakeProvider('a', [retryable(), retryable(retry_after=1.5), ['ok']])
+    chain, sleeps = make_chain([provider], breaker)
+    assert chain.generate('p') == 'ok'
+    assert provider.calls == 3
+    assert len(sleeps) == 2 and sleeps[1] == 1.5
+
+
+def test_retries_are_bounded(breaker):
+    provider = FakeProvider('a', [retryable()] * 5, max_retries=2)
+    chain, sleeps = make_chain([provider], breaker)
+    with pytest.raises(ProviderError):
+        chain.generate('p')
+    assert provider.calls == 3 and len(sleeps) == 2
+
+
+def test_non_retryable_error_falls_back(breaker):
+    first = FakeProvider('a', [fatal()])
+    second = FakeProvider('b', [['ok']])
+    chain, sleeps = make_chain([first, second], breaker)
+    assert chain.generate('p') == 'ok'
+    assert first.calls == 1 and not sleeps
+    assert chain.current_provider == 'b'
+
+
+def test_stream_retries_before_first_chunk(breaker):
+    provider = FakeProvider('a', [retryable(), ['he', 'llo']])
+    chain, sleeps = make_chain([provider], breaker)
+    assert ''.join(chain.generate_stream('p')) == 'hello'
+    assert len(sleeps) == 1
+
+
+def test_stream_does_not_retry_after_first_chunk(breaker):
+    first = FakeProvider('a', [['he', retryable()], ['again']])
+    second = FakeProvider('b', [['other']])
+    chain, sleeps = make_chain([first, second], breaker)
+    received = []
+    with pytest.raises(ProviderError):
+        for chunk in chain.generate_stream('p'):
+            received.append(chunk)
+    assert received == ['he']
+    assert first.calls == 1 and second.calls == 0 and not sleeps
+
+
+def test_context_length_error_does_not_trip_breaker(breaker):
+    provider = FakeProvider('a', [ContextLengthError("提示词过长")] * 3)
+    chain, _ = make_chain([provider], breaker)
+    for _ in range(3):
+        with pytest.raises(ContextLengthError):
+            chain.generate('p')
+    assert breaker.allow('a')
+
+
+def test_open_breaker_skips_provider(breaker):
+    first = FakeProvider('a', [fatal(), fatal(), ['unused']])
+    second = FakeProvider('b', [['ok']] * 3)
+    chain, _ = make_chain([first, second], breaker)
+    for _ in range(3):
+        assert chain.generate('p') == 'ok'
+    assert not breaker.allow('a')
+    assert first.calls == 2
+
+
+def test_breaker_open_half_open_and_reset(breaker):
+    breaker.record_failure('a')
+    assert breaker.allow('a')
+    breaker.record_failure('a')
+    assert not breaker.allow('a')
+
+    # 冷却期已过：半开，允许一次试探请求
+    with open(breaker.state_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    state['a']['opened_at'] = time.time() - 61
+    with open(breaker.state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    assert breaker.allow('a')
+
+    # 试探失败重新计时，成功则复位
+    breaker.record_failure('a')
+    assert not breaker.allow('a')
+    breaker.record_success('a')
+    assert breaker.allow('a')
+    breaker.record_failure('a')
+    assert breaker.allow('a')